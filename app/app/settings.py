@@ -53,6 +53,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'core.middleware.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -95,6 +96,32 @@ DATABASES = {
     }
 }
 
+# Read replicas of the default database. Safe requests to views using
+# core.routers.ReplicaReadMixin read from them, see core.routers.
+DATABASE_REPLICAS = []
+for index, host in enumerate(
+    host for host in os.environ.get('DB_REPLICA_HOSTS', '').split(',') if host
+):
+    alias = f'replica{index}'
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        'HOST': host,
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+
+# Seconds a user reads from the primary after a write, so they see it even
+# when the replicas lag behind.
+REPLICA_STICKY_SECONDS = int(os.environ.get('REPLICA_STICKY_SECONDS', '10'))
+
+
+# Server the app is deployed with, 'wsgi' (uWSGI) or 'asgi' (uvicorn). Under
+# ASGI read requests run in a bounded thread pool, see core.views.
+SERVER_MODE = os.environ.get('SERVER_MODE', 'wsgi')
+ASYNC_READ_WORKERS = int(os.environ.get('ASYNC_READ_WORKERS', '16'))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
@@ -115,6 +142,65 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 
+# Password hashing
+# The first hasher is used for new passwords, the others still verify
+# existing ones which are rehashed on the next successful login.
+
+PASSWORD_HASHER = os.environ.get('PASSWORD_HASHER', 'pbkdf2')
+
+_PASSWORD_HASHERS = {
+    'pbkdf2': 'core.hashers.TunedPBKDF2PasswordHasher',
+    'scrypt': 'core.hashers.ScryptPasswordHasher',
+    'argon2': 'core.hashers.TunedArgon2PasswordHasher',
+}
+
+PASSWORD_HASHERS = [_PASSWORD_HASHERS[PASSWORD_HASHER]] + [
+    hasher for name, hasher in _PASSWORD_HASHERS.items()
+    if name != PASSWORD_HASHER
+] + [
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+]
+
+PBKDF2_ITERATIONS = int(os.environ.get('PBKDF2_ITERATIONS', '260000'))
+SCRYPT_WORK_FACTOR = int(os.environ.get('SCRYPT_WORK_FACTOR', '16384'))
+SCRYPT_BLOCK_SIZE = int(os.environ.get('SCRYPT_BLOCK_SIZE', '8'))
+SCRYPT_PARALLELISM = int(os.environ.get('SCRYPT_PARALLELISM', '1'))
+ARGON2_TIME_COST = int(os.environ.get('ARGON2_TIME_COST', '2'))
+ARGON2_MEMORY_COST = int(os.environ.get('ARGON2_MEMORY_COST', '102400'))
+ARGON2_PARALLELISM = int(os.environ.get('ARGON2_PARALLELISM', '8'))
+
+# Bounded pool password hashing runs in, see core.hashers. Setting the
+# number of workers to 0 hashes in the request thread instead. Every
+# server process has a pool of its own, so these limits are per process
+# and not host wide; by default the CPUs are split between the
+# WEB_PROCESSES server processes, which scripts/run.sh sets.
+WEB_PROCESSES = max(int(os.environ.get('WEB_PROCESSES', '1')), 1)
+PASSWORD_HASHING_WORKERS = int(os.environ.get(
+    'PASSWORD_HASHING_WORKERS', max((os.cpu_count() or 1) // WEB_PROCESSES, 1)
+))
+PASSWORD_HASHING_QUEUE_SIZE = int(os.environ.get(
+    'PASSWORD_HASHING_QUEUE_SIZE', PASSWORD_HASHING_WORKERS * 2 or 1
+))
+PASSWORD_HASHING_TIMEOUT = float(
+    os.environ.get('PASSWORD_HASHING_TIMEOUT', '5')
+)
+
+AUTHENTICATION_BACKENDS = ['core.backends.PooledModelBackend']
+
+# Signed API tokens, see core.authentication
+AUTH_TOKEN_TTL = int(os.environ.get('AUTH_TOKEN_TTL', 7 * 24 * 60 * 60))
+AUTH_TOKEN_REVOCATION_REFRESH = int(
+    os.environ.get('AUTH_TOKEN_REVOCATION_REFRESH', '30')
+)
+# Users authenticated by signed tokens are cached this long. Changes to a
+# user drop the cached copy, in other processes too when REDIS_URL is set,
+# otherwise they apply there within this window.
+AUTH_USER_CACHE_SECONDS = int(
+    os.environ.get('AUTH_USER_CACHE_SECONDS', '60')
+)
+
+
 # Internationalization
 # https://docs.djangoproject.com/en/3.2/topics/i18n/
 
@@ -138,6 +224,101 @@ MEDIA_URL = '/static/media/'
 MEDIA_ROOT = '/vol/web/media'
 STATIC_ROOT = '/vol/web/static'
 
+STATICFILES_STORAGE = os.environ.get(
+    'STATICFILES_STORAGE',
+    'core.storage.CompressedStaticFilesStorage'
+)
+
+
+# Media storage, set DEFAULT_FILE_STORAGE to
+# storages.backends.s3boto3.S3Boto3Storage to keep uploads in an S3
+# compatible object store instead of MEDIA_ROOT.
+
+DEFAULT_FILE_STORAGE = os.environ.get(
+    'DEFAULT_FILE_STORAGE',
+    'django.core.files.storage.FileSystemStorage'
+)
+AWS_STORAGE_BUCKET_NAME = os.environ.get('S3_BUCKET', '')
+AWS_S3_ENDPOINT_URL = os.environ.get('S3_ENDPOINT_URL') or None
+AWS_S3_REGION_NAME = os.environ.get('S3_REGION') or None
+AWS_ACCESS_KEY_ID = os.environ.get('S3_ACCESS_KEY') or None
+AWS_SECRET_ACCESS_KEY = os.environ.get('S3_SECRET_KEY') or None
+AWS_S3_CUSTOM_DOMAIN = os.environ.get('S3_CUSTOM_DOMAIN') or None
+AWS_S3_URL_PROTOCOL = os.environ.get('S3_URL_PROTOCOL', 'https:')
+AWS_QUERYSTRING_AUTH = bool(int(os.environ.get('S3_SIGNED_URLS', '1')))
+AWS_S3_FILE_OVERWRITE = False
+AWS_DEFAULT_ACL = None
+# Endpoint clients upload to, when it differs from S3_ENDPOINT_URL.
+S3_PUBLIC_ENDPOINT_URL = os.environ.get('S3_PUBLIC_ENDPOINT_URL', '')
+
+# Direct uploads of recipe images to the media storage
+IMAGE_UPLOAD_MAX_SIZE = int(
+    os.environ.get('IMAGE_UPLOAD_MAX_SIZE', 10 * 1024 * 1024)
+)
+IMAGE_UPLOAD_EXPIRES = int(os.environ.get('IMAGE_UPLOAD_EXPIRES', '900'))
+IMAGE_UPLOAD_CONTENT_TYPES = {
+    'image/gif': '.gif',
+    'image/jpeg': '.jpg',
+    'image/png': '.png',
+    'image/webp': '.webp',
+}
+
+# Uploads are hashed while streamed in, to store identical images once.
+FILE_UPLOAD_HANDLERS = [
+    'core.uploadhandlers.HashingMemoryFileUploadHandler',
+    'core.uploadhandlers.HashingTemporaryFileUploadHandler',
+]
+# Admin changelists of unfiltered tables with more rows than this show
+# the planner's estimate instead of counting every row.
+ADMIN_ESTIMATED_COUNT_THRESHOLD = int(
+    os.environ.get('ADMIN_ESTIMATED_COUNT_THRESHOLD', '100000')
+)
+# Responses to requests with an Idempotency-Key header are replayed for
+# retries within IDEMPOTENCY_KEY_TTL seconds. A key is locked for
+# IDEMPOTENCY_LOCK_SECONDS while its request is processed.
+IDEMPOTENCY_KEY_TTL = int(os.environ.get('IDEMPOTENCY_KEY_TTL', '86400'))
+IDEMPOTENCY_LOCK_SECONDS = int(
+    os.environ.get('IDEMPOTENCY_LOCK_SECONDS', '60')
+)
+# Changes returned per sync request. Changes younger than
+# SYNC_SETTLE_SECONDS are left for the next sync, so that transactions
+# committing out of order are not skipped by a client's cursor.
+SYNC_PAGE_SIZE = int(os.environ.get('SYNC_PAGE_SIZE', '500'))
+SYNC_SETTLE_SECONDS = int(os.environ.get('SYNC_SETTLE_SECONDS', '2'))
+# Server-sent event streams of changes, served under ASGI only, send a
+# comment every EVENTS_HEARTBEAT_SECONDS to keep idle connections open.
+# Clients reconnect after EVENTS_MAX_STREAM_SECONDS.
+EVENTS_HEARTBEAT_SECONDS = int(
+    os.environ.get('EVENTS_HEARTBEAT_SECONDS', '15')
+)
+EVENTS_MAX_STREAM_SECONDS = int(
+    os.environ.get('EVENTS_MAX_STREAM_SECONDS', '3600')
+)
+# Rows deleted per transaction when deleting a user and their data.
+DELETE_CHUNK_SIZE = int(os.environ.get('DELETE_CHUNK_SIZE', '1000'))
+# Unreferenced images are kept this long before gc_images deletes them.
+IMAGE_GC_GRACE_SECONDS = int(os.environ.get('IMAGE_GC_GRACE_SECONDS', '3600'))
+
+
+# Response compression
+
+COMPRESSION_ENCODINGS = os.environ.get(
+    'COMPRESSION_ENCODINGS', 'br,zstd,gzip'
+).split(',')
+COMPRESSION_MIN_SIZE = int(os.environ.get('COMPRESSION_MIN_SIZE', '1024'))
+COMPRESSION_CONTENT_TYPES = [
+    'application/javascript',
+    'application/json',
+    'application/vnd.oai.openapi',
+    'application/vnd.oai.openapi+json',
+    'application/yaml',
+    'image/svg+xml',
+    'text/css',
+    'text/html',
+    'text/javascript',
+    'text/plain',
+]
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/3.2/ref/settings/#default-auto-field
 
@@ -145,10 +326,69 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 AUTH_USER_MODEL = 'core.User'
 
+# Caches, shared between processes and nodes through Redis when REDIS_URL
+# is set, otherwise kept in the memory of each process.
+
+REDIS_URL = os.environ.get('REDIS_URL', '')
+
+
+def _cache(prefix):
+    if REDIS_URL:
+        return {
+            'BACKEND': 'django_redis.cache.RedisCache',
+            'LOCATION': REDIS_URL,
+            'KEY_PREFIX': prefix,
+            'OPTIONS': {'IGNORE_EXCEPTIONS': True},
+        }
+
+    return {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': prefix,
+    }
+
+
+CACHES = {
+    'default': _cache('default'),
+    'throttle': _cache('throttle'),
+}
+
+
 REST_FRAMEWORK = {
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
+    'DEFAULT_RENDERER_CLASSES': [
+        'core.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'core.renderers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
+    'DEFAULT_THROTTLE_CLASSES': [
+        'core.throttling.AnonSlidingRateThrottle',
+        'core.throttling.UserSlidingRateThrottle',
+        'core.throttling.ScopedSlidingRateThrottle',
+    ],
+    # Rates are <requests>/<second|minute|hour|day>, empty disables one.
+    'DEFAULT_THROTTLE_RATES': {
+        scope: os.environ.get(f'THROTTLE_RATE_{scope.upper()}', rate) or None
+        for scope, rate in {
+            'anon': '60/minute',
+            'user': '600/minute',
+            'login': '10/minute',
+            'uploads': '30/hour',
+            'bulk': '30/minute',
+        }.items()
+    },
+    # Clients are identified by REMOTE_ADDR, nginx and uvicorn set it to
+    # the address of the client.
+    'NUM_PROXIES': int(os.environ.get('THROTTLE_NUM_PROXIES', '0')),
 }
 
 SPECTACULAR_SETTINGS = {
     'COMPONENT_SPLIT_REQUEST': True,
 }
+
+# Pre-generated schema served by the schema view, see core.schema
+SPECTACULAR_SCHEMA_FILE = os.environ.get('SPECTACULAR_SCHEMA_FILE', '')
+SCHEMA_CACHE_MAX_AGE = int(os.environ.get('SCHEMA_CACHE_MAX_AGE', '300'))
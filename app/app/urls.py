@@ -13,21 +13,26 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
-from drf_spectacular.views import (
-    SpectacularAPIView,
-    SpectacularSwaggerView
-)
 from django.contrib import admin
 from django.urls import path, include
 from django.conf.urls.static import static
 from django.conf import settings
 
+from core.views import lazy_view
+
 urlpatterns = [
     path('admin/', admin.site.urls),
-    path('api/schema/', SpectacularAPIView.as_view(), name='schema'),
+    path(
+        'api/schema/',
+        lazy_view('core.schema.CachedSpectacularAPIView'), name='schema'
+    ),
     path(
         'api/docs/',
-        SpectacularSwaggerView.as_view(url_name='schema'), name='docs'
+        lazy_view(
+            'drf_spectacular.views.SpectacularSwaggerView',
+            url_name='schema',
+        ),
+        name='docs'
     ),
     path('api/user/', include('user.urls')),
     path('api/recipe/', include('recipe.urls')),
@@ -2,17 +2,76 @@
 Django admin customizations
 """
 
+from django.conf import settings
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
 from django.utils.translation import gettext_lazy as _
 
 from core import models
+from core.deletion import delete_user
+
+
+def estimated_count(model, using):
+    """Return the planner's row estimate for a table, None if unknown.
+
+    Partitioned tables are estimated from their partitions.
+    """
+    connection = connections[using]
+    if connection.vendor != 'postgresql':
+        return None
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT SUM(GREATEST(reltuples, 0)) FROM pg_class '
+            'WHERE oid = %s::regclass OR oid IN ('
+            'SELECT inhrelid FROM pg_inherits WHERE inhparent = %s::regclass)',
+            [model._meta.db_table] * 2,
+        )
+        estimate = cursor.fetchone()[0]
+
+    return None if estimate is None else int(estimate)
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator estimating the size of large unfiltered tables.
+
+    Counting every row of a large table takes seconds on PostgreSQL, the
+    estimate is only used above ADMIN_ESTIMATED_COUNT_THRESHOLD rows.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not getattr(queryset, 'query', None) or queryset.query.where:
+            return super().count
+
+        estimate = estimated_count(queryset.model, queryset.db)
+        if (estimate is None
+                or estimate < settings.ADMIN_ESTIMATED_COUNT_THRESHOLD):
+            return super().count
+
+        return estimate
+
+
+class LargeTableAdminMixin:
+    """Admin options for tables too large to count or list naively"""
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    list_select_related = ('user',)
+    raw_id_fields = ('user',)
 
 
 class UserAdmin(BaseUserAdmin):
     """Define the admin pages for users"""
     ordering = ['id']
     list_display = ['email', 'name']
+    # Prefix searches use the UPPER() pattern indexes from migration 0009.
+    search_fields = ['^email']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     fieldsets = (
         (None, {'fields': ('email', 'password')}),
         (
@@ -37,8 +96,58 @@ class UserAdmin(BaseUserAdmin):
         }),
     )
 
+    def get_deleted_objects(self, objs, request):
+        """Count the owned objects instead of listing each of them"""
+        users = list(objs)
+        model_count = {
+            models.User._meta.verbose_name_plural: len(users),
+        }
+        for model in (models.Recipe, models.Tag, models.Ingredient):
+            model_count[model._meta.verbose_name_plural] = (
+                model.objects.filter(user__in=users).count()
+            )
+
+        return [str(user) for user in users], model_count, set(), []
+
+    def delete_model(self, request, obj):
+        delete_user(obj)
+
+    def delete_queryset(self, request, queryset):
+        for user in queryset:
+            delete_user(user)
+
+
+class RecipeIngredientInline(admin.TabularInline):
+    """Edit the ingredients of a recipe with their quantities"""
+    model = models.RecipeIngredient
+    autocomplete_fields = ['ingredient']
+    extra = 1
+
+
+class RecipeAdmin(LargeTableAdminMixin, admin.ModelAdmin):
+    """Define the admin pages for recipes"""
+    ordering = ['-id']
+    list_display = ['title', 'user', 'time_minutes', 'price']
+    search_fields = ['^title']
+    autocomplete_fields = ['tags']
+    inlines = [RecipeIngredientInline]
+
+
+class TagAdmin(LargeTableAdminMixin, admin.ModelAdmin):
+    """Define the admin pages for tags"""
+    ordering = ['-id']
+    list_display = ['name', 'user']
+    search_fields = ['^name']
+
+
+class IngredientAdmin(LargeTableAdminMixin, admin.ModelAdmin):
+    """Define the admin pages for ingredients"""
+    ordering = ['-id']
+    list_display = ['name', 'user']
+    search_fields = ['^name']
+
 
 admin.site.register(models.User, UserAdmin)
-admin.site.register(models.Recipe)
-admin.site.register(models.Tag)
-admin.site.register(models.Ingredient)
+admin.site.register(models.Recipe, RecipeAdmin)
+admin.site.register(models.Tag, TagAdmin)
+admin.site.register(models.Ingredient, IngredientAdmin)
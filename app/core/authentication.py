@@ -0,0 +1,176 @@
+"""
+Authentication for the API
+"""
+import secrets
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime, timedelta, timezone
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import signing
+from django.core.cache import cache
+from django.db import router
+from django.utils import baseconv
+from django.utils.translation import gettext_lazy as _
+
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+
+from core.models import RevokedToken
+
+
+TOKEN_SALT = 'core.authentication.signed-token'
+
+SignedToken = namedtuple(
+    'SignedToken', ['key', 'user_id', 'jti', 'issued', 'expires']
+)
+
+
+def issue_token(user):
+    """Create and return a signed auth token for the user"""
+    jti = secrets.token_urlsafe(12)
+    key = signing.TimestampSigner(salt=TOKEN_SALT).sign(f'{user.pk}:{jti}')
+
+    return decode_token(key)
+
+
+def decode_token(key):
+    """Verify a signed token and return it, raises BadSignature if invalid"""
+    value = signing.TimestampSigner(salt=TOKEN_SALT).unsign(
+        key, max_age=settings.AUTH_TOKEN_TTL
+    )
+    user_id, jti = value.split(':')
+    issued = baseconv.base62.decode(key.split(':')[2])
+    expires = datetime.fromtimestamp(
+        issued, tz=timezone.utc
+    ) + timedelta(seconds=settings.AUTH_TOKEN_TTL)
+
+    return SignedToken(key, int(user_id), jti, issued, expires)
+
+
+class RevocationList:
+    """Process local copy of the revoked token ids.
+
+    Reloaded from the database at most every AUTH_TOKEN_REVOCATION_REFRESH
+    seconds, so revocations in other processes apply within that window.
+    """
+
+    def __init__(self):
+        self._jtis = frozenset()
+        self._loaded_at = None
+        self._lock = threading.Lock()
+
+    def _refresh(self):
+        """Reload the revoked ids when the local copy is stale"""
+        now = time.monotonic()
+        if (self._loaded_at is not None and now - self._loaded_at
+                < settings.AUTH_TOKEN_REVOCATION_REFRESH):
+            return
+
+        with self._lock:
+            jtis = RevokedToken.objects.filter(
+                expires_at__gt=datetime.now(timezone.utc)
+            ).values_list('jti', flat=True)
+            self._jtis = frozenset(jtis)
+            self._loaded_at = now
+
+    def __contains__(self, jti):
+        self._refresh()
+        return jti in self._jtis
+
+    def revoke(self, token):
+        """Revoke a signed token"""
+        RevokedToken.objects.get_or_create(
+            jti=token.jti, defaults={'expires_at': token.expires}
+        )
+        RevokedToken.objects.filter(
+            expires_at__lte=datetime.now(timezone.utc)
+        ).delete()
+        with self._lock:
+            self._jtis = self._jtis | {token.jti}
+
+    def clear(self):
+        """Forget the local copy so the next check reloads it"""
+        with self._lock:
+            self._jtis = frozenset()
+            self._loaded_at = None
+
+
+revoked_tokens = RevocationList()
+
+
+def _user_cache_key(user_id):
+    return f'core.authentication.user:{user_id}'
+
+
+def get_token_user_fields(user_id):
+    """Return the fields of a user for token authentication.
+
+    Cached for AUTH_USER_CACHE_SECONDS, all fields but the password
+    hash. Returns an empty dict for users that do not exist.
+    """
+    key = _user_cache_key(user_id)
+    fields = cache.get(key)
+    if fields is None:
+        UserModel = get_user_model()
+        names = [
+            field.attname for field in UserModel._meta.concrete_fields
+            if field.attname != 'password'
+        ]
+        # The primary, replicas may still have deactivated users.
+        fields = UserModel._base_manager.using(
+            router.db_for_write(UserModel)
+        ).filter(pk=user_id).values(*names).first() or {}
+        cache.set(key, fields, settings.AUTH_USER_CACHE_SECONDS)
+
+    return fields
+
+
+def forget_token_user(user_id):
+    """Drop the cached fields of a user, after changes to them"""
+    cache.delete(_user_cache_key(user_id))
+
+
+class SignedTokenAuthentication(TokenAuthentication):
+    """Authenticate signed, expiring tokens, usually without a query.
+
+    Tokens of inactive and deleted users are rejected, and so are tokens
+    issued before the user's password changed or they were deactivated.
+    Users are read from the cache, see get_token_user_fields, with every
+    field but the password loaded. Tokens created by DRF's authtoken app
+    are still accepted.
+    """
+
+    def authenticate_credentials(self, key):
+        if ':' not in key:
+            return super().authenticate_credentials(key)
+
+        try:
+            token = decode_token(key)
+        except signing.SignatureExpired:
+            raise exceptions.AuthenticationFailed(_('Token has expired.'))
+        except (signing.BadSignature, ValueError):
+            raise exceptions.AuthenticationFailed(_('Invalid token.'))
+
+        if token.jti in revoked_tokens:
+            raise exceptions.AuthenticationFailed(_('Token has been revoked.'))
+
+        fields = get_token_user_fields(token.user_id)
+        if not fields.get('is_active'):
+            raise exceptions.AuthenticationFailed(
+                _('User inactive or deleted.')
+            )
+
+        # Issue times have a resolution of seconds.
+        valid_after = fields['tokens_valid_after']
+        if valid_after and token.issued < int(valid_after.timestamp()):
+            raise exceptions.AuthenticationFailed(_('Token has been revoked.'))
+
+        UserModel = get_user_model()
+        user = UserModel.from_db(
+            router.db_for_read(UserModel), list(fields), list(fields.values())
+        )
+
+        return (user, token)
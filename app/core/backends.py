@@ -0,0 +1,50 @@
+"""
+Authentication backends
+"""
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.hashers import check_password
+
+from core.hashers import password_needs_rehash, run_in_hashing_pool
+
+
+class PooledModelBackend(ModelBackend):
+    """Model backend verifying passwords in the bounded hashing pool.
+
+    Passwords stored with an outdated hasher or work factor are rehashed
+    with the preferred hasher on a successful login.
+    """
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        UserModel = get_user_model()
+        if username is None:
+            username = kwargs.get(UserModel.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+
+        try:
+            user = UserModel._default_manager.get_by_natural_key(username)
+        except UserModel.DoesNotExist:
+            # Hash anyway to reduce the timing difference between existing
+            # and nonexistent users.
+            run_in_hashing_pool(UserModel().set_password, password)
+            return None
+
+        if (self._check_password(user, password)
+                and self.user_can_authenticate(user)):
+            return user
+
+        return None
+
+    def _check_password(self, user, password):
+        """Verify the password and rehash it when needed"""
+        encoded = user.password
+        if not run_in_hashing_pool(check_password, password, encoded):
+            return False
+
+        if password_needs_rehash(encoded):
+            run_in_hashing_pool(user.set_password, password)
+            user._password = None
+            user.save(update_fields=['password'])
+
+        return True
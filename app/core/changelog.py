@@ -0,0 +1,45 @@
+"""
+Per user log of changes to recipes, tags and ingredients
+"""
+from django.db import transaction
+
+from core.events import notify_users
+from core.models import ChangeLogEntry, Ingredient, Recipe, Tag
+
+
+TRACKED_MODELS = (Recipe, Tag, Ingredient)
+
+
+def log_changes(model, objects, deleted=False):
+    """Log changes to objects given as (user id, primary key) pairs.
+
+    Replaces the previous entries of the objects, so only their latest
+    change is kept, and notifies the users' connected clients.
+    """
+    objects = list(objects)
+    if not objects:
+        return
+
+    name = model._meta.model_name
+    with transaction.atomic():
+        ChangeLogEntry.objects.filter(
+            model=name, object_id__in=[pk for _, pk in objects]
+        ).delete()
+        ChangeLogEntry.objects.bulk_create(
+            ChangeLogEntry(
+                user_id=user_id, model=name, object_id=pk, deleted=deleted
+            )
+            for user_id, pk in objects
+        )
+        notify_users(user_id for user_id, _ in objects)
+
+
+def log_changed_recipes(model, pks):
+    """Log the recipes using tags or ingredients as changed"""
+    field = next(
+        field for field in Recipe._meta.many_to_many
+        if field.related_model is model
+    )
+    log_changes(Recipe, Recipe.objects.filter(
+        **{f'{field.name}__in': pks}
+    ).values_list('user_id', 'id').distinct())
@@ -0,0 +1,74 @@
+"""
+Compression helpers for responses and static files
+"""
+import gzip
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - exercised when brotli is missing
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - exercised when zstandard is missing
+    zstandard = None
+
+
+def _gzip(data):
+    """Compress data with gzip"""
+    return gzip.compress(data, compresslevel=6, mtime=0)
+
+
+def _brotli(data):
+    """Compress data with brotli"""
+    return brotli.compress(data, quality=4)
+
+
+def _zstd(data):
+    """Compress data with zstandard"""
+    return zstandard.ZstdCompressor(level=3).compress(data)
+
+
+def get_compressors():
+    """Return a mapping of content codings to available compressors"""
+    compressors = {'gzip': _gzip}
+    if brotli is not None:
+        compressors['br'] = _brotli
+    if zstandard is not None:
+        compressors['zstd'] = _zstd
+
+    return compressors
+
+
+def parse_accept_encoding(header):
+    """Return a mapping of content codings to their quality values"""
+    accepted = {}
+    for item in header.split(','):
+        coding, _, params = item.strip().partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+
+        quality = 1.0
+        for param in params.split(';'):
+            name, _, value = param.strip().partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        accepted[coding] = quality
+
+    return accepted
+
+
+def select_encoding(header, preferred):
+    """Return the best coding from `preferred` accepted by `header`"""
+    accepted = parse_accept_encoding(header)
+    best, best_quality = None, 0.0
+    for coding in preferred:
+        quality = accepted.get(coding, accepted.get('*', 0.0))
+        if quality > best_quality:
+            best, best_quality = coding, quality
+
+    return best
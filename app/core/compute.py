@@ -0,0 +1,160 @@
+"""
+Batch computations over many recipes
+"""
+from collections import namedtuple
+from decimal import ROUND_HALF_UP, Decimal
+from functools import lru_cache
+
+from django.db.models import Count, DecimalField, F, Sum
+
+from core.models import Ingredient, RecipeIngredient
+from core.units import (
+    BASE_UNITS,
+    UNITS,
+    base_unit_expression,
+    factor_expression,
+)
+
+
+DIMENSIONS = list(BASE_UNITS)
+UNIT_INDEX = {code: index for index, code in enumerate(UNITS)}
+
+CENT = Decimal('0.01')
+
+ScaledRecipe = namedtuple('ScaledRecipe', ['id', 'scale', 'price'])
+IngredientTotal = namedtuple(
+    'IngredientTotal', ['id', 'name', 'quantity', 'unit']
+)
+BatchTotals = namedtuple(
+    'BatchTotals', ['price', 'time_minutes', 'recipes', 'ingredients']
+)
+
+
+@lru_cache(maxsize=None)
+def _unit_arrays():
+    """Return the factor to the base unit and dimension of each unit.
+
+    Both arrays are indexed by UNIT_INDEX. numpy is imported when first
+    needed, so modules importing this one do not load it.
+    """
+    import numpy as np
+
+    factors = np.array([unit.factor for unit in UNITS.values()])
+    dimensions = np.array(
+        [DIMENSIONS.index(unit.dimension) for unit in UNITS.values()]
+    )
+
+    return factors, dimensions
+
+
+def _ingredient_totals(recipe_ids, scales):
+    """Total the scaled quantities of each ingredient, in base units.
+
+    Quantities in units of different dimensions, e.g. grams and cups,
+    are totalled separately.
+    """
+    rows = RecipeIngredient.objects.filter(
+        recipe_id__in=recipe_ids.tolist(), quantity__isnull=False
+    ).values_list('recipe_id', 'ingredient_id', 'quantity', 'unit')
+    rows = list(rows)
+    if not rows:
+        return []
+
+    import numpy as np
+
+    unit_factors, unit_dimensions = _unit_arrays()
+    recipe, ingredient, quantity, unit = zip(*rows)
+    unit = np.array([UNIT_INDEX[code] for code in unit])
+    amount = (
+        np.array(quantity, dtype=float)
+        * unit_factors[unit]
+        * scales[np.searchsorted(recipe_ids, recipe)]
+    )
+
+    keys, group = np.unique(
+        np.column_stack([ingredient, unit_dimensions[unit]]),
+        axis=0, return_inverse=True,
+    )
+    totals = np.bincount(group.ravel(), weights=amount, minlength=len(keys))
+
+    names = dict(Ingredient.objects.filter(
+        pk__in=keys[:, 0].tolist()
+    ).values_list('id', 'name'))
+    ingredients = [
+        IngredientTotal(
+            int(pk), names[pk], round(float(total), 3),
+            BASE_UNITS[DIMENSIONS[dimension]],
+        )
+        for (pk, dimension), total in zip(keys.tolist(), totals)
+    ]
+
+    return sorted(ingredients, key=lambda total: (total.name, total.id))
+
+
+def compute_batch(recipes, scales):
+    """Scale recipes and total their prices and ingredient quantities.
+
+    `recipes` is a queryset of the recipes that may be used and `scales`
+    maps recipe ids to the factor to scale them by. The rows of all the
+    recipes are computed on as arrays rather than one recipe at a time.
+    Recipes not in `recipes` are left out of the result.
+    """
+    rows = list(recipes.filter(pk__in=list(scales)).order_by('pk').values_list(
+        'pk', 'price', 'time_minutes'
+    ))
+    if not rows:
+        return BatchTotals(Decimal('0.00'), 0, [], [])
+
+    import numpy as np
+
+    ids, prices, times = zip(*rows)
+    recipe_ids = np.array(ids)
+    recipe_scales = np.array([float(scales[pk]) for pk in ids])
+    scaled_prices = [
+        (price * Decimal(scales[pk])).quantize(CENT, ROUND_HALF_UP)
+        for pk, price in zip(ids, prices)
+    ]
+
+    return BatchTotals(
+        price=sum(scaled_prices, Decimal('0.00')),
+        time_minutes=int(np.sum(times)),
+        recipes=[
+            ScaledRecipe(pk, scales[pk], price)
+            for pk, price in zip(ids, scaled_prices)
+        ],
+        ingredients=_ingredient_totals(recipe_ids, recipe_scales),
+    )
+
+
+def shopping_list(recipes, recipe_ids):
+    """Total the ingredients of recipes in a single grouped query.
+
+    Quantities are converted to the base unit of their dimension in SQL
+    and summed per ingredient and dimension. Ingredients used without a
+    quantity are listed without one. Recipes not in `recipes` are left
+    out.
+    """
+    rows = RecipeIngredient.objects.filter(
+        recipe__in=recipes.filter(pk__in=recipe_ids)
+    ).annotate(
+        base_unit=base_unit_expression(),
+    ).values(
+        'ingredient_id', 'ingredient__name', 'base_unit',
+    ).annotate(
+        total=Sum(
+            F('quantity') * factor_expression(),
+            output_field=DecimalField(),
+        ),
+        recipe_count=Count('recipe_id'),
+    ).order_by('ingredient__name', 'ingredient_id', 'base_unit')
+
+    return [
+        {
+            'id': row['ingredient_id'],
+            'name': row['ingredient__name'],
+            'quantity': row['total'],
+            'unit': row['base_unit'],
+            'recipes': row['recipe_count'],
+        }
+        for row in rows
+    ]
@@ -0,0 +1,97 @@
+"""
+Deleting large numbers of rows
+"""
+from django.conf import settings
+from django.db import models, router, transaction
+from django.utils import timezone
+
+from core.authentication import forget_token_user
+
+from core.changelog import TRACKED_MODELS, log_changed_recipes, log_changes
+from core.fields import ContentAddressedImageField
+from core.models import Ingredient, Recipe, Tag
+from core.signals import release_images
+
+
+def _delete_rows(model, pks, using):
+    """Delete rows and the rows cascading from them, without loading them.
+
+    No delete signals are sent for the rows of model itself.
+    """
+    for related in model._meta.get_fields(include_hidden=True):
+        if (related.auto_created and not related.concrete
+                and (related.one_to_many or related.one_to_one)
+                and related.on_delete is models.CASCADE):
+            related.related_model._base_manager.using(using).filter(
+                **{f'{related.field.name}__in': pks}
+            ).delete()
+
+    model._base_manager.using(using).filter(pk__in=pks)._raw_delete(using)
+
+
+def delete_in_chunks(queryset, chunk_size=None, log=True):
+    """Delete the rows of a queryset a chunk at a time.
+
+    Each chunk is deleted in its own transaction so locks are only held
+    briefly, and images of the deleted rows are released. Deletions of
+    recipes, tags and ingredients are logged for syncing clients unless
+    log is false. Returns the number of rows deleted.
+    """
+    chunk_size = chunk_size or settings.DELETE_CHUNK_SIZE
+    model = queryset.model
+    using = router.db_for_write(model)
+    images = [
+        field for field in model._meta.concrete_fields
+        if isinstance(field, ContentAddressedImageField)
+    ]
+    log = log and model in TRACKED_MODELS
+    columns = ['pk', *(field.attname for field in images)]
+    if log:
+        columns.append('user_id')
+    rows = queryset.using(using).order_by('pk').values(*columns)
+
+    deleted = 0
+    while True:
+        with transaction.atomic(using=using):
+            chunk = list(rows[:chunk_size])
+            if not chunk:
+                return deleted
+
+            for field in images:
+                release_images(
+                    field.storage, [row[field.attname] for row in chunk],
+                    using,
+                )
+
+            pks = [row['pk'] for row in chunk]
+            if log:
+                if model is not Recipe:
+                    log_changed_recipes(model, pks)
+                log_changes(
+                    model, [(row['user_id'], row['pk']) for row in chunk],
+                    deleted=True,
+                )
+
+            _delete_rows(model, pks, using)
+            deleted += len(pks)
+
+
+def delete_user(user, chunk_size=None):
+    """Delete a user and everything they own, a chunk at a time.
+
+    The user is deactivated and their tokens invalidated first, so they
+    cannot use the API while the rest of their data is deleted.
+    """
+    model = type(user)
+    using = router.db_for_write(model, instance=user)
+    model._base_manager.using(using).filter(pk=user.pk).update(
+        is_active=False, tokens_valid_after=timezone.now()
+    )
+    forget_token_user(user.pk)
+
+    for owned in (Recipe, Tag, Ingredient):
+        delete_in_chunks(
+            owned.objects.filter(user=user), chunk_size, log=False
+        )
+
+    user.delete(using=using)
@@ -0,0 +1,296 @@
+"""
+Push notifications of changed recipes to connected clients
+"""
+import asyncio
+import contextlib
+import json
+import logging
+import time
+from collections import defaultdict
+from functools import partial
+
+from asgiref.sync import sync_to_async
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+from rest_framework import exceptions
+
+from core.authentication import SignedTokenAuthentication
+
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = 'recipe_changes'
+
+# Clients reconnect this long after the stream ends or breaks.
+RECONNECT_MILLISECONDS = 5000
+
+CHANGED_EVENT = b'event: changed\ndata: {}\n\n'
+KEEPALIVE = b': keepalive\n\n'
+
+
+def notify_users(user_ids, using=DEFAULT_DB_ALIAS):
+    """Notify the users' connected clients once the transaction commits"""
+    user_ids = sorted(set(user_ids))
+    if not user_ids:
+        return
+
+    connection = connections[using]
+    if connection.vendor != 'postgresql':
+        transaction.on_commit(
+            partial(hub.publish_threadsafe, user_ids), using=using
+        )
+        return
+
+    # Delivered on commit, repeated notifications in a transaction once.
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT pg_notify(%s, user_id) FROM unnest(%s::text[]) user_id',
+            [CHANNEL, [str(user_id) for user_id in user_ids]],
+        )
+
+
+class EventHub:
+    """Fan out change notifications to the streams of connected users.
+
+    On PostgreSQL the hub listens for the notifications of every process
+    on a connection of its own, otherwise it only sees changes made in
+    its own process. Notifications are delivered after
+    SYNC_SETTLE_SECONDS, so a client syncing on them gets the changes,
+    and bursts of changes are delivered once.
+    """
+
+    def __init__(self, channel=CHANNEL):
+        self.channel = channel
+        self._subscribers = defaultdict(set)
+        self._pending = set()
+        self._loop = None
+        self._listener = None
+
+    @contextlib.asynccontextmanager
+    async def subscribe(self, user_id):
+        """Yield a queue that gets an item when the user's data changes"""
+        self._loop = asyncio.get_running_loop()
+        if ((self._listener is None or self._listener.done()) and
+                connections[DEFAULT_DB_ALIAS].vendor == 'postgresql'):
+            self._listener = self._loop.create_task(self._listen())
+
+        queue = asyncio.Queue(maxsize=1)
+        self._subscribers[user_id].add(queue)
+        try:
+            yield queue
+        finally:
+            self._subscribers[user_id].discard(queue)
+            if not self._subscribers[user_id]:
+                del self._subscribers[user_id]
+
+    def publish(self, user_ids):
+        """Notify the subscribers of the users, runs in the event loop"""
+        for user_id in user_ids:
+            if user_id in self._subscribers and user_id not in self._pending:
+                self._pending.add(user_id)
+                self._loop.call_later(
+                    settings.SYNC_SETTLE_SECONDS, self._deliver, user_id
+                )
+
+    def publish_threadsafe(self, user_ids):
+        """Notify the subscribers of the users from any thread"""
+        loop = self._loop
+        if loop is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(self.publish, list(user_ids))
+
+    def _deliver(self, user_id):
+        self._pending.discard(user_id)
+        for queue in self._subscribers.get(user_id, ()):
+            if queue.empty():
+                queue.put_nowait(None)
+
+    def _connect(self):
+        """Open a connection listening on the channel"""
+        import psycopg2
+
+        params = connections[DEFAULT_DB_ALIAS].get_connection_params()
+        connection = psycopg2.connect(**params)
+        connection.autocommit = True
+        with connection.cursor() as cursor:
+            cursor.execute(f'LISTEN {self.channel}')
+
+        return connection
+
+    def _drain(self, connection, closed):
+        """Publish the notifications received on the connection"""
+        try:
+            connection.poll()
+        except Exception:
+            logger.exception('Lost the connection listening for changes.')
+            if not closed.done():
+                closed.set_result(None)
+            return
+
+        user_ids = {int(notify.payload) for notify in connection.notifies}
+        connection.notifies.clear()
+        self.publish(user_ids)
+
+    async def _listen(self):
+        """Listen for notifications, reconnecting when the connection drops"""
+        loop = asyncio.get_running_loop()
+        reconnecting = False
+        while True:
+            try:
+                connection = await loop.run_in_executor(None, self._connect)
+            except Exception:
+                logger.exception('Could not listen for changes.')
+                await asyncio.sleep(RECONNECT_MILLISECONDS / 1000)
+                continue
+
+            if reconnecting:
+                # Changes may have been missed while disconnected.
+                self.publish(list(self._subscribers))
+
+            closed = loop.create_future()
+            loop.add_reader(
+                connection.fileno(), self._drain, connection, closed
+            )
+            try:
+                await closed
+            finally:
+                loop.remove_reader(connection.fileno())
+                connection.close()
+
+            reconnecting = True
+            await asyncio.sleep(RECONNECT_MILLISECONDS / 1000)
+
+
+hub = EventHub()
+
+
+def _authenticate(scope):
+    """Return the user and token of an ASGI request"""
+    headers = dict(scope['headers'])
+    authorization = headers.get(b'authorization', b'').split()
+    if len(authorization) != 2 or authorization[0].lower() != b'token':
+        raise exceptions.NotAuthenticated()
+
+    try:
+        key = authorization[1].decode()
+    except UnicodeError:
+        raise exceptions.AuthenticationFailed()
+
+    return SignedTokenAuthentication().authenticate_credentials(key)
+
+
+async def _respond(send, status, detail, headers=()):
+    """Send a JSON error response"""
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(b'content-type', b'application/json'), *headers],
+    })
+    await send({
+        'type': 'http.response.body',
+        'body': json.dumps({'detail': str(detail)}).encode(),
+    })
+
+
+async def _disconnected(receive):
+    """Return once the client disconnects"""
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+
+
+class EventStreamApplication:
+    """ASGI app streaming server-sent events of changes to recipe data.
+
+    Authenticated clients get a `changed` event when they connect and
+    whenever their recipes, tags or ingredients change, and then fetch
+    the changes from the sync API. Other requests are passed to `app`.
+    Streams end after EVENTS_MAX_STREAM_SECONDS or when the token
+    expires, so clients reconnect and are authenticated again.
+    """
+
+    def __init__(self, app, path='/api/recipe/events/'):
+        self.app = app
+        self.path = path
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or scope['path'] != self.path:
+            return await self.app(scope, receive, send)
+
+        if scope['method'] != 'GET':
+            return await _respond(
+                send, 405, exceptions.MethodNotAllowed(scope['method']).detail,
+                [(b'allow', b'GET')],
+            )
+
+        try:
+            user, token = await sync_to_async(_authenticate)(scope)
+        except exceptions.APIException as exc:
+            return await _respond(
+                send, 401, exc.detail, [(b'www-authenticate', b'Token')]
+            )
+
+        loop = asyncio.get_running_loop()
+        seconds = settings.EVENTS_MAX_STREAM_SECONDS
+        expires = getattr(token, 'expires', None)
+        if expires is not None:
+            seconds = min(seconds, expires.timestamp() - time.time())
+
+        await self.stream(user.pk, loop.time() + seconds, receive, send)
+
+    async def stream(self, user_id, deadline, receive, send):
+        """Stream change events to a client until the deadline"""
+        loop = asyncio.get_running_loop()
+        async with hub.subscribe(user_id) as queue:
+            await send({
+                'type': 'http.response.start',
+                'status': 200,
+                'headers': [
+                    (b'content-type', b'text/event-stream'),
+                    (b'cache-control', b'no-cache'),
+                    # Lets nginx pass events on as they are sent.
+                    (b'x-accel-buffering', b'no'),
+                ],
+            })
+            # Subscribed first, so no change is missed by the first sync.
+            await send({
+                'type': 'http.response.body',
+                'body': f'retry: {RECONNECT_MILLISECONDS}\n\n'.encode()
+                + CHANGED_EVENT,
+                'more_body': True,
+            })
+
+            disconnected = loop.create_task(_disconnected(receive))
+            changed = loop.create_task(queue.get())
+            try:
+                while True:
+                    timeout = min(
+                        settings.EVENTS_HEARTBEAT_SECONDS,
+                        deadline - loop.time(),
+                    )
+                    if timeout <= 0:
+                        break
+
+                    done, _ = await asyncio.wait(
+                        {changed, disconnected},
+                        timeout=timeout,
+                        return_when=asyncio.FIRST_COMPLETED,
+                    )
+                    if disconnected in done:
+                        return
+
+                    body = KEEPALIVE
+                    if changed in done:
+                        body = CHANGED_EVENT
+                        changed = loop.create_task(queue.get())
+
+                    await send({
+                        'type': 'http.response.body',
+                        'body': body,
+                        'more_body': True,
+                    })
+
+                await send({'type': 'http.response.body', 'body': b''})
+            finally:
+                disconnected.cancel()
+                changed.cancel()
@@ -0,0 +1,195 @@
+"""
+Model fields
+"""
+import hashlib
+import os
+from functools import partial
+
+from django.db import models, transaction
+from django.db.models import signals
+from django.db.models.fields.files import ImageFieldFile
+
+
+def content_digest(content):
+    """Return the SHA-256 hex digest of a file, reading it in chunks.
+
+    Uploads hashed by core.uploadhandlers while they were received carry
+    their digest already and are not read again.
+    """
+    digest = getattr(content, 'sha256', None)
+    if digest is None:
+        sha256 = hashlib.sha256()
+        for chunk in content.chunks():
+            sha256.update(chunk)
+        digest = sha256.hexdigest()
+        content.sha256 = digest
+
+    if hasattr(content, 'seek'):
+        content.seek(0)
+
+    return digest
+
+
+class ContentAddressedFieldFile(ImageFieldFile):
+    """Image file stored once per distinct content"""
+
+    def _reference(self, blob):
+        """Take a reference to a blob, returns False if it is gone.
+
+        The instance holds a reference to its stored file already, which
+        is kept rather than taking another one.
+        """
+        from core.models import ImageBlob
+
+        stored = self.instance.__dict__.get(self.field.stored_name_attname)
+        if blob.name == stored:
+            return True
+
+        return ImageBlob.objects.acquire(blob.pk)
+
+    def _acquire_blob(self, digest):
+        """Return the stored blob with the digest, taking a reference"""
+        from core.models import ImageBlob
+
+        blob = ImageBlob.objects.filter(digest=digest).first()
+
+        # The blob may be collected between the lookup and taking the
+        # reference, in which case the update matches no rows.
+        if (blob is None or not self.storage.exists(blob.name)
+                or not self._reference(blob)):
+            return None
+
+        return blob
+
+    def _track(self, name, digest, size):
+        """Return the blob of a file just stored, taking a reference.
+
+        When a blob has the content already, e.g. one stored by a
+        concurrent upload, its file is used and this one is deleted once
+        the transaction commits.
+        """
+        from core.models import ImageBlob
+
+        while True:
+            blob, created = ImageBlob.objects.get_or_create(
+                digest=digest, defaults={'name': name, 'size': size}
+            )
+            duplicate = not created and blob.name != name
+            if duplicate and not self.storage.exists(blob.name):
+                # The file of the blob is gone, this one replaces it.
+                ImageBlob.objects.filter(pk=blob.pk).update(
+                    name=name, size=size
+                )
+                blob.name = name
+                duplicate = False
+
+            # Collected since it was read, in which case it is created
+            # again.
+            if self._reference(blob):
+                break
+
+        if duplicate:
+            transaction.on_commit(partial(self.storage.delete, name))
+
+        return blob
+
+    def _set_name(self, name, save):
+        self.name = name
+        setattr(self.instance, self.field.attname, self.name)
+        self._committed = True
+
+        if save:
+            self.instance.save()
+
+    def save(self, name, content, save=True):
+        digest = content_digest(content)
+        blob = self._acquire_blob(digest)
+        if blob is None:
+            ext = os.path.splitext(name)[1].lower()
+            name = self.field.generate_filename(
+                self.instance, f'{digest}{ext}'
+            )
+            name = self.storage.save(
+                name, content, max_length=self.field.max_length
+            )
+            blob = self._track(name, digest, content.size)
+
+        self._set_name(blob.name, save)
+    save.alters_data = True
+
+    def adopt(self, name, save=True):
+        """Use a file already in the storage, e.g. uploaded directly.
+
+        The file is tracked by a blob like a saved one. When the same
+        content is stored already, that file is used and this one is
+        deleted once the transaction commits. Adopting the instance's
+        own file again takes no further reference.
+        """
+        with self.storage.open(name) as content:
+            digest = content_digest(content)
+        blob = self._acquire_blob(digest)
+        if blob is None:
+            blob = self._track(name, digest, self.storage.size(name))
+        elif blob.name != name:
+            transaction.on_commit(partial(self.storage.delete, name))
+
+        self._set_name(blob.name, save)
+    adopt.alters_data = True
+
+    def delete(self, save=True):
+        """Release the file, it is deleted once nothing else uses it"""
+        from core.signals import release_images
+
+        if not self:
+            return
+
+        release_images(self.storage, [self.name])
+        if hasattr(self, '_file'):
+            self.close()
+            del self.file
+        self.name = None
+        setattr(self.instance, self.field.attname, self.name)
+        self._committed = False
+        self.instance.__dict__[self.field.stored_name_attname] = None
+
+        if save:
+            self.instance.save()
+    delete.alters_data = True
+
+
+class ContentAddressedImageField(models.ImageField):
+    """Image field storing files under the digest of their content.
+
+    Identical uploads share one file, tracked by an ImageBlob with a
+    reference count. Files no longer referenced are deleted once the
+    transaction releasing them commits.
+    """
+    attr_class = ContentAddressedFieldFile
+
+    @property
+    def stored_name_attname(self):
+        return f'_{self.attname}_stored'
+
+    def contribute_to_class(self, cls, name, **kwargs):
+        super().contribute_to_class(cls, name, **kwargs)
+        if not cls._meta.abstract:
+            signals.post_init.connect(self._remember_name, sender=cls)
+
+    def _remember_name(self, instance, **kwargs):
+        """Keep the stored name, to release it when the file changes"""
+        name = instance.__dict__.get(self.attname)
+        instance.__dict__[self.stored_name_attname] = (
+            name if isinstance(name, str) and name else None
+        )
+
+    def pre_save(self, model_instance, add):
+        from core.signals import release_images
+
+        file = super().pre_save(model_instance, add)
+        stored = model_instance.__dict__.get(self.stored_name_attname)
+        if stored and stored != file.name:
+            release_images(file.storage, [stored])
+
+        model_instance.__dict__[self.stored_name_attname] = file.name or None
+
+        return file
@@ -0,0 +1,177 @@
+"""
+Password hashers and the bounded password hashing pool
+"""
+import base64
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import (
+    Argon2PasswordHasher,
+    BasePasswordHasher,
+    PBKDF2PasswordHasher,
+    get_hasher,
+    identify_hasher,
+    mask_hash,
+    must_update_salt,
+)
+from django.utils.crypto import constant_time_compare
+from django.utils.translation import gettext_lazy as _
+
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+
+class TunedPBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """PBKDF2 hasher with the iteration count taken from settings"""
+    iterations = settings.PBKDF2_ITERATIONS
+
+
+class TunedArgon2PasswordHasher(Argon2PasswordHasher):
+    """Argon2 hasher with the cost parameters taken from settings"""
+    time_cost = settings.ARGON2_TIME_COST
+    memory_cost = settings.ARGON2_MEMORY_COST
+    parallelism = settings.ARGON2_PARALLELISM
+
+
+class ScryptPasswordHasher(BasePasswordHasher):
+    """Secure password hashing using the scrypt algorithm.
+
+    Uses the same encoded format as the hasher added in Django 4.0 so
+    stored hashes keep working after upgrading.
+    """
+    algorithm = 'scrypt'
+    work_factor = settings.SCRYPT_WORK_FACTOR
+    block_size = settings.SCRYPT_BLOCK_SIZE
+    parallelism = settings.SCRYPT_PARALLELISM
+
+    def encode(self, password, salt, n=None, r=None, p=None):
+        assert password is not None
+        assert salt and '$' not in salt
+        n = n or self.work_factor
+        r = r or self.block_size
+        p = p or self.parallelism
+        hash_ = hashlib.scrypt(
+            password.encode(),
+            salt=salt.encode(),
+            n=n,
+            r=r,
+            p=p,
+            maxmem=256 * n * r,
+            dklen=64,
+        )
+        hash_ = base64.b64encode(hash_).decode('ascii').strip()
+        return '%s$%d$%s$%d$%d$%s' % (self.algorithm, n, salt, r, p, hash_)
+
+    def decode(self, encoded):
+        algorithm, work_factor, salt, block_size, parallelism, hash_ = (
+            encoded.split('$', 6))
+        assert algorithm == self.algorithm
+        return {
+            'algorithm': algorithm,
+            'work_factor': int(work_factor),
+            'salt': salt,
+            'block_size': int(block_size),
+            'parallelism': int(parallelism),
+            'hash': hash_,
+        }
+
+    def verify(self, password, encoded):
+        decoded = self.decode(encoded)
+        encoded_2 = self.encode(
+            password,
+            decoded['salt'],
+            decoded['work_factor'],
+            decoded['block_size'],
+            decoded['parallelism'],
+        )
+        return constant_time_compare(encoded, encoded_2)
+
+    def safe_summary(self, encoded):
+        decoded = self.decode(encoded)
+        return {
+            _('algorithm'): decoded['algorithm'],
+            _('work factor'): decoded['work_factor'],
+            _('block size'): decoded['block_size'],
+            _('parallelism'): decoded['parallelism'],
+            _('salt'): mask_hash(decoded['salt']),
+            _('hash'): mask_hash(decoded['hash']),
+        }
+
+    def must_update(self, encoded):
+        decoded = self.decode(encoded)
+        return (
+            decoded['work_factor'] != self.work_factor
+            or decoded['block_size'] != self.block_size
+            or decoded['parallelism'] != self.parallelism
+            or must_update_salt(decoded['salt'], self.salt_entropy)
+        )
+
+    def harden_runtime(self, password, encoded):
+        # The runtime for scrypt is too complicated to emulate.
+        pass
+
+
+def password_needs_rehash(encoded):
+    """Return whether the encoded password uses outdated hashing"""
+    preferred = get_hasher('default')
+    try:
+        hasher = identify_hasher(encoded)
+    except ValueError:
+        return False
+
+    return (hasher.algorithm != preferred.algorithm
+            or preferred.must_update(encoded))
+
+
+class PasswordHashingBusy(APIException):
+    """Raised when the password hashing pool is saturated"""
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = _('Too many sign in attempts, try again shortly.')
+    default_code = 'password_hashing_busy'
+
+
+_pool = None
+_pool_slots = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool():
+    """Return the hashing pool, creating it in the current process"""
+    global _pool, _pool_slots
+
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool_slots = threading.BoundedSemaphore(
+                    settings.PASSWORD_HASHING_QUEUE_SIZE
+                )
+                _pool = ThreadPoolExecutor(
+                    max_workers=settings.PASSWORD_HASHING_WORKERS,
+                    thread_name_prefix='password-hashing',
+                )
+
+    return _pool, _pool_slots
+
+
+def run_in_hashing_pool(func, *args):
+    """Run a CPU bound hashing function in the bounded hashing pool.
+
+    At most PASSWORD_HASHING_QUEUE_SIZE calls are running or queued at
+    once. Callers that can't get a slot within PASSWORD_HASHING_TIMEOUT
+    seconds get PasswordHashingBusy instead of piling up behind them.
+    The pool and its limits belong to the current process, each server
+    process hashes up to PASSWORD_HASHING_WORKERS passwords at a time.
+    """
+    if not settings.PASSWORD_HASHING_WORKERS:
+        return func(*args)
+
+    pool, slots = _get_pool()
+    if not slots.acquire(timeout=settings.PASSWORD_HASHING_TIMEOUT):
+        raise PasswordHashingBusy()
+
+    try:
+        return pool.submit(func, *args).result()
+    finally:
+        slots.release()
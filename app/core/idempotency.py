@@ -0,0 +1,164 @@
+"""
+Idempotent handling of retried API requests
+"""
+import functools
+import hashlib
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from drf_spectacular.utils import OpenApiParameter, OpenApiTypes
+from rest_framework import status
+from rest_framework.response import Response
+
+from core.fields import content_digest
+from core.models import IdempotencyKey
+
+
+IDEMPOTENCY_KEY_HEADER = 'Idempotency-Key'
+
+IDEMPOTENCY_KEY_PARAMETER = OpenApiParameter(
+    IDEMPOTENCY_KEY_HEADER,
+    OpenApiTypes.STR,
+    location=OpenApiParameter.HEADER,
+    description=(
+        'Unique key for the request. Retries with the same key within '
+        'IDEMPOTENCY_KEY_TTL seconds return the first response.'
+    ),
+)
+
+# Response headers stored with the response and replayed with it.
+REPLAYED_HEADERS = ['Content-Location', 'ETag', 'Location']
+
+
+def _encode_value(value):
+    """Encode uploaded files by their content"""
+    if hasattr(value, 'chunks'):
+        return content_digest(value)
+
+    return str(value)
+
+
+def request_fingerprint(request):
+    """Return a hash of the method, path and data of a request"""
+    data = request.data
+    if hasattr(data, 'lists'):
+        data = dict(data.lists())
+
+    payload = json.dumps(
+        [request.method, request.path, data],
+        sort_keys=True,
+        default=_encode_value,
+    )
+
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _claim(user, key, fingerprint):
+    """Claim a key for a request, returns the record and if it was claimed"""
+    now = timezone.now()
+    locked_until = now + timedelta(seconds=settings.IDEMPOTENCY_LOCK_SECONDS)
+    for retry in (False, True):
+        try:
+            with transaction.atomic():
+                record = IdempotencyKey.objects.create(
+                    user=user, key=key, fingerprint=fingerprint,
+                    expires_at=locked_until,
+                )
+                return record, True
+        except IntegrityError:
+            pass
+
+        # The request holding the key may have failed and deleted it
+        # since, in which case the key is claimed again.
+        try:
+            record = IdempotencyKey.objects.get(user=user, key=key)
+            break
+        except IdempotencyKey.DoesNotExist:
+            if retry:
+                raise
+
+    # Expired responses, and requests that died while being processed.
+    claimed = IdempotencyKey.objects.filter(
+        pk=record.pk, expires_at__lte=now
+    ).update(
+        fingerprint=fingerprint, status_code=None, response=None,
+        headers={}, expires_at=locked_until,
+    )
+    if claimed:
+        record.fingerprint = fingerprint
+        record.status_code = None
+
+    return record, bool(claimed)
+
+
+def idempotent(view_method):
+    """Replay the first response to requests retried with the same key.
+
+    Keys are scoped to the user. The status, data and REPLAYED_HEADERS
+    of the response are replayed. Retrying a request still in progress
+    returns 409, reusing a key for a different request returns 422.
+    Server errors are not stored, so the request can be retried.
+    """
+    @functools.wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.headers.get(IDEMPOTENCY_KEY_HEADER)
+        if not key:
+            return view_method(self, request, *args, **kwargs)
+
+        if len(key) > IdempotencyKey._meta.get_field('key').max_length:
+            return Response(
+                {'detail': f'{IDEMPOTENCY_KEY_HEADER} is too long.'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        fingerprint = request_fingerprint(request)
+        record, claimed = _claim(request.user, key, fingerprint)
+        if not claimed:
+            if record.fingerprint != fingerprint:
+                return Response(
+                    {'detail': f'{IDEMPOTENCY_KEY_HEADER} was used for '
+                               f'another request.'},
+                    status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                )
+
+            if record.status_code is None:
+                return Response(
+                    {'detail': 'A request with this '
+                               f'{IDEMPOTENCY_KEY_HEADER} is in progress.'},
+                    status=status.HTTP_409_CONFLICT,
+                )
+
+            return Response(
+                record.response,
+                status=record.status_code,
+                headers={**record.headers, 'Idempotent-Replayed': 'true'},
+            )
+
+        try:
+            response = view_method(self, request, *args, **kwargs)
+        except Exception:
+            record.delete()
+            raise
+
+        if response.status_code >= 500:
+            record.delete()
+        else:
+            IdempotencyKey.objects.filter(pk=record.pk).update(
+                status_code=response.status_code,
+                response=response.data,
+                headers={
+                    name: response[name] for name in REPLAYED_HEADERS
+                    if response.has_header(name)
+                },
+                expires_at=timezone.now() + timedelta(
+                    seconds=settings.IDEMPOTENCY_KEY_TTL
+                ),
+            )
+
+        return response
+
+    return wrapper
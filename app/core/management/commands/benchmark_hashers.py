@@ -0,0 +1,67 @@
+"""
+Django command to benchmark the configured password hashers
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import get_hashers
+from django.core.management.base import BaseCommand
+
+from core.hashers import run_in_hashing_pool
+
+
+class Command(BaseCommand):
+    """Django command to measure password verifications per second"""
+    help = 'Benchmark logins per second per core for each password hasher.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=settings.PASSWORD_HASHING_WORKERS,
+        )
+
+    def _verifications_per_second(self, hasher, encoded, iterations):
+        """Return single threaded verifications per second"""
+        start = time.perf_counter()
+        for _ in range(iterations):
+            hasher.verify('testpass123', encoded)
+
+        return iterations / (time.perf_counter() - start)
+
+    def _pooled_per_second(self, hasher, encoded, iterations, concurrency):
+        """Return verifications per second through the hashing pool"""
+        def verify(_):
+            return run_in_hashing_pool(hasher.verify, 'testpass123', encoded)
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as clients:
+            list(clients.map(verify, range(iterations)))
+
+        return iterations / (time.perf_counter() - start)
+
+    def handle(self, *args, **options):
+        iterations = options['iterations']
+        concurrency = max(options['concurrency'], 1)
+        self.stdout.write(
+            f'{"hasher":<16}{"per core/s":>12}{"pooled/s":>12}'
+        )
+
+        for hasher in get_hashers():
+            try:
+                encoded = hasher.encode('testpass123', hasher.salt())
+            except ValueError as exc:
+                self.stdout.write(f'{hasher.algorithm:<16}skipped: {exc}')
+                continue
+
+            per_core = self._verifications_per_second(
+                hasher, encoded, iterations
+            )
+            pooled = self._pooled_per_second(
+                hasher, encoded, iterations, concurrency
+            )
+            self.stdout.write(
+                f'{hasher.algorithm:<16}{per_core:>12.1f}{pooled:>12.1f}'
+            )
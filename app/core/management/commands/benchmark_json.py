@@ -0,0 +1,86 @@
+"""
+Django command to benchmark the JSON renderers and parsers
+"""
+import io
+import time
+from datetime import datetime, timezone
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from core.renderers import FastJSONRenderer, FastJSONParser
+
+
+def build_payload(recipes, related):
+    """Build a recipe list payload shaped like the list endpoint output"""
+    created = datetime(2024, 7, 12, 16, 0, tzinfo=timezone.utc)
+    return [
+        {
+            'id': i,
+            'title': f'Recipe {i} with a reasonably long title',
+            'time_minutes': i % 120,
+            'price': Decimal('12.50'),
+            'link': f'https://example.com/recipes/{i}.pdf',
+            'description': 'Mix everything together and bake. ' * 10,
+            'created': created,
+            'tags': [
+                {'id': j, 'name': f'Tag {j}'} for j in range(related)
+            ],
+            'ingredients': [
+                {'id': j, 'name': f'Ingredient {j}'} for j in range(related)
+            ],
+        }
+        for i in range(recipes)
+    ]
+
+
+class Command(BaseCommand):
+    """Django command to compare JSON renderer and parser throughput"""
+    help = 'Benchmark the stdlib and fast JSON renderers and parsers.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=1000)
+        parser.add_argument('--related', type=int, default=5)
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def _time(self, func, repeat):
+        """Return the best time in seconds of `repeat` calls to `func`"""
+        best = float('inf')
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            best = min(best, time.perf_counter() - start)
+
+        return best
+
+    def handle(self, *args, **options):
+        payload = build_payload(options['recipes'], options['related'])
+        repeat = options['repeat']
+        self.stdout.write(
+            f'Payload: {options["recipes"]} recipes, '
+            f'{options["related"]} tags/ingredients each'
+        )
+
+        rendered = JSONRenderer().render(payload)
+        self.stdout.write(f'Rendered size: {len(rendered)} bytes')
+
+        results = (
+            ('render', 'stdlib', JSONRenderer().render),
+            ('render', 'fast', FastJSONRenderer().render),
+        )
+        for kind, name, render in results:
+            seconds = self._time(lambda: render(payload), repeat)
+            self.stdout.write(f'{kind:<8}{name:<8}{seconds * 1000:10.2f} ms')
+
+        results = (
+            ('parse', 'stdlib', JSONParser().parse),
+            ('parse', 'fast', FastJSONParser().parse),
+        )
+        for kind, name, parse in results:
+            seconds = self._time(
+                lambda: parse(io.BytesIO(rendered)), repeat
+            )
+            self.stdout.write(f'{kind:<8}{name:<8}{seconds * 1000:10.2f} ms')
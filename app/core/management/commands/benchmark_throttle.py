@@ -0,0 +1,76 @@
+"""
+Django command to benchmark the request throttles
+"""
+import time
+import uuid
+from types import SimpleNamespace
+
+from django.core.management.base import BaseCommand
+
+from rest_framework.throttling import AnonRateThrottle, UserRateThrottle
+
+from core.throttling import AnonSlidingRateThrottle, UserSlidingRateThrottle
+
+
+THROTTLES = [
+    ('drf user', UserRateThrottle),
+    ('sliding user', UserSlidingRateThrottle),
+    ('drf anon', AnonRateThrottle),
+    ('sliding anon', AnonSlidingRateThrottle),
+]
+
+
+class Command(BaseCommand):
+    """Django command to measure the time throttles add to a request"""
+    help = (
+        'Time checking throttles for one client, against the configured '
+        'caches.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=5000)
+
+    def _request(self, authenticated):
+        """Return a request from a client not seen before"""
+        ident = uuid.uuid4().hex
+        return SimpleNamespace(
+            user=SimpleNamespace(is_authenticated=authenticated, pk=ident),
+            META={'REMOTE_ADDR': ident},
+        )
+
+    def _cleanup(self, throttle):
+        """Delete the cache keys the benchmark created"""
+        keys = [throttle.key]
+        if hasattr(throttle, '_window_keys'):
+            window = int(throttle.timer() // throttle.duration)
+            keys += throttle._window_keys(window)
+
+        throttle.cache.delete_many(keys)
+
+    def _microseconds(self, throttle_class, requests):
+        """Return the average microseconds spent per request"""
+        # High enough to never throttle, every request is recorded.
+        throttle_class = type(
+            throttle_class.__name__,
+            (throttle_class,),
+            {'rate': f'{requests * 2}/hour'},
+        )
+        request = self._request(
+            authenticated=throttle_class.scope == 'user'
+        )
+
+        start = time.perf_counter()
+        for _ in range(requests):
+            throttle = throttle_class()
+            throttle.allow_request(request, None)
+        elapsed = time.perf_counter() - start
+
+        self._cleanup(throttle)
+        return elapsed / requests * 1e6
+
+    def handle(self, *args, **options):
+        requests = options['requests']
+        self.stdout.write(f'{"throttle":<16}{"us/request":>12}')
+        for label, throttle_class in THROTTLES:
+            microseconds = self._microseconds(throttle_class, requests)
+            self.stdout.write(f'{label:<16}{microseconds:>12.1f}')
@@ -0,0 +1,80 @@
+"""
+Django command to benchmark deleting a user with many recipes
+"""
+import time
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from core.deletion import delete_user
+from core.models import Ingredient, Recipe, Tag
+
+
+class Command(BaseCommand):
+    """Django command to time deleting a user and everything they own"""
+    help = (
+        'Create a user with many tagged recipes and time deleting them in '
+        'chunks, and optionally with the Django collector.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=100000)
+        parser.add_argument('--chunk-size', type=int, default=None)
+        parser.add_argument(
+            '--collector',
+            action='store_true',
+            help='Also time deleting the user with Model.delete().',
+        )
+
+    def create_user(self, email, recipes, batch_size=5000):
+        """Create a user owning recipes, each with a tag and ingredient"""
+        user = get_user_model().objects.create_user(email)
+        tag = Tag.objects.create(user=user, name='Tag')
+        ingredient = Ingredient.objects.create(user=user, name='Ingredient')
+
+        for start in range(0, recipes, batch_size):
+            count = min(batch_size, recipes - start)
+            Recipe.objects.bulk_create(
+                Recipe(
+                    user=user, title=f'Recipe {start + index}',
+                    time_minutes=5, price=Decimal('5.00'),
+                )
+                for index in range(count)
+            )
+            # Not every backend returns the primary keys of bulk inserts.
+            pks = list(Recipe.objects.filter(user=user).order_by(
+                '-pk'
+            ).values_list('pk', flat=True)[:count])
+            for field, related in (('tags', tag), ('ingredients', ingredient)):
+                through = Recipe._meta.get_field(field).remote_field.through
+                through.objects.bulk_create(
+                    through(**{
+                        'recipe_id': pk,
+                        f'{type(related)._meta.model_name}_id': related.pk,
+                    })
+                    for pk in pks
+                )
+
+        return user
+
+    def _time(self, label, delete, user):
+        start = time.perf_counter()
+        delete(user)
+        elapsed = time.perf_counter() - start
+        self.stdout.write(f'{label:<12}{elapsed:>10.2f} s')
+
+    def handle(self, *args, **options):
+        recipes = options['recipes']
+        self.stdout.write(f'Deleting a user with {recipes} recipes:')
+
+        user = self.create_user('benchmark-chunked@example.com', recipes)
+        self._time(
+            'chunked',
+            lambda user: delete_user(user, options['chunk_size']),
+            user,
+        )
+
+        if options['collector']:
+            user = self.create_user('benchmark-collector@example.com', recipes)
+            self._time('collector', lambda user: user.delete(), user)
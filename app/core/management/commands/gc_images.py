@@ -0,0 +1,82 @@
+"""
+Django command to delete recipe images no longer in use
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+from django.utils import timezone
+
+from core.models import ImageBlob, Recipe
+
+
+class Command(BaseCommand):
+    """Django command to garbage collect stored images.
+
+    Images are shared between recipes with the same content, so a file is
+    only deleted once no recipe references it, and only after a grace
+    period so uploads taking a new reference are not raced. Files not
+    tracked by a blob are reclaimed by reclaim_media.
+    """
+    help = 'Delete stored recipe images no recipe references.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--grace',
+            type=int,
+            default=settings.IMAGE_GC_GRACE_SECONDS,
+            help='Keep unreferenced images younger than this many seconds.',
+        )
+        parser.add_argument(
+            '--recount',
+            action='store_true',
+            help=(
+                'Recompute reference counts from the recipes first. Run it '
+                'when no images are being uploaded.'
+            ),
+        )
+        parser.add_argument('--dry-run', action='store_true')
+
+    def _references(self):
+        """Return the number of recipes using each image"""
+        return dict(
+            Recipe.objects.exclude(image__isnull=True).exclude(image='')
+            .values_list('image').annotate(refs=Count('id')).order_by()
+        )
+
+    def recount(self, dry_run):
+        """Set the reference counts to the number of recipes using blobs"""
+        references = self._references()
+        fixed = 0
+        for pk, name, ref_count in ImageBlob.objects.values_list(
+                'pk', 'name', 'ref_count').iterator():
+            refs = references.get(name, 0)
+            if refs != ref_count:
+                fixed += 1
+                if not dry_run:
+                    ImageBlob.objects.filter(pk=pk).update(ref_count=refs)
+
+        return fixed
+
+    def handle(self, *args, **options):
+        storage = Recipe._meta.get_field('image').storage
+        dry_run = options['dry_run']
+        cutoff = timezone.now() - timedelta(seconds=options['grace'])
+
+        if options['recount']:
+            fixed = self.recount(dry_run)
+            self.stdout.write(f'Fixed {fixed} reference counts.')
+
+        if dry_run:
+            names = list(ImageBlob.objects.filter(
+                ref_count=0, created_at__lt=cutoff
+            ).values_list('name', flat=True))
+        else:
+            names = ImageBlob.objects.collect(storage, created_before=cutoff)
+
+        for name in names:
+            self.stdout.write(name)
+
+        verb = 'Would delete' if dry_run else 'Deleted'
+        self.stdout.write(self.style.SUCCESS(f'{verb} {len(names)} images.'))
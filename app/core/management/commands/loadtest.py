@@ -0,0 +1,84 @@
+"""
+Django command to load test a running deployment
+"""
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.error import HTTPError, URLError
+from urllib.request import Request, urlopen
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    """Django command to measure throughput at increasing concurrency"""
+    help = (
+        'Send requests to a running deployment at each concurrency level '
+        'and report throughput, latency and errors. Run it against the '
+        'uWSGI and the ASGI deployment to compare them.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('url')
+        parser.add_argument('--concurrency', default='1,10,50,100')
+        parser.add_argument('--requests', type=int, default=500)
+        parser.add_argument('--token', default='')
+        parser.add_argument('--timeout', type=float, default=30)
+
+    def _request(self, url, headers, timeout):
+        """Send one request, return its status and latency in seconds"""
+        start = time.perf_counter()
+        try:
+            request = Request(url, headers=headers)
+            with urlopen(request, timeout=timeout) as response:
+                response.read()
+                status = response.status
+        except HTTPError as exc:
+            status = exc.code
+        except (URLError, OSError):
+            status = None
+
+        return status, time.perf_counter() - start
+
+    def _run(self, url, headers, timeout, concurrency, requests):
+        """Return the results of sending requests with the concurrency"""
+        def send(_):
+            return self._request(url, headers, timeout)
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as clients:
+            results = list(clients.map(send, range(requests)))
+
+        return results, time.perf_counter() - start
+
+    def handle(self, *args, **options):
+        try:
+            levels = [int(c) for c in options['concurrency'].split(',')]
+        except ValueError:
+            raise CommandError('--concurrency must be a list of integers.')
+
+        headers = {'Accept': 'application/json'}
+        if options['token']:
+            headers['Authorization'] = f'Token {options["token"]}'
+
+        self.stdout.write(
+            f'{"clients":>8}{"req/s":>10}{"p50 ms":>10}{"p95 ms":>10}'
+            f'{"errors":>8}'
+        )
+        for concurrency in levels:
+            requests = max(options['requests'], concurrency)
+            results, elapsed = self._run(
+                options['url'], headers, options['timeout'],
+                concurrency, requests,
+            )
+
+            latencies = sorted(latency for _, latency in results)
+            p95 = latencies[int((len(latencies) - 1) * 0.95)]
+            errors = sum(
+                1 for status, _ in results if status is None or status >= 500
+            )
+            self.stdout.write(
+                f'{concurrency:>8}{requests / elapsed:>10.1f}'
+                f'{statistics.median(latencies) * 1000:>10.1f}'
+                f'{p95 * 1000:>10.1f}{errors:>8}'
+            )
@@ -0,0 +1,203 @@
+"""
+Django command to hash partition the recipe tables by user
+"""
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+from core.models import Recipe
+
+
+class Command(BaseCommand):
+    """Django command to convert the recipe tables to partitioned tables.
+
+    core_recipe is partitioned by user and its many to many tables by
+    recipe, so queries scoped to a user only touch one partition. A
+    primary key of a partitioned table must include the partition key,
+    so foreign keys referencing core_recipe are dropped. Django deletes
+    related rows itself, so this does not change behavior. Other indexes
+    of the tables, e.g. search indexes, are created on the new tables.
+    """
+    help = 'Hash partition core_recipe by user_id (PostgreSQL only).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+        parser.add_argument('--partitions', type=int, default=16)
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Print the SQL instead of running it.',
+        )
+
+    def _tables(self):
+        """Return the models to partition with their partition key"""
+        tables = [(Recipe, Recipe._meta.get_field('user').column)]
+        for field in Recipe._meta.many_to_many:
+            through = field.remote_field.through
+            tables.append((through, field.m2m_column_name()))
+
+        return tables
+
+    def _indexes(self, connection, model):
+        """Return the name and definition of the table's other indexes.
+
+        These are the indexes not backing a constraint nor on a single
+        foreign key column, e.g. the search indexes of migrations, which
+        the partitioned table would otherwise lose.
+        """
+        if connection.vendor != 'postgresql':
+            return []
+
+        columns = [
+            field.column for field in model._meta.concrete_fields
+            if field.is_relation
+        ]
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT c.relname, pg_get_indexdef(i.indexrelid) '
+                'FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid '
+                'WHERE i.indrelid = %s::regclass AND NOT EXISTS ('
+                '  SELECT 1 FROM pg_constraint k '
+                '  WHERE k.conindid = i.indexrelid'
+                ') AND NOT ('
+                '  i.indnatts = 1 AND NOT i.indisunique'
+                '  AND i.indexprs IS NULL AND i.indpred IS NULL'
+                '  AND (SELECT a.attname::text FROM pg_attribute a'
+                '       WHERE a.attrelid = i.indrelid'
+                '       AND a.attnum = i.indkey[0]) = ANY(%s)'
+                ') ORDER BY c.relname',
+                [model._meta.db_table, columns],
+            )
+            return cursor.fetchall()
+
+    def _partition_sql(self, model, key, partitions, qn, indexes=()):
+        """Return the statements partitioning the model's table"""
+        table = model._meta.db_table
+        old = f'{table}_unpartitioned'
+        sequence = f'{table}_{model._meta.pk.column}_seq'
+
+        sql = [
+            f'ALTER TABLE {qn(table)} RENAME TO {qn(old)}',
+            f'ALTER SEQUENCE {qn(sequence)} OWNED BY NONE',
+            f'CREATE TABLE {qn(table)} '
+            f'(LIKE {qn(old)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS) '
+            f'PARTITION BY HASH ({qn(key)})',
+        ]
+        for remainder in range(partitions):
+            sql.append(
+                f'CREATE TABLE {qn(f"{table}_p{remainder}")} '
+                f'PARTITION OF {qn(table)} FOR VALUES WITH '
+                f'(MODULUS {partitions}, REMAINDER {remainder})'
+            )
+
+        sql.append(
+            f'ALTER TABLE {qn(table)} ADD PRIMARY KEY '
+            f'({qn(model._meta.pk.column)}, {qn(key)})'
+        )
+
+        leading = set()
+        for fields in model._meta.unique_together:
+            columns = [model._meta.get_field(name).column for name in fields]
+            if key not in columns:
+                raise CommandError(
+                    f'Unique constraint on {table} {columns} does not '
+                    f'include the partition key {key}.'
+                )
+            leading.add(columns[0])
+            sql.append(
+                f'ALTER TABLE {qn(table)} ADD UNIQUE '
+                f'({", ".join(qn(column) for column in columns)})'
+            )
+
+        for field in model._meta.concrete_fields:
+            if not field.is_relation or field.column in leading:
+                continue
+
+            sql.append(
+                f'CREATE INDEX {qn(f"{table}_{field.column}_idx")} '
+                f'ON {qn(table)} ({qn(field.column)})'
+            )
+            if field.related_model is Recipe:
+                continue
+
+            target = field.target_field
+            sql.append(
+                f'ALTER TABLE {qn(table)} ADD CONSTRAINT '
+                f'{qn(f"{table}_{field.column}_fk")} '
+                f'FOREIGN KEY ({qn(field.column)}) REFERENCES '
+                f'{qn(target.model._meta.db_table)} ({qn(target.column)}) '
+                f'DEFERRABLE INITIALLY DEFERRED'
+            )
+
+        # The old table keeps the names of its indexes until dropped.
+        for name, definition in indexes:
+            create = definition.split(' ON ', 1)[0]
+            using = definition.split(' USING ', 1)[1]
+            sql += [
+                f'DROP INDEX {qn(name)}',
+                f'{create} ON {qn(table)} USING {using}',
+            ]
+
+        sql += [
+            f'INSERT INTO {qn(table)} SELECT * FROM {qn(old)}',
+            f'ALTER SEQUENCE {qn(sequence)} OWNED BY '
+            f'{qn(table)}.{qn(model._meta.pk.column)}',
+        ]
+
+        return sql, old
+
+    def handle(self, *args, **options):
+        connection = connections[options['database']]
+        partitions = options['partitions']
+        if partitions < 2:
+            raise CommandError('--partitions must be at least 2.')
+
+        if not options['dry_run']:
+            if connection.vendor != 'postgresql':
+                raise CommandError(
+                    'Partitioning is only supported on PostgreSQL.'
+                )
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    'SELECT 1 FROM pg_partitioned_table '
+                    'WHERE partrelid = %s::regclass',
+                    [Recipe._meta.db_table],
+                )
+                if cursor.fetchone():
+                    raise CommandError(
+                        f'{Recipe._meta.db_table} is already partitioned.'
+                    )
+
+        statements = []
+        old_tables = []
+        for model, key in self._tables():
+            sql, old = self._partition_sql(
+                model, key, partitions, connection.ops.quote_name,
+                self._indexes(connection, model),
+            )
+            statements += sql
+            old_tables.append(old)
+
+        # Drops the foreign keys still referencing the old recipe table.
+        statements += [
+            f'DROP TABLE {connection.ops.quote_name(old)} CASCADE'
+            for old in reversed(old_tables)
+        ]
+        statements += [
+            f'ANALYZE {connection.ops.quote_name(model._meta.db_table)}'
+            for model, _ in self._tables()
+        ]
+
+        if options['dry_run']:
+            for sql in statements:
+                self.stdout.write(f'{sql};')
+            return
+
+        with transaction.atomic(using=options['database']):
+            with connection.cursor() as cursor:
+                for sql in statements:
+                    cursor.execute(sql)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Partitioned {len(old_tables)} tables into {partitions} '
+            f'partitions each.'
+        ))
@@ -0,0 +1,25 @@
+"""
+Django command to delete expired idempotency keys
+"""
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core.deletion import delete_in_chunks
+from core.models import IdempotencyKey
+
+
+class Command(BaseCommand):
+    """Django command to delete idempotency keys past their expiry"""
+    help = 'Delete expired idempotency keys, a chunk at a time.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=None)
+
+    def handle(self, *args, **options):
+        deleted = delete_in_chunks(
+            IdempotencyKey.objects.filter(expires_at__lte=timezone.now()),
+            options['chunk_size'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Deleted {deleted} expired idempotency keys.'
+        ))
@@ -0,0 +1,87 @@
+"""
+Django command to delete media files no recipe references
+"""
+from datetime import timedelta
+from itertools import islice
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core.models import RECIPE_IMAGE_DIR, ImageBlob, Recipe
+from core.storage import iter_files
+
+
+def batched(iterable, size):
+    """Yield lists of up to size items"""
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+class Command(BaseCommand):
+    """Django command to reconcile the recipe images with the database.
+
+    Files are deleted when they are released, this catches files left
+    behind by failed deletions and by earlier releases. Storage is scanned
+    lazily and checked against the database a batch at a time.
+    """
+    help = 'Delete files under the recipe upload directory nothing uses.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--grace',
+            type=int,
+            default=settings.IMAGE_GC_GRACE_SECONDS,
+            help='Keep files younger than this many seconds.',
+        )
+        parser.add_argument('--dry-run', action='store_true')
+
+    def reclaim(self, storage, names, dry_run):
+        """Delete the unused files of a batch, returns their names"""
+        used = set(
+            Recipe.objects.filter(image__in=names)
+            .values_list('image', flat=True)
+        )
+        blobs = dict(
+            ImageBlob.objects.filter(name__in=names)
+            .values_list('name', 'ref_count')
+        )
+
+        # Referenced blobs without recipes are left to gc_images --recount.
+        unused = [
+            name for name in names
+            if name not in used and not blobs.get(name)
+        ]
+        if dry_run:
+            return unused
+
+        tracked = [name for name in unused if name in blobs]
+        reclaimed = ImageBlob.objects.collect(storage, names=tracked)
+        for name in unused:
+            if name not in blobs:
+                storage.delete(name)
+                reclaimed.append(name)
+
+        return reclaimed
+
+    def handle(self, *args, **options):
+        storage = Recipe._meta.get_field('image').storage
+        cutoff = timezone.now() - timedelta(seconds=options['grace'])
+        files = (
+            name for name, modified in iter_files(storage, RECIPE_IMAGE_DIR)
+            if modified < cutoff
+        )
+
+        scanned = reclaimed = 0
+        for names in batched(files, options['batch_size']):
+            scanned += len(names)
+            for name in self.reclaim(storage, names, options['dry_run']):
+                reclaimed += 1
+                self.stdout.write(name)
+
+        verb = 'Would delete' if options['dry_run'] else 'Deleted'
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb} {reclaimed} of {scanned} files.'
+        ))
@@ -0,0 +1,104 @@
+"""
+Django command to prepare the app for serving requests
+"""
+import hashlib
+import os
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.migrations.executor import MigrationExecutor
+
+
+FINGERPRINT_NAME = '.collectstatic-fingerprint'
+
+
+class Command(BaseCommand):
+    """Django command to wait for the database, collect static and migrate.
+
+    Runs everything in one process and skips collectstatic and migrate
+    when there is nothing to do.
+    """
+    help = (
+        'Wait for the database, then collect static files and migrate if '
+        'needed.'
+    )
+    # System checks import every model field dependency and resolve all
+    # URLs, they run in CI instead of on each container start.
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+        parser.add_argument('--timeout', type=float, default=60)
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Collect static files and migrate even if not needed.',
+        )
+
+    def static_fingerprint(self):
+        """Return a hash of the static source files and storage in use"""
+        digest = hashlib.sha256(settings.STATICFILES_STORAGE.encode())
+        files = []
+        for finder in finders.get_finders():
+            for path, storage in finder.list([]):
+                prefix = getattr(storage, 'prefix', None) or ''
+                stat = os.stat(storage.path(path))
+                files.append((
+                    os.path.join(prefix, path), stat.st_size, stat.st_mtime_ns
+                ))
+
+        for name, size, mtime in sorted(files):
+            digest.update(f'{name}\0{size}\0{mtime}\n'.encode())
+
+        return digest.hexdigest()
+
+    def _fingerprint_path(self):
+        return os.path.join(settings.STATIC_ROOT, FINGERPRINT_NAME)
+
+    def collectstatic_needed(self, fingerprint):
+        """Return whether the collected static files are outdated"""
+        manifest_name = getattr(staticfiles_storage, 'manifest_name', None)
+        if manifest_name and not staticfiles_storage.exists(manifest_name):
+            return True
+
+        try:
+            with open(self._fingerprint_path()) as fingerprint_file:
+                return fingerprint_file.read().strip() != fingerprint
+        except FileNotFoundError:
+            return True
+
+    def pending_migrations(self, database):
+        """Return the migrations not applied to the database yet"""
+        executor = MigrationExecutor(connections[database])
+        targets = executor.loader.graph.leaf_nodes()
+
+        return executor.migration_plan(targets)
+
+    def handle(self, *args, **options):
+        database = options['database']
+        call_command(
+            'wait_for_db', database=database, timeout=options['timeout'],
+            stdout=self.stdout,
+        )
+
+        fingerprint = self.static_fingerprint()
+        if options['force'] or self.collectstatic_needed(fingerprint):
+            call_command('collectstatic', interactive=False, verbosity=0)
+            with open(self._fingerprint_path(), 'w') as fingerprint_file:
+                fingerprint_file.write(fingerprint)
+            self.stdout.write('Collected static files.')
+        else:
+            self.stdout.write(
+                'Static files unchanged, skipping collectstatic.'
+            )
+
+        if options['force'] or self.pending_migrations(database):
+            call_command('migrate', database=database, interactive=False)
+        else:
+            self.stdout.write('No pending migrations, skipping migrate.')
+
+        self.stdout.write(self.style.SUCCESS('Ready to serve.'))
@@ -0,0 +1,103 @@
+"""
+Django command to report where app startup time goes
+"""
+import json
+import subprocess
+import sys
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+# Runs in a fresh interpreter so nothing is imported yet.
+PROBE = '''
+import json
+import time
+
+timings = {}
+start = time.perf_counter()
+
+from django.conf import settings
+settings.INSTALLED_APPS
+timings['settings'] = time.perf_counter() - start
+
+import django
+django.setup()
+timings['apps ready'] = time.perf_counter() - start
+
+from django.urls import get_resolver
+get_resolver()._populate()
+timings['url resolver'] = time.perf_counter() - start
+
+from django.core.wsgi import get_wsgi_application
+get_wsgi_application()
+timings['wsgi application'] = time.perf_counter() - start
+
+print(json.dumps(timings))
+'''
+
+
+def parse_importtime(output):
+    """Return (module, self us, cumulative us) for -X importtime output"""
+    modules = []
+    for line in output.splitlines():
+        if not line.startswith('import time:'):
+            continue
+
+        own, cumulative, name = line[len('import time:'):].split('|')
+        if not own.strip().isdigit():
+            continue
+
+        modules.append((name.strip(), int(own), int(cumulative)))
+
+    return modules
+
+
+class Command(BaseCommand):
+    """Django command to profile a cold start of the app"""
+    help = (
+        'Start the app in a fresh interpreter and report the time spent '
+        'importing modules, loading apps and building the URL resolver.'
+    )
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=20)
+
+    def _run_probe(self):
+        """Return the phase timings and import times of a cold start"""
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', PROBE],
+            capture_output=True,
+            text=True,
+        )
+        if result.returncode != 0:
+            raise CommandError(result.stderr.strip().splitlines()[-1])
+
+        return json.loads(result.stdout), parse_importtime(result.stderr)
+
+    def handle(self, *args, **options):
+        timings, modules = self._run_probe()
+        top = options['top']
+
+        self.stdout.write('Startup phases (ms since start):')
+        for phase, seconds in timings.items():
+            self.stdout.write(f'  {phase:<20}{seconds * 1000:>10.1f}')
+
+        packages = defaultdict(int)
+        for name, own, _ in modules:
+            packages[name.split('.')[0]] += own
+
+        self.stdout.write(f'\nSlowest packages (self ms, top {top}):')
+        for package, own in sorted(
+            packages.items(), key=lambda item: item[1], reverse=True
+        )[:top]:
+            self.stdout.write(f'  {package:<40}{own / 1000:>10.1f}')
+
+        self.stdout.write(f'\nSlowest modules (cumulative ms, top {top}):')
+        for name, own, cumulative in sorted(
+            modules, key=lambda module: module[2], reverse=True
+        )[:top]:
+            self.stdout.write(
+                f'  {name:<40}{cumulative / 1000:>10.1f}{own / 1000:>10.1f}'
+            )
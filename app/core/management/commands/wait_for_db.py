@@ -2,27 +2,57 @@
 Django command to pause execution until database is available
 """
 
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 
 import time
 
 from psycopg2 import OperationalError as Psycopg2OpError
+from django.db import DEFAULT_DB_ALIAS, connections
 from django.db.utils import OperationalError
 
 
 class Command(BaseCommand):
     """Django command to wait for database"""
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+        parser.add_argument(
+            '--timeout',
+            type=float,
+            default=60,
+            help='Seconds to wait before giving up.',
+        )
+        parser.add_argument('--initial-delay', type=float, default=0.1)
+        parser.add_argument('--max-delay', type=float, default=5)
+
+    def probe(self, database):
+        """Open a connection to the database, without running any checks"""
+        connections[database].ensure_connection()
+
     def handle(self, *args, **options):
         self.stdout.write('Waiting for database...')
-        db_up = False
+        deadline = time.monotonic() + options['timeout']
+        delay = options['initial_delay']
 
-        while not db_up:
+        while True:
             try:
-                self.check(databases=['default'])
-                db_up = True
+                self.probe(options['database'])
+                break
             except (Psycopg2OpError, OperationalError):
-                message = 'Database not available. Waiting 1 second...'
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise CommandError(
+                        f'Database not available after '
+                        f'{options["timeout"]:g} seconds.'
+                    )
+
+                delay = min(delay, options['max_delay'], remaining)
+                message = (
+                    f'Database not available. Waiting {delay:.1f} seconds...'
+                )
                 self.stdout.write(self.style.ERROR(message))
-                time.sleep(1)
+                time.sleep(delay)
+                delay *= 2
 
         self.stdout.write(self.style.SUCCESS('Database available!'))
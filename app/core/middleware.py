@@ -0,0 +1,58 @@
+"""
+Custom middleware
+"""
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+
+from core.compression import get_compressors, select_encoding
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    """Compress responses for clients that accept it.
+
+    Only responses with a content type in COMPRESSION_CONTENT_TYPES and a
+    body of at least COMPRESSION_MIN_SIZE bytes are compressed, using the
+    first coding of COMPRESSION_ENCODINGS the client accepts.
+    """
+
+    def process_response(self, request, response):
+        if response.streaming or response.has_header('Content-Encoding'):
+            return response
+
+        content_type = response.get('Content-Type', '')
+        content_type = content_type.split(';')[0].strip().lower()
+        if content_type not in settings.COMPRESSION_CONTENT_TYPES:
+            return response
+
+        if len(response.content) < settings.COMPRESSION_MIN_SIZE:
+            return response
+
+        if 'no-transform' in response.get('Cache-Control', ''):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+
+        compressors = get_compressors()
+        preferred = [coding for coding in settings.COMPRESSION_ENCODINGS
+                     if coding in compressors]
+        encoding = select_encoding(
+            request.META.get('HTTP_ACCEPT_ENCODING', ''), preferred
+        )
+        if encoding is None:
+            return response
+
+        compressed = compressors[encoding](response.content)
+        if len(compressed) >= len(response.content):
+            return response
+
+        response.content = compressed
+        response['Content-Length'] = str(len(compressed))
+        response['Content-Encoding'] = encoding
+
+        # The compressed body is no longer byte-for-byte identical.
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+
+        return response
@@ -0,0 +1,63 @@
+from django.db import migrations
+
+
+# Admin prefix searches filter on UPPER(column) LIKE 'PREFIX%'.
+SEARCH_INDEXES = [
+    ('core_user', 'email'),
+    ('core_recipe', 'title'),
+    ('core_tag', 'name'),
+    ('core_ingredient', 'name'),
+]
+
+
+def _is_partitioned(cursor, table):
+    cursor.execute(
+        'SELECT 1 FROM pg_partitioned_table WHERE partrelid = %s::regclass',
+        [table],
+    )
+    return cursor.fetchone() is not None
+
+
+def create_search_indexes(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor != 'postgresql':
+        return
+
+    qn = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        for table, column in SEARCH_INDEXES:
+            # Partitioned tables do not support concurrent index builds.
+            concurrently = (
+                '' if _is_partitioned(cursor, table) else 'CONCURRENTLY '
+            )
+            cursor.execute(
+                f'CREATE INDEX {concurrently}IF NOT EXISTS '
+                f'{qn(f"{table}_{column}_upper_like")} '
+                f'ON {qn(table)} (UPPER({qn(column)}) varchar_pattern_ops)'
+            )
+
+
+def drop_search_indexes(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor != 'postgresql':
+        return
+
+    qn = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        for table, column in SEARCH_INDEXES:
+            cursor.execute(
+                f'DROP INDEX IF EXISTS {qn(f"{table}_{column}_upper_like")}'
+            )
+
+
+class Migration(migrations.Migration):
+    # Indexes are built concurrently, outside of a transaction.
+    atomic = False
+
+    dependencies = [
+        ('core', '0008_imageblob'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 3.2.25 on 2026-10-19 10:49
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def log_existing_objects(apps, schema_editor):
+    """Log every existing object, so the first sync returns them"""
+    ChangeLogEntry = apps.get_model('core', 'ChangeLogEntry')
+    qn = schema_editor.connection.ops.quote_name
+    log = qn(ChangeLogEntry._meta.db_table)
+    for model_name in ('recipe', 'tag', 'ingredient'):
+        table = qn(apps.get_model('core', model_name)._meta.db_table)
+        schema_editor.execute(
+            f'INSERT INTO {log} '
+            f'(user_id, model, object_id, deleted, created_at) '
+            f'SELECT user_id, %s, id, %s, CURRENT_TIMESTAMP FROM {table}',
+            [model_name, False],
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_idempotencykey'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeLogEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(max_length=16)),
+                ('object_id', models.BigIntegerField()),
+                ('deleted', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='changelogentry',
+            index=models.Index(fields=['user', 'id'], name='core_change_user_id_ce4e15_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='changelogentry',
+            index=models.Index(fields=['model', 'object_id'], name='core_change_model_af38b3_idx'),
+        ),
+        migrations.RunPython(
+            log_existing_objects, migrations.RunPython.noop
+        ),
+    ]
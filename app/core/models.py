@@ -3,22 +3,43 @@ Database models
 """
 import uuid
 import os
+import re
+from collections import Counter, defaultdict
+from decimal import Decimal
 
 from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
+from django.db.models import Count, F, Max, Q, Sum
+from django.db.models.functions import Greatest
+from django.utils import timezone
 from django.contrib.auth.models import (
     AbstractBaseUser,
     BaseUserManager,
     PermissionsMixin,
 )
 
+from core.fields import ContentAddressedImageField
+from core.hashers import run_in_hashing_pool
+from core.units import (
+    UNIT_CHOICES,
+    base_unit_expression,
+    factor_expression,
+)
+
+
+CONTENT_DIGEST_RE = re.compile(r'[0-9a-f]{64}')
+RECIPE_IMAGE_DIR = os.path.join('uploads', 'recipe')
+
 
 def recipe_image_file_path(instance, filename):
     """Generate file path for new recipe image"""
-    ext = os.path.splitext(filename)[1]
-    filename = f'{uuid.uuid4()}{ext}'
+    name, ext = os.path.splitext(filename)
+    if not CONTENT_DIGEST_RE.fullmatch(name):
+        name = uuid.uuid4()
+    filename = f'{name}{ext}'
 
-    return os.path.join('uploads', 'recipe', filename)
+    return os.path.join(RECIPE_IMAGE_DIR, filename)
 
 
 class UserManager(BaseUserManager):
@@ -30,7 +51,7 @@ class UserManager(BaseUserManager):
             raise ValueError('Users must have an email address')
 
         user = self.model(email=self.normalize_email(email), **kwargs)
-        user.set_password(password)
+        run_in_hashing_pool(user.set_password, password)
         user.save(using=self._db)
 
         return user
@@ -51,11 +72,38 @@ class User(AbstractBaseUser, PermissionsMixin):
     name = models.CharField(max_length=255)
     is_active = models.BooleanField(default=True)
     is_staff = models.BooleanField(default=False)
+    # Signed tokens issued before this are rejected, see core.authentication.
+    tokens_valid_after = models.DateTimeField(
+        null=True, blank=True, editable=False
+    )
 
     objects = UserManager()
 
     USERNAME_FIELD = 'email'
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_is_active = instance.__dict__.get('is_active')
+
+        return instance
+
+    def save(self, *args, **kwargs):
+        """Invalidate issued tokens on password changes and deactivation"""
+        deactivated = (
+            getattr(self, '_loaded_is_active', None) and not self.is_active
+        )
+        if self._password is not None or deactivated:
+            self.tokens_valid_after = timezone.now()
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None:
+                kwargs['update_fields'] = {
+                    *update_fields, 'tokens_valid_after'
+                }
+
+        super().save(*args, **kwargs)
+        self._loaded_is_active = self.is_active
+
 
 class Recipe(models.Model):
     """Recipes object"""
@@ -69,12 +117,38 @@ class Recipe(models.Model):
     description = models.TextField(blank=True)
     link = models.CharField(max_length=255, blank=True)
     tags = models.ManyToManyField('Tag')
-    ingredients = models.ManyToManyField('Ingredient')
-    image = models.ImageField(null=True, upload_to=recipe_image_file_path)
+    ingredients = models.ManyToManyField(
+        'Ingredient', through='RecipeIngredient'
+    )
+    image = ContentAddressedImageField(
+        null=True, upload_to=recipe_image_file_path
+    )
 
     def __str__(self):
         return self.title
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_user_id = instance.__dict__.get('user_id')
+
+        return instance
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self._loaded_user_id = self.user_id
+
+    def _do_update(self, base_qs, using, pk_val, values, update_fields,
+                   forced_update):
+        """Include the user in updates so they touch one partition"""
+        user_id = getattr(self, '_loaded_user_id', None)
+        if user_id is not None:
+            base_qs = base_qs.filter(user_id=user_id)
+
+        return super()._do_update(
+            base_qs, using, pk_val, values, update_fields, forced_update
+        )
+
 
 class Tag(models.Model):
     """Tag for filtering recipes"""
@@ -98,3 +172,205 @@ class Ingredient(models.Model):
 
     def __str__(self):
         return self.name
+
+
+class QuantityConflict(Exception):
+    """Quantities of different dimensions, e.g. grams and cups, to add"""
+
+    def __init__(self, recipe_ids):
+        super().__init__(f'Conflicting quantities in recipes {recipe_ids}')
+        self.recipe_ids = recipe_ids
+
+
+class RecipeIngredientManager(models.Manager):
+    """Manager for the ingredients of recipes"""
+
+    def merge(self, target, sources):
+        """Give the recipes of source ingredients the target instead.
+
+        The quantities of the target and sources in a recipe are added, in
+        their unit when they share one, otherwise in the base unit of
+        their dimension. Raises QuantityConflict, changing nothing, for
+        recipes with quantities of different dimensions. The rows of the
+        sources are left to be deleted with them.
+        """
+        rows = self.filter(
+            ingredient_id__in=[target, *sources],
+            recipe_id__in=self.filter(
+                ingredient_id__in=sources
+            ).values('recipe_id'),
+        )
+        quantified = Q(quantity__isnull=False)
+
+        conflicts = list(rows.filter(quantified).values('recipe_id').annotate(
+            dimensions=Count(base_unit_expression(), distinct=True),
+        ).filter(dimensions__gt=1).order_by('recipe_id').values_list(
+            'recipe_id', flat=True
+        ))
+        if conflicts:
+            raise QuantityConflict(conflicts)
+
+        merged = rows.values('recipe_id').annotate(
+            units=Count('unit', distinct=True, filter=quantified),
+            any_unit=Max('unit', filter=quantified),
+            total=Sum('quantity'),
+            base_unit=Max(base_unit_expression(), filter=quantified),
+            base_total=Sum(
+                F('quantity') * factor_expression(),
+                output_field=models.DecimalField(),
+            ),
+        ).order_by()
+
+        merged_rows = []
+        for row in merged.iterator():
+            quantity, unit = None, ''
+            if row['units'] == 1:
+                quantity, unit = row['total'], row['any_unit']
+            elif row['units']:
+                quantity, unit = row['base_total'], row['base_unit']
+            if quantity is not None:
+                quantity = Decimal(str(quantity)).quantize(Decimal('0.001'))
+            merged_rows.append(self.model(
+                recipe_id=row['recipe_id'], ingredient_id=target,
+                quantity=quantity, unit=unit,
+            ))
+
+        rows.filter(ingredient_id=target).delete()
+        self.bulk_create(merged_rows, batch_size=1000)
+
+        return len(merged_rows)
+
+
+class RecipeIngredient(models.Model):
+    """Ingredient of a recipe, with the quantity the recipe uses"""
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='quantities',
+    )
+    ingredient = models.ForeignKey(Ingredient, on_delete=models.CASCADE)
+    quantity = models.DecimalField(
+        max_digits=10, decimal_places=3, null=True, blank=True
+    )
+    unit = models.CharField(max_length=8, blank=True, choices=UNIT_CHOICES)
+
+    objects = RecipeIngredientManager()
+
+    class Meta:
+        # The table of the relation before it had quantities.
+        db_table = 'core_recipe_ingredients'
+        unique_together = [('recipe', 'ingredient')]
+
+    def __str__(self):
+        return f'{self.quantity or ""} {self.unit} {self.ingredient}'.strip()
+
+
+class RevokedToken(models.Model):
+    """Signed auth token revoked before it expires"""
+    jti = models.CharField(max_length=64, unique=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return self.jti
+
+
+class ImageBlobManager(models.Manager):
+    """Manager for stored image files"""
+
+    def acquire(self, pk):
+        """Take a reference to a blob, returns False if it is gone"""
+        return bool(
+            self.filter(pk=pk).update(ref_count=F('ref_count') + 1)
+        )
+
+    def release(self, names):
+        """Drop a reference to the blob stored under each name"""
+        by_count = defaultdict(list)
+        for name, count in Counter(names).items():
+            by_count[count].append(name)
+
+        for count, group in by_count.items():
+            self.filter(name__in=group, ref_count__gt=0).update(
+                ref_count=Greatest(F('ref_count') - count, 0)
+            )
+
+    def collect(self, storage, names=None, created_before=None):
+        """Delete unreferenced blobs and their files, returns the names"""
+        blobs = self.filter(ref_count=0)
+        if names is not None:
+            blobs = blobs.filter(name__in=names)
+        if created_before is not None:
+            blobs = blobs.filter(created_at__lt=created_before)
+
+        collected = []
+        for blob in blobs.only('pk', 'name').iterator():
+            # Only delete the file if no reference was taken meanwhile.
+            deleted, _ = self.filter(pk=blob.pk, ref_count=0).delete()
+            if deleted:
+                storage.delete(blob.name)
+                collected.append(blob.name)
+
+        return collected
+
+
+class ImageBlob(models.Model):
+    """Image file shared by every recipe with the same content"""
+    digest = models.CharField(max_length=64, unique=True)
+    name = models.CharField(max_length=255, unique=True)
+    size = models.PositiveBigIntegerField()
+    ref_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    objects = ImageBlobManager()
+
+    def __str__(self):
+        return self.name
+
+
+class IdempotencyKey(models.Model):
+    """Response to a request made with an Idempotency-Key header.
+
+    A null status code marks a request still being processed.
+    """
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+    )
+    key = models.CharField(max_length=255)
+    fingerprint = models.CharField(max_length=64)
+    status_code = models.PositiveSmallIntegerField(null=True)
+    response = models.JSONField(null=True, encoder=DjangoJSONEncoder)
+    headers = models.JSONField(default=dict)
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        unique_together = [('user', 'key')]
+
+    def __str__(self):
+        return self.key
+
+
+class ChangeLogEntry(models.Model):
+    """Latest change to a recipe, tag or ingredient, for syncing clients.
+
+    Each object has at most one entry, replaced on every change, so the
+    log grows with the number of objects rather than of writes. Deleted
+    objects keep an entry as a tombstone.
+    """
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+    )
+    model = models.CharField(max_length=16)
+    object_id = models.BigIntegerField()
+    deleted = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'id']),
+            models.Index(fields=['model', 'object_id']),
+        ]
+
+    def __str__(self):
+        return f'{self.model} {self.object_id}'
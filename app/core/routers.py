@@ -0,0 +1,94 @@
+"""
+Database routers
+"""
+import contextvars
+import random
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from rest_framework.permissions import SAFE_METHODS
+
+
+STICKY_COOKIE = 'read_primary'
+
+_read_from_replicas = contextvars.ContextVar(
+    'read_from_replicas', default=False
+)
+
+
+class ReplicaRouter:
+    """Send reads to a replica while serving a safe request.
+
+    Reads go to the primary outside of views using ReplicaReadMixin, inside
+    transactions and when no replicas are configured. Writes always go to
+    the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        replicas = settings.DATABASE_REPLICAS
+        if not replicas:
+            return None
+
+        # Also ignore the database of instances passed as hints, they may
+        # have been loaded from a replica earlier in the request.
+        if (not _read_from_replicas.get()
+                or connections[DEFAULT_DB_ALIAS].in_atomic_block):
+            return DEFAULT_DB_ALIAS
+
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+def _sticky_key(user):
+    return f'core.routers.sticky:{user.pk}'
+
+
+class ReplicaReadMixin:
+    """Serve safe requests from the read replicas.
+
+    After a successful write the client reads from the primary for
+    REPLICA_STICKY_SECONDS, so it sees its own writes even when the
+    replicas lag behind. This is tracked with a cookie and, for clients
+    not keeping cookies, in the cache for the authenticated user.
+    """
+
+    def initial(self, request, *args, **kwargs):
+        _read_from_replicas.set(
+            request.method in SAFE_METHODS
+            and STICKY_COOKIE not in request.COOKIES
+        )
+        super().initial(request, *args, **kwargs)
+
+        if (_read_from_replicas.get() and request.user.is_authenticated
+                and cache.get(_sticky_key(request.user))):
+            _read_from_replicas.set(False)
+
+    def dispatch(self, request, *args, **kwargs):
+        token = _read_from_replicas.set(False)
+        try:
+            response = super().dispatch(request, *args, **kwargs)
+        finally:
+            _read_from_replicas.reset(token)
+
+        if (settings.DATABASE_REPLICAS
+                and request.method not in SAFE_METHODS
+                and response.status_code < 400):
+            seconds = settings.REPLICA_STICKY_SECONDS
+            response.set_cookie(
+                STICKY_COOKIE, '1', max_age=seconds, httponly=True,
+                samesite='Lax',
+            )
+            if self.request.user.is_authenticated:
+                cache.set(_sticky_key(self.request.user), True, seconds)
+
+        return response
@@ -0,0 +1,78 @@
+"""
+OpenAPI schema views
+"""
+import hashlib
+import json
+import os
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils import translation
+from django.utils.cache import get_conditional_response, patch_cache_control
+
+from drf_spectacular.views import SpectacularAPIView
+
+
+_schema_cache = {}
+
+
+def clear_schema_cache():
+    """Drop cached schemas so the next request regenerates them"""
+    _schema_cache.clear()
+
+
+class CachedSpectacularAPIView(SpectacularAPIView):
+    """Serve the OpenAPI schema generated once per process.
+
+    The schema is loaded from SPECTACULAR_SCHEMA_FILE when it exists, which
+    is written at build time with `manage.py spectacular`, and generated on
+    the first request otherwise. Rendered schemas are cached per format and
+    language and served with an ETag.
+    """
+
+    def _get_schema(self, request):
+        """Return the schema for the active language"""
+        key = ('schema', translation.get_language())
+        if key not in _schema_cache:
+            path = settings.SPECTACULAR_SCHEMA_FILE
+            if (path and os.path.exists(path)
+                    and key[1] == settings.LANGUAGE_CODE):
+                with open(path, 'rb') as schema_file:
+                    schema = json.load(schema_file)
+            else:
+                generator = self.generator_class(
+                    urlconf=self.urlconf, api_version=self.api_version
+                )
+                schema = generator.get_schema(
+                    request=request, public=self.serve_public
+                )
+            _schema_cache[key] = schema
+
+        return _schema_cache[key]
+
+    def _get_schema_response(self, request):
+        key = ('content', translation.get_language(),
+               request.accepted_media_type)
+        if key not in _schema_cache:
+            renderer = request.accepted_renderer
+            content = renderer.render(
+                self._get_schema(request),
+                request.accepted_media_type,
+                self.get_renderer_context(),
+            )
+            content_type = renderer.media_type
+            if renderer.charset:
+                content_type += f'; charset={renderer.charset}'
+            etag = '"%s"' % hashlib.sha1(content).hexdigest()
+            _schema_cache[key] = (content, content_type, etag)
+
+        content, content_type, etag = _schema_cache[key]
+        response = HttpResponse(content, content_type=content_type)
+        response['ETag'] = etag
+        patch_cache_control(
+            response, public=True, max_age=settings.SCHEMA_CACHE_MAX_AGE
+        )
+
+        return get_conditional_response(
+            request, etag=etag, response=response
+        )
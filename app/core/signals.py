@@ -0,0 +1,132 @@
+"""
+Signal handlers
+"""
+import contextvars
+import logging
+from functools import partial
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_delete,
+)
+from django.dispatch import receiver
+
+from core.authentication import forget_token_user
+from core.changelog import TRACKED_MODELS, log_changed_recipes, log_changes
+from core.models import ImageBlob, Ingredient, Recipe, Tag
+
+
+logger = logging.getLogger(__name__)
+
+# Users being deleted, their objects are deleted without a tombstone.
+_deleting_users = contextvars.ContextVar('deleting_users', default=frozenset())
+
+
+def release_images(storage, names, using=DEFAULT_DB_ALIAS):
+    """Drop references to images, deleting them after commit if unused.
+
+    The references are dropped in the current transaction, files are only
+    deleted once it commits, so a rollback never loses an image.
+    """
+    names = [name for name in names if name]
+    if not names:
+        return
+
+    ImageBlob.objects.db_manager(using).release(names)
+    transaction.on_commit(
+        partial(reclaim_images, storage, set(names), using), using=using
+    )
+
+
+def reclaim_images(storage, names, using=DEFAULT_DB_ALIAS):
+    """Delete the image files nothing references anymore"""
+    try:
+        tracked = set(
+            ImageBlob.objects.using(using).filter(name__in=names)
+            .values_list('name', flat=True)
+        )
+        ImageBlob.objects.db_manager(using).collect(storage, names=tracked)
+
+        used = set(
+            Recipe.objects.using(using).filter(image__in=names - tracked)
+            .values_list('image', flat=True)
+        )
+        for name in names - tracked - used:
+            storage.delete(name)
+    except Exception:
+        # The response is already decided, reclaim_media retries later.
+        logger.exception('Could not delete images %s', sorted(names))
+
+
+@receiver(post_delete, sender=Recipe)
+def release_recipe_image(sender, instance, using, **kwargs):
+    """Release the image of deleted recipes"""
+    if instance.image:
+        release_images(instance.image.storage, [instance.image.name], using)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def forget_changed_user(sender, instance, using, **kwargs):
+    """Drop the cached user, again on commit so it is not read back stale"""
+    forget_token_user(instance.pk)
+    transaction.on_commit(partial(forget_token_user, instance.pk), using)
+
+
+@receiver(pre_delete, sender=settings.AUTH_USER_MODEL)
+def start_user_deletion(sender, instance, **kwargs):
+    _deleting_users.set(_deleting_users.get() | {instance.pk})
+
+
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def end_user_deletion(sender, instance, **kwargs):
+    _deleting_users.set(_deleting_users.get() - {instance.pk})
+
+
+def log_saved(sender, instance, raw=False, **kwargs):
+    """Log created and updated recipes, tags and ingredients"""
+    if not raw:
+        log_changes(sender, [(instance.user_id, instance.pk)])
+
+
+def log_deleted(sender, instance, **kwargs):
+    """Log deleted recipes, tags and ingredients as tombstones"""
+    if instance.user_id not in _deleting_users.get():
+        log_changes(sender, [(instance.user_id, instance.pk)], deleted=True)
+
+
+def log_recipes_losing(sender, instance, **kwargs):
+    """Log recipes using a tag or ingredient about to be deleted"""
+    if instance.user_id not in _deleting_users.get():
+        log_changed_recipes(sender, [instance.pk])
+
+
+def log_recipe_relations(sender, instance, action, reverse, pk_set,
+                         **kwargs):
+    """Log recipes whose tags or ingredients changed"""
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+
+    if not reverse:
+        log_changes(Recipe, [(instance.user_id, instance.pk)])
+    elif pk_set:
+        log_changes(Recipe, Recipe.objects.filter(
+            pk__in=pk_set
+        ).values_list('user_id', 'id'))
+
+
+for model in TRACKED_MODELS:
+    post_save.connect(log_saved, sender=model)
+    post_delete.connect(log_deleted, sender=model)
+
+for model in (Tag, Ingredient):
+    pre_delete.connect(log_recipes_losing, sender=model)
+
+for field in Recipe._meta.many_to_many:
+    m2m_changed.connect(
+        log_recipe_relations, sender=field.remote_field.through
+    )
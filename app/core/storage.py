@@ -0,0 +1,157 @@
+"""
+Storage backends
+"""
+import mimetypes
+import os
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import (
+    ManifestStaticFilesStorage,
+    StaticFilesStorage,
+)
+from django.core.files.base import ContentFile
+
+from core.compression import get_compressors
+
+
+STATIC_COMPRESSED_EXTENSIONS = {'gzip': '.gz', 'br': '.br'}
+
+
+class CompressedStaticFilesMixin:
+    """Write pre-compressed copies of static files during collectstatic.
+
+    Lets nginx serve `.gz` files with `gzip_static` instead of compressing
+    the same assets on every request.
+    """
+
+    def post_process(self, paths, dry_run=False, **options):
+        parent = getattr(super(), 'post_process', None)
+        if parent is not None:
+            yield from parent(paths, dry_run=dry_run, **options)
+
+        if dry_run:
+            return
+
+        # Hashed names from the manifest, when the storage keeps one.
+        names = set(paths) | set(getattr(self, 'hashed_files', {}).values())
+
+        for name in sorted(names):
+            for compressed_name in self._compress(name):
+                yield name, compressed_name, True
+
+    def _compress(self, name):
+        """Write compressed copies of the file and return their names"""
+        content_type, encoding = mimetypes.guess_type(name)
+        if encoding or content_type not in settings.COMPRESSION_CONTENT_TYPES:
+            return []
+
+        with self.open(name) as original:
+            content = original.read()
+
+        if len(content) < settings.COMPRESSION_MIN_SIZE:
+            return []
+
+        compressed_names = []
+        compressors = get_compressors()
+        for coding, extension in STATIC_COMPRESSED_EXTENSIONS.items():
+            if coding not in compressors:
+                continue
+
+            compressed = compressors[coding](content)
+            if len(compressed) >= len(content):
+                continue
+
+            compressed_name = name + extension
+            if self.exists(compressed_name):
+                self.delete(compressed_name)
+            self._save(compressed_name, ContentFile(compressed))
+            compressed_names.append(compressed_name)
+
+        return compressed_names
+
+
+class CompressedStaticFilesStorage(CompressedStaticFilesMixin,
+                                   StaticFilesStorage):
+    """Static files storage which pre-compresses collected files"""
+
+
+class CompressedManifestStaticFilesStorage(CompressedStaticFilesMixin,
+                                           ManifestStaticFilesStorage):
+    """Static files storage with hashed names and pre-compressed files"""
+
+
+def _presign_client(storage):
+    """Return the S3 client signing URLs handed out to clients"""
+    client = storage.connection.meta.client
+    endpoint_url = settings.S3_PUBLIC_ENDPOINT_URL
+    if not endpoint_url:
+        return client
+
+    # The endpoint the app reaches the object store on may not be
+    # reachable by clients, e.g. a MinIO container. Imported here as only
+    # S3 storages, which depend on it, get this far.
+    import boto3
+
+    return boto3.session.Session().client(
+        's3',
+        endpoint_url=endpoint_url,
+        aws_access_key_id=storage.access_key,
+        aws_secret_access_key=storage.secret_key,
+        region_name=storage.region_name,
+        config=getattr(storage, 'config', None),
+    )
+
+
+def presigned_upload(storage, name, content_type, max_size, expires):
+    """Return the URL and form fields to POST a file directly to storage.
+
+    Returns None when the storage does not support direct uploads.
+    """
+    if getattr(storage, 'bucket_name', None) is None:
+        return None
+
+    return _presign_client(storage).generate_presigned_post(
+        Bucket=storage.bucket_name,
+        Key=storage._normalize_name(name),
+        Fields={'Content-Type': content_type},
+        Conditions=[
+            {'Content-Type': content_type},
+            ['content-length-range', 1, max_size],
+        ],
+        ExpiresIn=expires,
+    )
+
+
+def iter_files(storage, directory):
+    """Yield the name and modified time of each file in a directory.
+
+    Files are listed lazily, a page at a time from object stores, so
+    directories of any size can be scanned in constant memory.
+    """
+    if getattr(storage, 'bucket_name', None) is not None:
+        prefix = storage._normalize_name(directory).rstrip('/') + '/'
+        for summary in storage.bucket.objects.filter(Prefix=prefix):
+            name = summary.key[len(prefix):]
+            if name and '/' not in name:
+                yield f'{directory}/{name}', summary.last_modified
+        return
+
+    try:
+        path = storage.path(directory)
+    except NotImplementedError:
+        for name in storage.listdir(directory)[1]:
+            name = f'{directory}/{name}'
+            yield name, storage.get_modified_time(name)
+        return
+
+    if not os.path.isdir(path):
+        return
+
+    with os.scandir(path) as entries:
+        for entry in entries:
+            if entry.is_file():
+                modified = datetime.fromtimestamp(
+                    entry.stat().st_mtime, tz=timezone.utc
+                )
+                yield f'{directory}/{entry.name}', modified
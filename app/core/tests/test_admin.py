@@ -1,11 +1,17 @@
 """
 Tests for the Django Admin modifications.
 """
-from django.test import TestCase
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.test import TestCase, override_settings
 from django.contrib.auth import get_user_model
 from django.urls import reverse
 from django.test import Client
 
+from core.admin import EstimatedCountPaginator
+from core.models import Ingredient, Recipe, Tag
+
 
 class AdminSiteTests(TestCase):
     """Tests the Django Admin site."""
@@ -45,3 +51,106 @@ class AdminSiteTests(TestCase):
         res = self.client.get(url)
 
         self.assertEqual(res.status_code, 200)
+
+    def test_delete_user(self):
+        """Test deleting a user and their recipes from the admin"""
+        Recipe.objects.create(
+            user=self.user, title='Sample', time_minutes=5,
+            price=Decimal('5.00'),
+        )
+        url = reverse('admin:core_user_delete', args=[self.user.id])
+
+        res = self.client.get(url)
+        self.assertContains(res, 'Recipes: 1')
+
+        res = self.client.post(url, {'post': 'yes'})
+
+        self.assertEqual(res.status_code, 302)
+        self.assertFalse(
+            get_user_model().objects.filter(pk=self.user.pk).exists()
+        )
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_search_users(self):
+        """Test searching users by email prefix"""
+        url = reverse('admin:core_user_changelist')
+        res = self.client.get(url, {'q': 'user@'})
+
+        self.assertEqual(
+            list(res.context['cl'].result_list), [self.user]
+        )
+
+    def test_recipe_changelist_queries(self):
+        """Test listing recipes does not query each recipe's user"""
+        url = reverse('admin:core_recipe_changelist')
+        Recipe.objects.create(
+            user=self.user, title='Soup', time_minutes=5,
+            price=Decimal('5.00'),
+        )
+        self.client.get(url)
+        with self.assertNumQueries(4):
+            self.client.get(url)
+
+        for _ in range(3):
+            Recipe.objects.create(
+                user=self.admin_user, title='Bread', time_minutes=5,
+                price=Decimal('5.00'),
+            )
+        with self.assertNumQueries(4):
+            res = self.client.get(url, {'q': 'sou'})
+
+        self.assertContains(res, 'Soup')
+        self.assertNotContains(res, 'Bread')
+
+    def test_recipe_attribute_changelists(self):
+        """Test the tag and ingredient admin pages work"""
+        Tag.objects.create(user=self.user, name='Vegan')
+        Ingredient.objects.create(user=self.user, name='Salt')
+
+        for name, model_name in (('Vegan', 'tag'), ('Salt', 'ingredient')):
+            res = self.client.get(
+                reverse(f'admin:core_{model_name}_changelist'),
+                {'q': name[:2]},
+            )
+            self.assertContains(res, name)
+
+        res = self.client.get(reverse('admin:core_recipe_add'))
+        self.assertEqual(res.status_code, 200)
+
+
+class EstimatedCountPaginatorTests(TestCase):
+    """Test estimating the size of large tables"""
+
+    @override_settings(ADMIN_ESTIMATED_COUNT_THRESHOLD=1000)
+    @patch('core.admin.estimated_count')
+    def test_estimate_used_for_large_tables(self, patched_estimate):
+        """Test only unfiltered tables above the threshold are estimated"""
+        Tag.objects.create(
+            user=get_user_model().objects.create_user('user@example.com'),
+            name='Vegan',
+        )
+
+        patched_estimate.return_value = 5000
+        paginator = EstimatedCountPaginator(
+            Tag.objects.order_by('pk'), 10
+        )
+        self.assertEqual(paginator.count, 5000)
+
+        paginator = EstimatedCountPaginator(
+            Tag.objects.filter(name='Vegan').order_by('pk'), 10
+        )
+        self.assertEqual(paginator.count, 1)
+
+        patched_estimate.return_value = 10
+        paginator = EstimatedCountPaginator(
+            Tag.objects.order_by('pk'), 10
+        )
+        self.assertEqual(paginator.count, 1)
+
+    def test_no_estimate_without_postgresql(self):
+        """Test other databases are counted"""
+        paginator = EstimatedCountPaginator(
+            Tag.objects.order_by('pk'), 10
+        )
+
+        self.assertEqual(paginator.count, 0)
@@ -0,0 +1,119 @@
+"""
+Tests for signed token authentication.
+"""
+import time
+from datetime import datetime, timezone
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
+
+from core.authentication import (
+    SignedTokenAuthentication,
+    issue_token,
+    revoked_tokens,
+)
+from core.models import RevokedToken
+
+
+class SignedTokenAuthenticationTests(TestCase):
+    """Test authenticating with signed tokens"""
+
+    def setUp(self):
+        revoked_tokens.clear()
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com',
+            password='testpass123',
+        )
+        self.auth = SignedTokenAuthentication()
+
+    def test_authenticate_from_cache(self):
+        """Test the user is read once and then served from the cache"""
+        token = issue_token(self.user)
+        self.assertNotIn(token.jti, revoked_tokens)
+        self.auth.authenticate_credentials(token.key)
+
+        with self.assertNumQueries(0):
+            user, auth = self.auth.authenticate_credentials(token.key)
+            self.assertEqual(user.email, self.user.email)
+            self.assertFalse(user.is_staff)
+
+        self.assertEqual(user.pk, self.user.pk)
+        self.assertEqual(auth, token)
+
+    def test_inactive_user_rejected(self):
+        """Test tokens of deactivated users are rejected"""
+        token = issue_token(self.user)
+        self.auth.authenticate_credentials(token.key)
+
+        self.user.is_active = False
+        self.user.save()
+
+        with self.assertRaisesMessage(AuthenticationFailed, 'inactive'):
+            self.auth.authenticate_credentials(token.key)
+
+    def test_deleted_user_rejected(self):
+        """Test tokens of deleted users are rejected"""
+        token = issue_token(self.user)
+        self.auth.authenticate_credentials(token.key)
+
+        self.user.delete()
+
+        with self.assertRaisesMessage(AuthenticationFailed, 'deleted'):
+            self.auth.authenticate_credentials(token.key)
+
+    def test_password_change_revokes_tokens(self):
+        """Test tokens issued before a password change are rejected"""
+        old = issue_token(self.user)
+        self.auth.authenticate_credentials(old.key)
+
+        later = time.time() + 10
+        with patch('django.core.signing.time.time', return_value=later), \
+                patch('core.models.timezone.now', return_value=(
+                    datetime.fromtimestamp(later, tz=timezone.utc))):
+            self.user.set_password('newpass123')
+            self.user.save()
+            new = issue_token(self.user)
+
+            with self.assertRaisesMessage(AuthenticationFailed, 'revoked'):
+                self.auth.authenticate_credentials(old.key)
+            user, _ = self.auth.authenticate_credentials(new.key)
+
+        self.assertEqual(user.pk, self.user.pk)
+
+    def test_tampered_token_rejected(self):
+        """Test a token with a modified user id is rejected"""
+        token = issue_token(self.user)
+        key = f'{self.user.pk + 1}{token.key[len(str(self.user.pk)):]}'
+
+        with self.assertRaises(AuthenticationFailed):
+            self.auth.authenticate_credentials(key)
+
+    def test_expired_token_rejected(self):
+        """Test a token older than the TTL is rejected"""
+        with patch('django.core.signing.time.time', return_value=1000):
+            token = issue_token(self.user)
+
+        with self.assertRaisesMessage(AuthenticationFailed, 'expired'):
+            self.auth.authenticate_credentials(token.key)
+
+    @override_settings(AUTH_TOKEN_REVOCATION_REFRESH=0)
+    def test_revoked_token_rejected(self):
+        """Test revoked tokens are rejected, also by other processes"""
+        token = issue_token(self.user)
+        RevokedToken.objects.create(jti=token.jti, expires_at=token.expires)
+
+        with self.assertRaisesMessage(AuthenticationFailed, 'revoked'):
+            self.auth.authenticate_credentials(token.key)
+
+    def test_legacy_token_accepted(self):
+        """Test tokens from the authtoken table still work"""
+        token = Token.objects.create(user=self.user)
+
+        user, auth = self.auth.authenticate_credentials(token.key)
+
+        self.assertEqual(user, self.user)
+        self.assertEqual(auth, token)
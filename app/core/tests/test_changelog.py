@@ -0,0 +1,106 @@
+"""
+Tests for the change log of recipes, tags and ingredients.
+"""
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+
+from core.deletion import delete_in_chunks, delete_user
+from core.models import ChangeLogEntry, Ingredient, Recipe, Tag
+
+
+class ChangeLogTests(TestCase):
+    """Test logging changes for syncing clients"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'user@example.com', 'testpass123'
+        )
+        self.tag = Tag.objects.create(user=self.user, name='Vegan')
+        self.recipe = Recipe.objects.create(
+            user=self.user, title='Sample', time_minutes=5,
+            price=Decimal('5.00'),
+        )
+
+    def _entries(self):
+        return list(ChangeLogEntry.objects.order_by('id').values_list(
+            'model', 'object_id', 'deleted'
+        ))
+
+    def _last(self):
+        return ChangeLogEntry.objects.latest('id')
+
+    def test_save_logs_change(self):
+        """Test creating and updating objects logs one entry each"""
+        self.recipe.title = 'Changed'
+        self.recipe.save()
+
+        self.assertEqual(self._entries(), [
+            ('tag', self.tag.pk, False),
+            ('recipe', self.recipe.pk, False),
+        ])
+        self.assertEqual(self._last().user, self.user)
+
+    def test_delete_logs_tombstone(self):
+        """Test deleting an object replaces its entry with a tombstone"""
+        pk = self.recipe.pk
+        self.recipe.delete()
+
+        self.assertEqual(self._entries(), [
+            ('tag', self.tag.pk, False),
+            ('recipe', pk, True),
+        ])
+
+    def test_m2m_changes_log_recipe(self):
+        """Test adding and removing tags logs the recipe"""
+        self.recipe.tags.add(self.tag)
+        self.assertEqual(
+            (self._last().model, self._last().object_id),
+            ('recipe', self.recipe.pk),
+        )
+
+        ChangeLogEntry.objects.all().delete()
+        self.tag.recipe_set.remove(self.recipe)
+
+        self.assertEqual(self._entries(), [('recipe', self.recipe.pk, False)])
+
+    def test_deleting_tag_logs_recipes(self):
+        """Test deleting a tag logs the recipes that used it"""
+        self.recipe.tags.add(self.tag)
+        ChangeLogEntry.objects.all().delete()
+        pk = self.tag.pk
+
+        self.tag.delete()
+
+        self.assertCountEqual(self._entries(), [
+            ('recipe', self.recipe.pk, False),
+            ('tag', pk, True),
+        ])
+
+    def test_delete_in_chunks_logs_tombstones(self):
+        """Test chunked deletes log tombstones and affected recipes"""
+        ingredient = Ingredient.objects.create(user=self.user, name='Salt')
+        self.recipe.ingredients.add(ingredient)
+        ChangeLogEntry.objects.all().delete()
+
+        delete_in_chunks(Ingredient.objects.all())
+
+        self.assertEqual(self._entries(), [
+            ('recipe', self.recipe.pk, False),
+            ('ingredient', ingredient.pk, True),
+        ])
+
+    def test_deleting_user_removes_log(self):
+        """Test deleting a user leaves no entries behind"""
+        delete_user(self.user)
+
+        self.assertFalse(ChangeLogEntry.objects.exists())
+
+    def test_deleting_user_with_collector_removes_log(self):
+        """Test deleting a user with the collector leaves no entries"""
+        self.recipe.tags.add(self.tag)
+
+        self.user.delete()
+
+        self.assertFalse(ChangeLogEntry.objects.exists())
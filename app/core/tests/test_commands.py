@@ -1,32 +1,486 @@
 """
 Test custom Django management commands
 """
+import shutil
+import tempfile
+from decimal import Decimal
+from io import StringIO
+from unittest import skipUnless
 from unittest.mock import patch
 
 from psycopg2 import OperationalError as Psycopg2Error
 
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
 from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import IntegrityError, connection, transaction
 from django.db.utils import OperationalError
-from django.test import SimpleTestCase
+from django.test import SimpleTestCase, TestCase, override_settings
 
+from core.management.commands import startup
+from core.models import (
+    ImageBlob,
+    Ingredient,
+    Recipe,
+    RecipeIngredient,
+    Tag,
+)
 
-@patch("core.management.commands.wait_for_db.Command.check")
+
+@patch("core.management.commands.wait_for_db.Command.probe")
 class CommandTests(SimpleTestCase):
-    def test_wait_for_db_ready(self, patched_check):
+    def test_wait_for_db_ready(self, patched_probe):
         """Test waiting for database if database is available"""
-        patched_check.return_value = True
+        patched_probe.return_value = True
 
         call_command("wait_for_db")
 
-        patched_check.assert_called_once_with(databases=['default'])
+        patched_probe.assert_called_once_with('default')
 
     @patch('time.sleep')
-    def test_wait_for_db_delay(self, patched_sleep, patched_check):
+    def test_wait_for_db_delay(self, patched_sleep, patched_probe):
         """Test waiting for database when getting OperationalError"""
-        patched_check.side_effect = \
+        patched_probe.side_effect = \
             ([Psycopg2Error] * 2 + [OperationalError] * 3 + [True])
 
         call_command("wait_for_db")
 
-        self.assertEqual(patched_check.call_count, 6)
-        patched_check.assert_called_with(databases=['default'])
+        self.assertEqual(patched_probe.call_count, 6)
+        patched_probe.assert_called_with('default')
+        delays = [c.args[0] for c in patched_sleep.call_args_list]
+        self.assertEqual(delays, [0.1, 0.2, 0.4, 0.8, 1.6])
+
+    @patch('time.sleep')
+    def test_wait_for_db_timeout(self, patched_sleep, patched_probe):
+        """Test waiting for database gives up after the timeout"""
+        patched_probe.side_effect = OperationalError
+
+        with patch('time.monotonic', side_effect=[0, 1, 2, 3]):
+            with self.assertRaises(CommandError):
+                call_command('wait_for_db', timeout=2.5, stdout=StringIO())
+
+        self.assertEqual(patched_sleep.call_count, 2)
+
+    def test_benchmark_json(self, patched_probe):
+        """Test the JSON benchmark reports renderer and parser timings"""
+        out = StringIO()
+
+        call_command(
+            'benchmark_json', recipes=10, related=2, repeat=1, stdout=out
+        )
+
+        self.assertIn('render  fast', out.getvalue())
+        self.assertIn('parse   stdlib', out.getvalue())
+
+    def test_benchmark_hashers(self, patched_probe):
+        """Test the hasher benchmark reports each configured hasher"""
+        out = StringIO()
+
+        call_command('benchmark_hashers', iterations=1, stdout=out)
+
+        self.assertIn('pbkdf2_sha256', out.getvalue())
+        self.assertIn('scrypt', out.getvalue())
+
+    @patch('core.management.commands.startup_report.subprocess.run')
+    def test_startup_report(self, patched_run, patched_probe):
+        """Test the startup report lists phases and slow imports"""
+        patched_run.return_value.returncode = 0
+        patched_run.return_value.stdout = '{"apps ready": 0.25}'
+        patched_run.return_value.stderr = (
+            'import time: self [us] | cumulative | imported package\n'
+            'import time:      1000 |       3000 | rest_framework\n'
+            'import time:      2000 |       2000 |   rest_framework.fields\n'
+        )
+        out = StringIO()
+
+        call_command('startup_report', top=5, stdout=out)
+
+        self.assertIn('apps ready', out.getvalue())
+        self.assertIn('250.0', out.getvalue())
+        self.assertRegex(out.getvalue(), r'rest_framework\s+3\.0\n')
+        self.assertIn('-X', patched_run.call_args[0][0])
+
+    @patch('core.management.commands.loadtest.Command._request')
+    def test_loadtest(self, patched_request, patched_probe):
+        """Test the load test reports each concurrency level"""
+        patched_request.side_effect = [(200, 0.01)] * 2 + [(503, 0.02)] * 2
+        out = StringIO()
+
+        call_command(
+            'loadtest', 'http://app/api/', concurrency='1,2', requests=2,
+            token='abc', stdout=out,
+        )
+
+        lines = out.getvalue().splitlines()
+        self.assertEqual(patched_request.call_count, 4)
+        self.assertEqual(lines[1].split()[0], '1')
+        self.assertEqual(lines[2].split()[-1], '2')
+        self.assertEqual(
+            patched_request.call_args[0][1]['Authorization'], 'Token abc'
+        )
+
+
+@patch('core.management.commands.startup.call_command')
+class StartupCommandTests(SimpleTestCase):
+    """Test the startup command"""
+
+    def setUp(self):
+        self.static_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.static_root)
+
+    def _startup(self, pending=()):
+        with override_settings(STATIC_ROOT=self.static_root), \
+                patch(
+                    'core.management.commands.startup.Command'
+                    '.pending_migrations',
+                    return_value=list(pending),
+                ):
+            call_command('startup', stdout=StringIO())
+
+    def _called(self, patched_call):
+        return [c.args[0] for c in patched_call.call_args_list]
+
+    def test_first_startup(self, patched_call):
+        """Test static files are collected and pending migrations run"""
+        self._startup(pending=['migration'])
+
+        self.assertEqual(
+            self._called(patched_call),
+            ['wait_for_db', 'collectstatic', 'migrate'],
+        )
+
+    def test_repeated_startup_skips_work(self, patched_call):
+        """Test nothing is redone when static files and schema are current"""
+        self._startup()
+        patched_call.reset_mock()
+
+        self._startup()
+
+        self.assertEqual(self._called(patched_call), ['wait_for_db'])
+
+
+class PendingMigrationsTests(TestCase):
+    """Test detecting pending migrations"""
+
+    def test_no_pending_migrations(self):
+        """Test a migrated database has no pending migrations"""
+        command = startup.Command()
+
+        self.assertEqual(command.pending_migrations('default'), [])
+
+
+class PartitionRecipesTests(SimpleTestCase):
+    """Test the partition recipes command"""
+
+    def test_dry_run(self):
+        """Test the partitioning SQL is printed"""
+        out = StringIO()
+        search_index = (
+            'core_recipe_title_upper_like',
+            'CREATE INDEX core_recipe_title_upper_like ON public.core_recipe '
+            'USING btree (upper((title)::text) varchar_pattern_ops)',
+        )
+
+        with patch(
+            'core.management.commands.partition_recipes.Command._indexes',
+            side_effect=lambda connection, model: (
+                [search_index] if model is Recipe else []
+            ),
+        ):
+            call_command(
+                'partition_recipes', dry_run=True, partitions=4, stdout=out
+            )
+
+        sql = out.getvalue()
+        self.assertIn('DROP INDEX "core_recipe_title_upper_like";', sql)
+        self.assertIn(
+            'CREATE INDEX core_recipe_title_upper_like ON "core_recipe" '
+            'USING btree (upper((title)::text) varchar_pattern_ops);',
+            sql,
+        )
+        self.assertLess(
+            sql.index('CREATE INDEX core_recipe_title_upper_like'),
+            sql.index('INSERT INTO "core_recipe"'),
+        )
+        self.assertIn('PARTITION BY HASH ("user_id")', sql)
+        self.assertIn('PARTITION BY HASH ("recipe_id")', sql)
+        self.assertIn('(MODULUS 4, REMAINDER 3)', sql)
+        self.assertIn('ADD PRIMARY KEY ("id", "user_id")', sql)
+        self.assertIn('OWNED BY "core_recipe"."id"', sql)
+
+    def test_requires_postgresql(self):
+        """Test partitioning other databases is refused"""
+        with patch.object(connection, 'vendor', 'sqlite'):
+            with self.assertRaisesMessage(CommandError, 'PostgreSQL'):
+                call_command('partition_recipes')
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Requires PostgreSQL.')
+class PartitionRecipesPostgresTests(TestCase):
+    """Test partitioning the recipe tables of a PostgreSQL database"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'user@example.com', 'testpass123'
+        )
+        self.recipe = Recipe.objects.create(
+            user=self.user, title='Soup', time_minutes=5,
+            price=Decimal('5.00'),
+        )
+        self.tag = Tag.objects.create(user=self.user, name='Vegan')
+        self.recipe.tags.add(self.tag)
+        self.ingredient = Ingredient.objects.create(
+            user=self.user, name='Salt'
+        )
+        RecipeIngredient.objects.create(
+            recipe=self.recipe, ingredient=self.ingredient,
+            quantity=Decimal('5'), unit='g',
+        )
+
+        call_command('partition_recipes', partitions=4, stdout=StringIO())
+
+    def _constraints(self, table):
+        """Return the type and columns of each constraint of a table"""
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT c.contype, array_agg(a.attname ORDER BY a.attname) '
+                'FROM pg_constraint c JOIN pg_attribute a '
+                'ON a.attrelid = c.conrelid AND a.attnum = ANY(c.conkey) '
+                'WHERE c.conrelid = %s::regclass '
+                'GROUP BY c.oid, c.contype',
+                [table],
+            )
+            return {(contype, tuple(columns))
+                    for contype, columns in cursor.fetchall()}
+
+    def test_tables_partitioned(self):
+        """Test each recipe table is partitioned with its rows kept"""
+        tables = ['core_recipe', 'core_recipe_tags', 'core_recipe_ingredients']
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT partrelid::regclass::text FROM pg_partitioned_table'
+            )
+            self.assertTrue(
+                set(tables) <= {row[0] for row in cursor.fetchall()}
+            )
+            cursor.execute(
+                'SELECT count(*) FROM pg_inherits '
+                'WHERE inhparent = %s::regclass',
+                ['core_recipe'],
+            )
+            self.assertEqual(cursor.fetchone()[0], 4)
+
+        recipe = Recipe.objects.get(pk=self.recipe.pk)
+        self.assertEqual(list(recipe.tags.all()), [self.tag])
+        self.assertEqual(
+            list(recipe.quantities.values_list('quantity', 'unit')),
+            [(Decimal('5.000'), 'g')],
+        )
+
+    def test_constraints_kept(self):
+        """Test keys and uniqueness are enforced on the partitioned tables"""
+        self.assertLessEqual(
+            {('p', ('id', 'user_id')), ('f', ('user_id',))},
+            self._constraints('core_recipe'),
+        )
+        self.assertLessEqual(
+            {
+                ('p', ('id', 'recipe_id')),
+                ('u', ('ingredient_id', 'recipe_id')),
+                ('f', ('ingredient_id',)),
+            },
+            self._constraints('core_recipe_ingredients'),
+        )
+
+        with self.assertRaises(IntegrityError):
+            with transaction.atomic():
+                RecipeIngredient.objects.create(
+                    recipe=self.recipe, ingredient=self.ingredient,
+                )
+        with self.assertRaises(IntegrityError):
+            with transaction.atomic():
+                self.recipe.tags.through.objects.bulk_create([
+                    self.recipe.tags.through(
+                        recipe_id=self.recipe.pk, tag_id=self.tag.pk + 1000,
+                    ),
+                ])
+                connection.check_constraints()
+
+    def test_search_index_kept(self):
+        """Test the title search index is created on the new table"""
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT tablename FROM pg_indexes WHERE indexname = %s',
+                ['core_recipe_title_upper_like'],
+            )
+            self.assertEqual(cursor.fetchall(), [('core_recipe',)])
+
+    def test_new_rows_continue_sequence(self):
+        """Test new recipes are numbered after the copied ones"""
+        recipe = Recipe.objects.create(
+            user=self.user, title='Bread', time_minutes=5,
+            price=Decimal('5.00'),
+        )
+
+        self.assertGreater(recipe.pk, self.recipe.pk)
+
+    def test_already_partitioned(self):
+        """Test partitioning twice is refused"""
+        with self.assertRaisesMessage(CommandError, 'already partitioned'):
+            call_command('partition_recipes', stdout=StringIO())
+
+
+class GcImagesTests(TestCase):
+    """Test garbage collecting recipe images"""
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings = override_settings(MEDIA_ROOT=media_root)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+        user = get_user_model().objects.create_user(
+            'user@example.com', 'testpass123'
+        )
+        self.recipe = Recipe.objects.create(
+            user=user, title='Sample', time_minutes=5, price=Decimal('5.00'),
+        )
+        self.storage = Recipe._meta.get_field('image').storage
+
+    def _gc_images(self, *args):
+        out = StringIO()
+        call_command('gc_images', '--grace', '0', *args, stdout=out)
+
+        return out.getvalue()
+
+    def test_unreferenced_images_deleted(self):
+        """Test only images no recipe uses are deleted"""
+        self.recipe.image.save('used.jpg', ContentFile(b'used'))
+        ImageBlob.objects.create(
+            digest='0' * 64, name='uploads/recipe/unused.jpg', size=6
+        )
+        self.storage.save('uploads/recipe/unused.jpg', ContentFile(b'unused'))
+
+        out = self._gc_images()
+
+        self.assertIn('Deleted 1 images.', out)
+        self.assertFalse(self.storage.exists('uploads/recipe/unused.jpg'))
+        self.assertTrue(self.storage.exists(self.recipe.image.name))
+        self.assertEqual(
+            list(ImageBlob.objects.values_list('name', flat=True)),
+            [self.recipe.image.name],
+        )
+
+    def test_grace_period(self):
+        """Test recently stored images are kept"""
+        ImageBlob.objects.create(
+            digest='0' * 64, name='uploads/recipe/unused.jpg', size=6
+        )
+
+        out = StringIO()
+        call_command('gc_images', stdout=out)
+
+        self.assertIn('Deleted 0 images.', out.getvalue())
+        self.assertTrue(ImageBlob.objects.exists())
+
+    def test_recount(self):
+        """Test reference counts are fixed from the recipes"""
+        self.recipe.image.save('used.jpg', ContentFile(b'used'))
+        ImageBlob.objects.update(ref_count=5)
+
+        out = self._gc_images('--recount', '--dry-run')
+
+        self.assertIn('Fixed 1 reference counts.', out)
+        self.assertEqual(ImageBlob.objects.get().ref_count, 5)
+
+        self._gc_images('--recount')
+
+        self.assertEqual(ImageBlob.objects.get().ref_count, 1)
+
+
+class ReclaimMediaTests(TestCase):
+    """Test reclaiming unused media files"""
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings = override_settings(MEDIA_ROOT=media_root)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+        user = get_user_model().objects.create_user(
+            'user@example.com', 'testpass123'
+        )
+        self.recipe = Recipe.objects.create(
+            user=user, title='Sample', time_minutes=5, price=Decimal('5.00'),
+        )
+        self.storage = Recipe._meta.get_field('image').storage
+
+    def _reclaim_media(self, *args):
+        out = StringIO()
+        call_command(
+            'reclaim_media', '--grace', '0', '--batch-size', '2', *args,
+            stdout=out,
+        )
+
+        return out.getvalue()
+
+    def test_unused_files_deleted(self):
+        """Test files neither recipes nor blobs use are deleted"""
+        self.recipe.image.save('used.jpg', ContentFile(b'used'))
+        blob = ImageBlob.objects.create(
+            digest='0' * 64, name='uploads/recipe/released.jpg', size=8
+        )
+        self.storage.save(blob.name, ContentFile(b'released'))
+        orphans = [
+            self.storage.save(f'uploads/recipe/{name}', ContentFile(b'x'))
+            for name in ('a.jpg', 'b.jpg', 'c.jpg')
+        ]
+
+        out = self._reclaim_media()
+
+        self.assertIn('Deleted 4 of 5 files.', out)
+        for name in orphans + [blob.name]:
+            self.assertFalse(self.storage.exists(name))
+        self.assertTrue(self.storage.exists(self.recipe.image.name))
+        self.assertEqual(ImageBlob.objects.count(), 1)
+
+    def test_dry_run(self):
+        """Test a dry run only lists the unused files"""
+        name = self.storage.save('uploads/recipe/a.jpg', ContentFile(b'x'))
+
+        out = self._reclaim_media('--dry-run')
+
+        self.assertIn(name, out)
+        self.assertIn('Would delete 1 of 1 files.', out)
+        self.assertTrue(self.storage.exists(name))
+
+    def test_grace_period(self):
+        """Test recently written files are kept"""
+        name = self.storage.save('uploads/recipe/a.jpg', ContentFile(b'x'))
+
+        out = StringIO()
+        call_command('reclaim_media', stdout=out)
+
+        self.assertIn('Deleted 0 of 0 files.', out.getvalue())
+        self.assertTrue(self.storage.exists(name))
+
+
+class BenchmarkUserDeleteTests(TestCase):
+    """Test the user deletion benchmark"""
+
+    def test_benchmark(self):
+        """Test users are created and deleted with both strategies"""
+        out = StringIO()
+
+        call_command(
+            'benchmark_user_delete', '--recipes', '3', '--collector',
+            stdout=out,
+        )
+
+        self.assertIn('chunked', out.getvalue())
+        self.assertIn('collector', out.getvalue())
+        self.assertFalse(Recipe.objects.exists())
+        self.assertFalse(get_user_model().objects.exists())
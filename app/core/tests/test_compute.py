@@ -0,0 +1,103 @@
+"""
+Tests for unit conversions and batch computations.
+"""
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase
+
+from core.compute import compute_batch
+from core.models import Ingredient, Recipe, RecipeIngredient
+from core.units import convert, to_base
+
+
+class UnitTests(SimpleTestCase):
+    """Test converting quantities between units"""
+
+    def test_convert(self):
+        """Test converting between units of a dimension"""
+        self.assertAlmostEqual(convert(1, 'kg', 'lb'), 2.20462, places=5)
+        self.assertAlmostEqual(convert(3, 'tsp', 'tbsp'), 1)
+        self.assertEqual(to_base(2, 'l'), (2000, 'ml'))
+
+    def test_convert_between_dimensions(self):
+        """Test converting mass to volume fails"""
+        with self.assertRaises(ValueError):
+            convert(1, 'g', 'ml')
+
+
+class ComputeBatchTests(TestCase):
+    """Test scaling and totalling recipes as a batch"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'user@example.com', 'testpass123'
+        )
+        self.salt = Ingredient.objects.create(user=self.user, name='Salt')
+
+    def _recipe(self, price, *quantities):
+        recipe = Recipe.objects.create(
+            user=self.user, title='Sample', time_minutes=10,
+            price=Decimal(price),
+        )
+        for quantity, unit in quantities:
+            RecipeIngredient.objects.create(
+                recipe=recipe, ingredient=self.salt,
+                quantity=quantity and Decimal(quantity), unit=unit,
+            )
+
+        return recipe
+
+    def test_totals_by_dimension(self):
+        """Test quantities are totalled separately per dimension"""
+        first = self._recipe('1.00', ('1', 'tsp'))
+        second = self._recipe('2.00', ('1', 'oz'))
+        third = self._recipe('3.00', (None, ''))
+
+        totals = compute_batch(Recipe.objects.all(), {
+            first.pk: Decimal(2), second.pk: Decimal('0.5'),
+            third.pk: Decimal(1),
+        })
+
+        self.assertEqual(totals.price, Decimal('6.00'))
+        self.assertEqual(totals.time_minutes, 30)
+        self.assertEqual(
+            [(total.quantity, total.unit) for total in totals.ingredients],
+            [(14.175, 'g'), (9.858, 'ml')],
+        )
+
+    def test_prices_rounded_half_up(self):
+        """Test scaled prices are rounded half up to the cent"""
+        first = self._recipe('1.25')
+        second = self._recipe('0.35')
+
+        totals = compute_batch(Recipe.objects.all(), {
+            first.pk: Decimal('0.5'), second.pk: Decimal('0.5'),
+        })
+
+        self.assertEqual(
+            [recipe.price for recipe in totals.recipes],
+            [Decimal('0.63'), Decimal('0.18')],
+        )
+        self.assertEqual(totals.price, Decimal('0.81'))
+
+    def test_query_count_independent_of_recipes(self):
+        """Test the batch takes the same queries for any number of recipes"""
+        recipes = [self._recipe('1.00', ('1', 'g')) for _ in range(20)]
+
+        with self.assertNumQueries(3):
+            totals = compute_batch(
+                Recipe.objects.all(), {r.pk: Decimal(1) for r in recipes}
+            )
+
+        self.assertEqual(totals.ingredients[0].quantity, 20)
+
+    def test_unknown_recipes_left_out(self):
+        """Test recipes not in the queryset are not computed"""
+        recipe = self._recipe('1.00')
+
+        totals = compute_batch(
+            Recipe.objects.none(), {recipe.pk: Decimal(1)}
+        )
+
+        self.assertEqual(totals.recipes, [])
@@ -0,0 +1,108 @@
+"""
+Tests for deleting large numbers of rows.
+"""
+import shutil
+import tempfile
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from rest_framework.exceptions import AuthenticationFailed
+
+from core.authentication import SignedTokenAuthentication, issue_token
+from core.deletion import delete_in_chunks, delete_user
+from core.models import ImageBlob, Ingredient, Recipe, Tag
+
+
+def create_user(email='user@example.com'):
+    """Create a user with two tagged recipes"""
+    user = get_user_model().objects.create_user(email, 'testpass123')
+    tag = Tag.objects.create(user=user, name='Vegan')
+    ingredient = Ingredient.objects.create(user=user, name='Salt')
+    for _ in range(2):
+        recipe = Recipe.objects.create(
+            user=user, title='Sample', time_minutes=5, price=Decimal('5.00'),
+        )
+        recipe.tags.add(tag)
+        recipe.ingredients.add(ingredient)
+
+    return user
+
+
+class DeletionTests(TestCase):
+    """Test deleting users and recipes in chunks"""
+
+    def test_delete_user(self):
+        """Test a user and everything they own is deleted"""
+        user = create_user()
+        other = create_user('other@example.com')
+
+        delete_user(user, chunk_size=1)
+
+        self.assertFalse(get_user_model().objects.filter(pk=user.pk).exists())
+        for model in (Recipe, Tag, Ingredient):
+            self.assertFalse(model.objects.filter(user=user).exists())
+            self.assertEqual(model.objects.filter(user=other).count(),
+                             2 if model is Recipe else 1)
+        self.assertEqual(Recipe.tags.through.objects.count(), 2)
+        self.assertEqual(Recipe.ingredients.through.objects.count(), 2)
+
+    def test_user_locked_out_while_deleting(self):
+        """Test the user's tokens stop working before their data is gone"""
+        user = create_user()
+        token = issue_token(user)
+        auth = SignedTokenAuthentication()
+        auth.authenticate_credentials(token.key)
+
+        def check_locked_out(*args, **kwargs):
+            with self.assertRaises(AuthenticationFailed):
+                auth.authenticate_credentials(token.key)
+            return 0
+
+        with patch('core.deletion.delete_in_chunks',
+                   side_effect=check_locked_out) as delete:
+            delete_user(user)
+
+        self.assertTrue(delete.called)
+
+    def test_queries_per_chunk(self):
+        """Test recipes are deleted with a fixed number of queries a chunk"""
+        user = create_user()
+
+        with CaptureQueriesContext(connection) as one_chunk:
+            deleted = delete_in_chunks(Recipe.objects.filter(user=user), 2)
+
+        self.assertEqual(deleted, 2)
+
+        user = create_user('other@example.com')
+        Recipe.objects.bulk_create(
+            Recipe(user=user, title='Sample', time_minutes=5, price=1)
+            for _ in range(8)
+        )
+        with CaptureQueriesContext(connection) as many_chunks:
+            deleted = delete_in_chunks(Recipe.objects.filter(user=user), 10)
+
+        self.assertEqual(deleted, 10)
+        self.assertEqual(len(many_chunks), len(one_chunk))
+
+    def test_images_released(self):
+        """Test images of deleted recipes are deleted after commit"""
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        user = create_user()
+        with override_settings(MEDIA_ROOT=media_root):
+            for recipe in Recipe.objects.filter(user=user):
+                recipe.image.save('image.jpg', ContentFile(b'image'))
+            storage = Recipe._meta.get_field('image').storage
+            name = ImageBlob.objects.get().name
+
+            with self.captureOnCommitCallbacks(execute=True):
+                delete_user(user, chunk_size=1)
+
+            self.assertFalse(storage.exists(name))
+            self.assertFalse(ImageBlob.objects.exists())
@@ -0,0 +1,163 @@
+"""
+Tests for the change event stream.
+"""
+import asyncio
+from decimal import Decimal
+
+from asgiref.sync import async_to_sync, sync_to_async
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+
+from core.authentication import issue_token
+from core.events import CHANGED_EVENT, EventStreamApplication, hub
+from core.models import Recipe
+
+EVENTS_PATH = '/api/recipe/events/'
+
+
+async def passthrough(scope, receive, send):
+    """ASGI app standing in for Django"""
+    await send({'type': 'http.response.start', 'status': 204})
+
+
+def http_scope(path=EVENTS_PATH, method='GET', token=None):
+    """Return the scope of an HTTP request"""
+    headers = []
+    if token is not None:
+        headers.append((b'authorization', f'Token {token}'.encode()))
+
+    return {
+        'type': 'http', 'method': method, 'path': path, 'headers': headers,
+    }
+
+
+class Client:
+    """Collect the messages sent by an ASGI app"""
+
+    def __init__(self):
+        self.sent = asyncio.Queue()
+        self.received = asyncio.Queue()
+
+    async def receive(self):
+        return await self.received.get()
+
+    async def send(self, message):
+        await self.sent.put(message)
+
+    async def next(self):
+        return await asyncio.wait_for(self.sent.get(), timeout=1)
+
+    def disconnect(self):
+        self.received.put_nowait({'type': 'http.disconnect'})
+
+
+@override_settings(SYNC_SETTLE_SECONDS=0, EVENTS_HEARTBEAT_SECONDS=15)
+class EventStreamTests(TestCase):
+    """Test streaming change events to clients"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'user@example.com', 'testpass123'
+        )
+        self.app = EventStreamApplication(passthrough)
+
+    def test_other_requests_passed_on(self):
+        """Test requests to other paths go to the wrapped app"""
+        async def run():
+            client = Client()
+            await self.app(http_scope('/api/recipe/recipes/'),
+                           client.receive, client.send)
+            return await client.next()
+
+        self.assertEqual(async_to_sync(run)()['status'], 204)
+
+    def test_auth_required(self):
+        """Test streams require a valid token"""
+        async def run(scope):
+            client = Client()
+            await self.app(scope, client.receive, client.send)
+            return await client.next()
+
+        for scope in (http_scope(), http_scope(token='invalid')):
+            self.assertEqual(async_to_sync(run)(scope)['status'], 401)
+
+    def test_only_get_allowed(self):
+        """Test other methods are rejected"""
+        async def run():
+            client = Client()
+            token = issue_token(self.user).key
+            await self.app(http_scope(method='POST', token=token),
+                           client.receive, client.send)
+            return await client.next()
+
+        self.assertEqual(async_to_sync(run)()['status'], 405)
+
+    def test_stream_changes(self):
+        """Test clients get an event on connect and when data changes"""
+        token = issue_token(self.user).key
+
+        async def run():
+            client = Client()
+            stream = asyncio.ensure_future(self.app(
+                http_scope(token=token), client.receive, client.send
+            ))
+            start = await client.next()
+            first = await client.next()
+
+            hub.publish_threadsafe([self.user.pk + 1])
+            hub.publish_threadsafe([self.user.pk])
+            changed = await client.next()
+
+            client.disconnect()
+            await asyncio.wait_for(stream, timeout=1)
+            return start, first, changed
+
+        start, first, changed = async_to_sync(run)()
+
+        self.assertEqual(start['status'], 200)
+        self.assertIn(
+            (b'content-type', b'text/event-stream'), start['headers']
+        )
+        self.assertTrue(first['body'].endswith(CHANGED_EVENT))
+        self.assertEqual(changed['body'], CHANGED_EVENT)
+        self.assertFalse(hub._subscribers)
+
+    @override_settings(EVENTS_HEARTBEAT_SECONDS=0.01,
+                       EVENTS_MAX_STREAM_SECONDS=0.05)
+    def test_stream_heartbeats_and_ends(self):
+        """Test idle streams get keepalives and end after the limit"""
+        token = issue_token(self.user).key
+
+        async def run():
+            client = Client()
+            await asyncio.wait_for(self.app(
+                http_scope(token=token), client.receive, client.send
+            ), timeout=1)
+            messages = []
+            while not client.sent.empty():
+                messages.append(client.sent.get_nowait())
+            return messages
+
+        messages = async_to_sync(run)()
+
+        self.assertIn(b': keepalive\n\n', [m.get('body') for m in messages])
+        self.assertEqual(messages[-1], {
+            'type': 'http.response.body', 'body': b''
+        })
+
+    def test_changes_notify_subscribers(self):
+        """Test saving a recipe notifies the owner's streams"""
+        async def run():
+            async with hub.subscribe(self.user.pk) as queue:
+                await sync_to_async(self._create_recipe)()
+                await asyncio.wait_for(queue.get(), timeout=1)
+
+        async_to_sync(run)()
+
+    def _create_recipe(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Recipe.objects.create(
+                user=self.user, title='Sample', time_minutes=5,
+                price=Decimal('5.00'),
+            )
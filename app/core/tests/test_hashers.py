@@ -0,0 +1,98 @@
+"""
+Tests for password hashers and the hashing pool.
+"""
+from django.contrib.auth import authenticate, get_user_model
+from django.contrib.auth.hashers import make_password
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from core.hashers import (
+    PasswordHashingBusy,
+    ScryptPasswordHasher,
+    _get_pool,
+    run_in_hashing_pool,
+)
+
+
+class ScryptPasswordHasherTests(SimpleTestCase):
+    """Test the scrypt password hasher"""
+
+    def setUp(self):
+        self.hasher = ScryptPasswordHasher()
+
+    def test_encode_and_verify(self):
+        """Test a password verifies against its own hash"""
+        encoded = self.hasher.encode('testpass123', self.hasher.salt())
+
+        self.assertTrue(encoded.startswith('scrypt$16384$'))
+        self.assertTrue(self.hasher.verify('testpass123', encoded))
+        self.assertFalse(self.hasher.verify('wrongpass', encoded))
+
+    def test_must_update_on_work_factor_change(self):
+        """Test hashes with another work factor need updating"""
+        salt = self.hasher.salt()
+        current = self.hasher.encode('testpass123', salt)
+        outdated = self.hasher.encode('testpass123', salt, n=2 ** 10)
+
+        self.assertFalse(self.hasher.must_update(current))
+        self.assertTrue(self.hasher.must_update(outdated))
+
+
+class HashingPoolTests(SimpleTestCase):
+    """Test the bounded password hashing pool"""
+
+    def test_run_in_hashing_pool(self):
+        """Test the function result is returned"""
+        self.assertEqual(run_in_hashing_pool(sum, [1, 2]), 3)
+
+    @override_settings(PASSWORD_HASHING_TIMEOUT=0)
+    def test_saturated_pool_raises_busy(self):
+        """Test callers are rejected when no slot is free"""
+        pool, slots = _get_pool()
+        acquired = 0
+        while slots.acquire(blocking=False):
+            acquired += 1
+
+        try:
+            with self.assertRaises(PasswordHashingBusy):
+                run_in_hashing_pool(sum, [1, 2])
+        finally:
+            for _ in range(acquired):
+                slots.release()
+
+    @override_settings(PASSWORD_HASHING_WORKERS=0)
+    def test_pool_disabled(self):
+        """Test hashing runs inline when the pool is disabled"""
+        self.assertEqual(run_in_hashing_pool(sum, [1, 2]), 3)
+
+
+class PooledModelBackendTests(TestCase):
+    """Test authenticating with the pooled model backend"""
+
+    def test_authenticate(self):
+        """Test authenticating with valid and invalid credentials"""
+        user = get_user_model().objects.create_user(
+            'user@example.com', 'testpass123'
+        )
+
+        self.assertEqual(
+            authenticate(username='user@example.com', password='testpass123'),
+            user
+        )
+        self.assertIsNone(
+            authenticate(username='user@example.com', password='wrong')
+        )
+        self.assertIsNone(
+            authenticate(username='other@example.com', password='wrong')
+        )
+
+    def test_rehash_outdated_password_on_login(self):
+        """Test passwords from an old hasher are upgraded on login"""
+        user = get_user_model().objects.create_user('user@example.com')
+        user.password = make_password('testpass123', hasher='pbkdf2_sha1')
+        user.save()
+
+        authenticate(username='user@example.com', password='testpass123')
+
+        user.refresh_from_db()
+        self.assertTrue(user.password.startswith('pbkdf2_sha256$'))
+        self.assertTrue(user.check_password('testpass123'))
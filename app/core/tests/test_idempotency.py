@@ -0,0 +1,201 @@
+"""
+Tests for idempotent API requests.
+"""
+import shutil
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest.mock import patch
+
+from PIL import Image
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import IdempotencyKey, Recipe
+
+
+RECIPES_URL = reverse('recipe:recipe-list')
+PAYLOAD = {'title': 'Soup', 'time_minutes': 10, 'price': '5.00'}
+
+
+class IdempotentRequestTests(TestCase):
+    """Test replaying responses to retried requests"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'user@example.com', 'testpass123'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _create(self, key='key-1', payload=PAYLOAD):
+        return self.client.post(
+            RECIPES_URL, payload, format='json', HTTP_IDEMPOTENCY_KEY=key
+        )
+
+    def test_retry_replays_response(self):
+        """Test a retried create returns the first response"""
+        res1 = self._create()
+        res2 = self._create()
+
+        self.assertEqual(res1.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(res2.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(res2.data, res1.data)
+        self.assertEqual(res2['Idempotent-Replayed'], 'true')
+        self.assertEqual(Recipe.objects.count(), 1)
+
+    @patch('recipe.views.RecipeViewSet.get_success_headers')
+    def test_retry_replays_headers(self, patched_headers):
+        """Test a retried create returns the headers of the first response"""
+        patched_headers.return_value = {'Location': '/api/recipe/1/'}
+
+        self._create()
+        res = self._create()
+
+        self.assertEqual(res['Location'], '/api/recipe/1/')
+        self.assertEqual(
+            IdempotencyKey.objects.get().headers,
+            {'Location': '/api/recipe/1/'},
+        )
+
+    def test_key_deleted_while_claiming(self):
+        """Test a key released by a failed request is claimed again"""
+        IdempotencyKey.objects.create(
+            user=self.user, key='key-1', fingerprint='x' * 64,
+            expires_at=timezone.now() + timedelta(seconds=60),
+        )
+        get = IdempotencyKey.objects.get
+
+        def fail_meanwhile(**kwargs):
+            IdempotencyKey.objects.filter(**kwargs).delete()
+            return get(**kwargs)
+
+        with patch.object(
+            IdempotencyKey.objects, 'get', side_effect=fail_meanwhile
+        ):
+            res = self._create()
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Recipe.objects.count(), 1)
+        self.assertEqual(IdempotencyKey.objects.get().status_code, 201)
+
+    def test_requests_without_key_not_stored(self):
+        """Test requests without a key are handled as usual"""
+        self.client.post(RECIPES_URL, PAYLOAD, format='json')
+        self.client.post(RECIPES_URL, PAYLOAD, format='json')
+
+        self.assertEqual(Recipe.objects.count(), 2)
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+    def test_keys_scoped_to_user(self):
+        """Test users do not see each other's responses"""
+        self._create()
+        other = get_user_model().objects.create_user('other@example.com')
+        self.client.force_authenticate(other)
+
+        res = self._create()
+
+        self.assertNotIn('Idempotent-Replayed', res)
+        self.assertEqual(Recipe.objects.count(), 2)
+
+    def test_key_reused_for_other_request(self):
+        """Test reusing a key with a different payload is rejected"""
+        self._create()
+
+        res = self._create(payload={**PAYLOAD, 'title': 'Bread'})
+
+        self.assertEqual(
+            res.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY
+        )
+        self.assertEqual(Recipe.objects.count(), 1)
+
+    def test_request_in_progress(self):
+        """Test a retry while the first request runs is rejected"""
+        self._create()
+        IdempotencyKey.objects.update(
+            status_code=None, response=None,
+            expires_at=timezone.now() + timedelta(seconds=60),
+        )
+
+        res = self._create()
+
+        self.assertEqual(res.status_code, status.HTTP_409_CONFLICT)
+
+    def test_expired_key_reused(self):
+        """Test a key is processed again once it expired"""
+        self._create()
+        IdempotencyKey.objects.update(expires_at=timezone.now())
+
+        res = self._create()
+
+        self.assertNotIn('Idempotent-Replayed', res)
+        self.assertEqual(Recipe.objects.count(), 2)
+        self.assertGreater(
+            IdempotencyKey.objects.get().expires_at,
+            timezone.now() + timedelta(hours=1),
+        )
+
+    @patch('recipe.views.RecipeViewSet.perform_create')
+    def test_errors_not_stored(self, patched_create):
+        """Test failed requests can be retried"""
+        patched_create.side_effect = RuntimeError
+        self.client.raise_request_exception = False
+
+        res = self._create()
+
+        self.assertEqual(
+            res.status_code, status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+    def test_upload_retry_not_processed_again(self):
+        """Test a retried image upload returns the stored image"""
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        recipe = Recipe.objects.create(
+            user=self.user, title='Soup', time_minutes=5,
+            price=Decimal('5.00'),
+        )
+        url = reverse('recipe:recipe-upload-image', args=[recipe.id])
+
+        with override_settings(MEDIA_ROOT=media_root), \
+                tempfile.NamedTemporaryFile(suffix='.jpg') as image_file:
+            Image.new('RGB', (10, 10)).save(image_file.name, format='JPEG')
+            responses = []
+            with patch(
+                'core.fields.content_digest', wraps=lambda f: 'x' * 64
+            ) as patched_digest:
+                for _ in range(2):
+                    image_file.seek(0)
+                    responses.append(self.client.post(
+                        url, {'image': image_file}, format='multipart',
+                        HTTP_IDEMPOTENCY_KEY='upload-1',
+                    ))
+
+        self.assertEqual(responses[1].data, responses[0].data)
+        self.assertEqual(patched_digest.call_count, 1)
+
+    def test_purge_expired_keys(self):
+        """Test only expired keys are purged"""
+        self._create('key-1')
+        self._create('key-2')
+        IdempotencyKey.objects.filter(key='key-1').update(
+            expires_at=timezone.now()
+        )
+        out = StringIO()
+
+        call_command('purge_idempotency_keys', stdout=out)
+
+        self.assertIn('Deleted 1 expired', out.getvalue())
+        self.assertEqual(
+            list(IdempotencyKey.objects.values_list('key', flat=True)),
+            ['key-2'],
+        )
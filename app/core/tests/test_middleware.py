@@ -0,0 +1,128 @@
+"""
+Tests for custom middleware.
+"""
+import gzip
+import os
+import tempfile
+
+from django.core.files.base import ContentFile
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from core.compression import select_encoding
+from core.middleware import CompressionMiddleware
+from core.storage import (
+    CompressedManifestStaticFilesStorage,
+    CompressedStaticFilesStorage,
+)
+
+
+BODY = b'{"title": "Sample recipe"}' * 100
+
+
+def create_response(content=BODY, content_type='application/json'):
+    """Create and return a response with the given body"""
+    return HttpResponse(content, content_type=content_type)
+
+
+@override_settings(COMPRESSION_ENCODINGS=['gzip'], COMPRESSION_MIN_SIZE=200)
+class CompressionMiddlewareTests(SimpleTestCase):
+    """Test the response compression middleware"""
+
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def _process(self, response, accept_encoding='gzip, deflate'):
+        """Run the response through the middleware and return it"""
+        request = self.factory.get(
+            '/api/recipe/recipes/', HTTP_ACCEPT_ENCODING=accept_encoding
+        )
+        middleware = CompressionMiddleware(lambda request: response)
+
+        return middleware(request)
+
+    def test_compress_json_response(self):
+        """Test large JSON responses are gzip compressed"""
+        res = self._process(create_response())
+
+        self.assertEqual(res['Content-Encoding'], 'gzip')
+        self.assertEqual(res['Vary'], 'Accept-Encoding')
+        self.assertEqual(res['Content-Length'], str(len(res.content)))
+        self.assertEqual(gzip.decompress(res.content), BODY)
+
+    def test_small_response_not_compressed(self):
+        """Test responses under the size threshold are left alone"""
+        res = self._process(create_response(b'{"id": 1}'))
+
+        self.assertFalse(res.has_header('Content-Encoding'))
+        self.assertFalse(res.has_header('Vary'))
+
+    def test_content_type_not_allowed(self):
+        """Test responses with other content types are left alone"""
+        res = self._process(create_response(content_type='image/jpeg'))
+
+        self.assertFalse(res.has_header('Content-Encoding'))
+
+    def test_client_without_accept_encoding(self):
+        """Test uncompressed response still varies on Accept-Encoding"""
+        res = self._process(create_response(), accept_encoding='')
+
+        self.assertFalse(res.has_header('Content-Encoding'))
+        self.assertEqual(res['Vary'], 'Accept-Encoding')
+        self.assertEqual(res.content, BODY)
+
+    def test_streaming_response_not_compressed(self):
+        """Test streaming responses are passed through"""
+        res = self._process(StreamingHttpResponse(iter([BODY])))
+
+        self.assertFalse(res.has_header('Content-Encoding'))
+
+    def test_etag_weakened(self):
+        """Test strong ETags are weakened for compressed responses"""
+        response = create_response()
+        response['ETag'] = '"abc"'
+
+        res = self._process(response)
+
+        self.assertEqual(res['ETag'], 'W/"abc"')
+
+    def test_select_encoding(self):
+        """Test selecting a coding based on quality and preference"""
+        preferred = ['br', 'gzip']
+
+        self.assertEqual(select_encoding('gzip, br', preferred), 'br')
+        self.assertEqual(select_encoding('gzip, br;q=0.5', preferred), 'gzip')
+        self.assertEqual(select_encoding('*', preferred), 'br')
+        self.assertIsNone(select_encoding('gzip;q=0, deflate', preferred))
+
+
+@override_settings(COMPRESSION_MIN_SIZE=200)
+class CompressedStaticFilesStorageTests(SimpleTestCase):
+    """Test the pre-compressing static files storage"""
+
+    def test_post_process_writes_gzip_copies(self):
+        """Test collected text assets get a .gz copy"""
+        with tempfile.TemporaryDirectory() as location:
+            storage = CompressedStaticFilesStorage(location=location)
+            storage.save('app.css', ContentFile(b'body {}' * 100))
+            storage.save('logo.png', ContentFile(b'\x89PNG' * 100))
+
+            processed = list(storage.post_process(
+                {'app.css': None, 'logo.png': None}
+            ))
+
+            self.assertIn(('app.css', 'app.css.gz', True), processed)
+            self.assertTrue(os.path.exists(storage.path('app.css.gz')))
+            self.assertFalse(os.path.exists(storage.path('logo.png.gz')))
+
+    def test_manifest_post_process_compresses_hashed_files(self):
+        """Test hashed copies of collected assets get a .gz copy"""
+        with tempfile.TemporaryDirectory() as location:
+            storage = CompressedManifestStaticFilesStorage(location=location)
+            storage.save('app.css', ContentFile(b'body {}' * 100))
+
+            list(storage.post_process({'app.css': (storage, 'app.css')}))
+
+            hashed_name = storage.stored_name('app.css')
+            self.assertNotEqual(hashed_name, 'app.css')
+            self.assertTrue(storage.exists(hashed_name + '.gz'))
@@ -1,13 +1,21 @@
 """
 Tests for models.
 """
+import hashlib
+import os
+import shutil
+import tempfile
 from unittest.mock import patch
 from decimal import Decimal
 
-from django.test import TestCase
+from django.core.files.base import ContentFile
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.contrib.auth import get_user_model
 
 from core import models
+from core.fields import ContentAddressedFieldFile
 
 
 def create_user(email='user@example.com', password='testpass123'):
@@ -72,6 +80,27 @@ class ModelTests(TestCase):
 
         self.assertEqual(str(recipe), recipe.title)
 
+    def test_update_recipe_scoped_to_user(self):
+        """Test recipe updates filter by user to touch one partition"""
+        user = create_user()
+        other = create_user('other@example.com')
+        recipe = models.Recipe.objects.create(
+            user=user, title='Test recipe', time_minutes=5,
+            price=Decimal('5.50'),
+        )
+        recipe = models.Recipe.objects.get(pk=recipe.pk)
+
+        recipe.user = other
+        with CaptureQueriesContext(connection) as queries:
+            recipe.save()
+        recipe.title = 'Updated'
+        recipe.save()
+
+        self.assertIn(f'"user_id" = {user.pk}', queries[0]['sql'])
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.user, other)
+        self.assertEqual(recipe.title, 'Updated')
+
     def test_create_tag(self):
         """Test creating a tag is successful."""
         user = create_user()
@@ -94,3 +123,127 @@ class ModelTests(TestCase):
 
         file_path = models.recipe_image_file_path(None, 'myimage.jpg')
         self.assertEqual(file_path, fr'uploads/recipe/{uuid}.jpg')
+
+    def test_recipe_filename_digest(self):
+        """Test content addressed image paths keep the digest"""
+        digest = hashlib.sha256(b'image').hexdigest()
+
+        file_path = models.recipe_image_file_path(None, f'{digest}.jpg')
+        self.assertEqual(file_path, f'uploads/recipe/{digest}.jpg')
+
+
+class ImageBlobTests(TestCase):
+    """Test storing identical recipe images once"""
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings = override_settings(MEDIA_ROOT=media_root)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+        self.user = create_user()
+
+    def _recipe(self):
+        return models.Recipe.objects.create(
+            user=self.user, title='Sample', time_minutes=5,
+            price=Decimal('5.00'),
+        )
+
+    def test_identical_images_stored_once(self):
+        """Test recipes with the same image share one file"""
+        recipe1 = self._recipe()
+        recipe2 = self._recipe()
+        recipe1.image.save('one.JPG', ContentFile(b'image'))
+
+        with patch.object(
+            recipe2.image.storage, 'save', wraps=recipe2.image.storage.save
+        ) as patched_save:
+            recipe2.image.save('two.jpg', ContentFile(b'image'))
+
+        patched_save.assert_not_called()
+        digest = hashlib.sha256(b'image').hexdigest()
+        self.assertEqual(recipe1.image.name, f'uploads/recipe/{digest}.jpg')
+        self.assertEqual(recipe2.image.name, recipe1.image.name)
+        blob = models.ImageBlob.objects.get(digest=digest)
+        self.assertEqual(blob.name, recipe1.image.name)
+        self.assertEqual(blob.size, 5)
+        self.assertEqual(blob.ref_count, 2)
+
+    def test_replacing_image_releases_blob(self):
+        """Test replacing an image drops the reference to the old one"""
+        recipe = self._recipe()
+        recipe.image.save('one.jpg', ContentFile(b'one'))
+        old_name = recipe.image.name
+        recipe = models.Recipe.objects.get(pk=recipe.pk)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe.image.save('two.jpg', ContentFile(b'two'))
+
+        blob = models.ImageBlob.objects.get()
+        self.assertEqual(blob.name, recipe.image.name)
+        self.assertEqual(blob.ref_count, 1)
+        self.assertFalse(recipe.image.storage.exists(old_name))
+
+    def test_same_image_saved_again_referenced_once(self):
+        """Test saving a recipe's own image again takes no reference"""
+        recipe = self._recipe()
+        for _ in range(3):
+            recipe.image.save('one.jpg', ContentFile(b'image'))
+
+        self.assertEqual(models.ImageBlob.objects.get().ref_count, 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe.image.delete()
+
+        self.assertFalse(models.ImageBlob.objects.exists())
+
+    def test_concurrent_identical_images_stored_once(self):
+        """Test an image stored meanwhile is used instead of a copy"""
+        recipe1 = self._recipe()
+        recipe2 = self._recipe()
+        recipe1.image.save('one.jpg', ContentFile(b'image'))
+        storage = recipe2.image.storage
+
+        # As if recipe1 stored its image after recipe2 looked for it.
+        with patch.object(
+            ContentAddressedFieldFile, '_acquire_blob', return_value=None
+        ), self.captureOnCommitCallbacks(execute=True):
+            recipe2.image.save('two.jpg', ContentFile(b'image'))
+
+        self.assertEqual(recipe2.image.name, recipe1.image.name)
+        self.assertEqual(models.ImageBlob.objects.get().ref_count, 2)
+        self.assertEqual(
+            storage.listdir(models.RECIPE_IMAGE_DIR)[1],
+            [os.path.basename(recipe1.image.name)],
+        )
+
+    def test_delete_shared_image_keeps_file(self):
+        """Test deleting a shared image keeps it for the other recipes"""
+        recipe1 = self._recipe()
+        recipe2 = self._recipe()
+        recipe1.image.save('one.jpg', ContentFile(b'image'))
+        recipe2.image.save('two.jpg', ContentFile(b'image'))
+        name = recipe1.image.name
+
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe1.image.delete()
+
+        self.assertFalse(recipe1.image)
+        self.assertTrue(recipe2.image.storage.exists(name))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe2.image.delete()
+
+        self.assertFalse(recipe2.image.storage.exists(name))
+        self.assertFalse(models.ImageBlob.objects.exists())
+
+    def test_missing_file_stored_again(self):
+        """Test a blob whose file is gone is written again"""
+        recipe = self._recipe()
+        recipe.image.save('one.jpg', ContentFile(b'image'))
+        recipe.image.storage.delete(recipe.image.name)
+
+        self._recipe().image.save('two.jpg', ContentFile(b'image'))
+
+        self.assertTrue(recipe.image.storage.exists(recipe.image.name))
@@ -0,0 +1,87 @@
+"""
+Tests for the fast JSON renderer and parser.
+"""
+import io
+from datetime import date, datetime, timezone
+from decimal import Decimal
+from unittest.mock import patch
+from uuid import UUID
+
+from django.test import SimpleTestCase
+from django.utils.translation import gettext_lazy as _
+
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import JSONRenderer
+
+from core.renderers import FastJSONRenderer, FastJSONParser
+
+
+SAMPLE_DATA = {
+    'id': 1,
+    'title': 'Crème brûlée',
+    'price': Decimal('5.50'),
+    'created': datetime(2024, 7, 12, 16, 0, 0, 123456, tzinfo=timezone.utc),
+    'day': date(2024, 7, 12),
+    'uuid': UUID('12345678-1234-5678-1234-567812345678'),
+    'label': _('Recipe'),
+    'tags': [{'id': 1, 'name': 'Dessert'}],
+    'line': 'a b',
+}
+
+
+class FastJSONRendererTests(SimpleTestCase):
+    """Test the fast JSON renderer"""
+
+    def test_render_matches_stdlib_renderer(self):
+        """Test output is identical to the default JSON renderer"""
+        expected = JSONRenderer().render(SAMPLE_DATA)
+
+        res = FastJSONRenderer().render(SAMPLE_DATA)
+
+        self.assertEqual(res, expected)
+
+    def test_render_none(self):
+        """Test rendering None returns an empty bytestring"""
+        self.assertEqual(FastJSONRenderer().render(None), b'')
+
+    def test_render_with_indent_uses_stdlib(self):
+        """Test indented output falls back to the stdlib renderer"""
+        media_type = 'application/json; indent=4'
+        expected = JSONRenderer().render(SAMPLE_DATA, media_type)
+
+        res = FastJSONRenderer().render(SAMPLE_DATA, media_type)
+
+        self.assertEqual(res, expected)
+
+    @patch('core.renderers.orjson', None)
+    def test_render_without_orjson(self):
+        """Test the renderer works when orjson is not installed"""
+        expected = JSONRenderer().render(SAMPLE_DATA)
+
+        res = FastJSONRenderer().render(SAMPLE_DATA)
+
+        self.assertEqual(res, expected)
+
+
+class FastJSONParserTests(SimpleTestCase):
+    """Test the fast JSON parser"""
+
+    def test_parse(self):
+        """Test parsing a JSON payload"""
+        stream = io.BytesIO('{"title": "Crème", "tags": [1, 2]}'.encode())
+
+        data = FastJSONParser().parse(stream)
+
+        self.assertEqual(data, {'title': 'Crème', 'tags': [1, 2]})
+
+    def test_parse_invalid_json(self):
+        """Test invalid JSON raises a parse error"""
+        with self.assertRaises(ParseError):
+            FastJSONParser().parse(io.BytesIO(b'{"title": '))
+
+    @patch('core.renderers.orjson', None)
+    def test_parse_without_orjson(self):
+        """Test the parser works when orjson is not installed"""
+        data = FastJSONParser().parse(io.BytesIO(b'{"id": 1}'))
+
+        self.assertEqual(data, {'id': 1})
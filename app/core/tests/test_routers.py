@@ -0,0 +1,106 @@
+"""
+Tests for read replica routing.
+"""
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import SimpleTestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from core.models import Recipe
+from core.routers import STICKY_COOKIE, ReplicaRouter, _read_from_replicas
+
+
+RECIPES_URL = reverse('recipe:recipe-list')
+
+
+@override_settings(DATABASE_REPLICAS=['replica0'])
+class ReplicaRouterTests(SimpleTestCase):
+    """Test routing queries to the replicas"""
+
+    def setUp(self):
+        self.router = ReplicaRouter()
+
+    def test_reads_outside_requests_use_primary(self):
+        """Test reads go to the primary unless serving a safe request"""
+        self.assertEqual(self.router.db_for_read(Recipe), 'default')
+
+    def test_reads_in_safe_requests_use_replica(self):
+        """Test reads go to a replica while serving a safe request"""
+        token = _read_from_replicas.set(True)
+        try:
+            self.assertEqual(self.router.db_for_read(Recipe), 'replica0')
+            self.assertEqual(self.router.db_for_write(Recipe), 'default')
+        finally:
+            _read_from_replicas.reset(token)
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_no_replicas(self):
+        """Test the router does not interfere without replicas"""
+        token = _read_from_replicas.set(True)
+        try:
+            self.assertIsNone(self.router.db_for_read(Recipe))
+        finally:
+            _read_from_replicas.reset(token)
+
+    def test_migrate_primary_only(self):
+        """Test migrations only run on the primary"""
+        self.assertTrue(self.router.allow_migrate('default', 'core'))
+        self.assertFalse(self.router.allow_migrate('replica0', 'core'))
+
+
+@override_settings(DATABASE_REPLICAS=['replica0'])
+@patch('core.routers.random.choice', return_value='default')
+class ReplicaReadMixinTests(TransactionTestCase):
+    """Test views reading from the replicas.
+
+    Not using TestCase, reads inside transactions always use the primary.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(
+            'user@example.com', 'testpass123'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_safe_requests_read_from_replica(self, patched_choice):
+        """Test listing recipes reads from a replica"""
+        self.client.get(RECIPES_URL)
+
+        patched_choice.assert_called_with(['replica0'])
+
+    def test_read_your_writes(self, patched_choice):
+        """Test clients read from the primary after writing"""
+        payload = {'title': 'Sample', 'time_minutes': 5, 'price': '5.00'}
+        res = self.client.post(RECIPES_URL, payload)
+
+        self.assertIn(STICKY_COOKIE, res.cookies)
+        patched_choice.assert_not_called()
+
+        self.client.get(RECIPES_URL)
+        patched_choice.assert_not_called()
+
+        self.client.cookies.clear()
+        self.client.get(RECIPES_URL)
+        patched_choice.assert_not_called()
+
+        cache.clear()
+        self.client.get(RECIPES_URL)
+        patched_choice.assert_called()
+
+    def test_failed_write_not_sticky(self, patched_choice):
+        """Test failed writes do not pin the client to the primary"""
+        Recipe.objects.create(
+            user=self.user, title='Sample', time_minutes=5,
+            price=Decimal('5.00'),
+        )
+
+        res = self.client.post(RECIPES_URL, {'title': ''})
+
+        self.assertNotIn(STICKY_COOKIE, res.cookies)
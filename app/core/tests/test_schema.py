@@ -0,0 +1,71 @@
+"""
+Tests for the cached API schema view.
+"""
+import json
+import tempfile
+from unittest.mock import patch
+
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.schema import clear_schema_cache
+
+
+SCHEMA_URL = reverse('schema')
+
+
+@override_settings(SPECTACULAR_SCHEMA_FILE='')
+class SchemaViewTests(SimpleTestCase):
+    """Test serving the cached OpenAPI schema"""
+
+    def setUp(self):
+        clear_schema_cache()
+        self.client = APIClient()
+
+    def tearDown(self):
+        clear_schema_cache()
+
+    def test_schema_generated_once(self):
+        """Test the schema is only generated on the first request"""
+        with patch(
+            'drf_spectacular.generators.SchemaGenerator.get_schema',
+            return_value={'openapi': '3.0.3'},
+        ) as patched_get_schema:
+            res1 = self.client.get(SCHEMA_URL)
+            res2 = self.client.get(SCHEMA_URL)
+
+        self.assertEqual(res1.status_code, status.HTTP_200_OK)
+        self.assertEqual(res1.content, res2.content)
+        self.assertEqual(res1['ETag'], res2['ETag'])
+        self.assertIn('max-age', res1['Cache-Control'])
+        patched_get_schema.assert_called_once()
+
+    def test_schema_not_modified(self):
+        """Test a matching If-None-Match returns 304"""
+        res = self.client.get(SCHEMA_URL)
+
+        res = self.client.get(SCHEMA_URL, HTTP_IF_NONE_MATCH=res['ETag'])
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_schema_json_format(self):
+        """Test the schema can be requested as JSON"""
+        res = self.client.get(SCHEMA_URL, {'format': 'json'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIn('paths', json.loads(res.content))
+
+    def test_schema_loaded_from_file(self):
+        """Test a pre-generated schema file is served when configured"""
+        with tempfile.NamedTemporaryFile('w', suffix='.json') as schema_file:
+            json.dump({'openapi': '3.0.3', 'paths': {}}, schema_file)
+            schema_file.flush()
+
+            with override_settings(SPECTACULAR_SCHEMA_FILE=schema_file.name):
+                res = self.client.get(SCHEMA_URL, {'format': 'json'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(json.loads(res.content)['paths'], {})
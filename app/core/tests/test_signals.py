@@ -0,0 +1,91 @@
+"""
+Tests for signal handlers.
+"""
+import shutil
+import tempfile
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.test import TestCase, override_settings
+
+from core.models import ImageBlob, Recipe
+
+
+class ReleaseImageTests(TestCase):
+    """Test deleting image files once nothing uses them"""
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings = override_settings(MEDIA_ROOT=media_root)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+        self.user = get_user_model().objects.create_user(
+            'user@example.com', 'testpass123'
+        )
+        self.storage = Recipe._meta.get_field('image').storage
+
+    def _recipe(self, content=b'image'):
+        recipe = Recipe.objects.create(
+            user=self.user, title='Sample', time_minutes=5,
+            price=Decimal('5.00'),
+        )
+        recipe.image.save('image.jpg', ContentFile(content))
+
+        return Recipe.objects.get(pk=recipe.pk)
+
+    def test_deleting_recipe_deletes_image(self):
+        """Test the image of a deleted recipe is deleted on commit"""
+        recipe = self._recipe()
+        name = recipe.image.name
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            recipe.delete()
+
+        self.assertTrue(self.storage.exists(name))
+        for callback in callbacks:
+            callback()
+        self.assertFalse(self.storage.exists(name))
+        self.assertFalse(ImageBlob.objects.exists())
+
+    def test_deleting_user_deletes_images(self):
+        """Test deleting a user deletes the images of their recipes"""
+        names = [self._recipe(content).image.name for content in (b'a', b'b')]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.delete()
+
+        for name in names:
+            self.assertFalse(self.storage.exists(name))
+
+    def test_rollback_keeps_image(self):
+        """Test images are kept when the deleting transaction rolls back"""
+        recipe = self._recipe()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    recipe.delete()
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+
+        self.assertTrue(self.storage.exists(recipe.image.name))
+        self.assertEqual(ImageBlob.objects.get().ref_count, 1)
+
+    def test_replacing_untracked_image_deletes_it(self):
+        """Test replaced images stored before deduplication are deleted"""
+        recipe = self._recipe()
+        name = self.storage.save(
+            'uploads/recipe/legacy.jpg', ContentFile(b'x')
+        )
+        Recipe.objects.filter(pk=recipe.pk).update(image=name)
+        recipe = Recipe.objects.get(pk=recipe.pk)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe.image.save('new.jpg', ContentFile(b'new'))
+
+        self.assertFalse(self.storage.exists(name))
@@ -0,0 +1,84 @@
+"""
+Tests for media storage helpers.
+"""
+import shutil
+import tempfile
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.test import SimpleTestCase, override_settings
+
+from core.storage import iter_files, presigned_upload
+
+
+@override_settings(S3_PUBLIC_ENDPOINT_URL='')
+class PresignedUploadTests(SimpleTestCase):
+    """Test presigning direct uploads"""
+
+    def test_filesystem_storage_not_supported(self):
+        """Test storages without a bucket do not support direct uploads"""
+        self.assertIsNone(presigned_upload(
+            FileSystemStorage(), 'uploads/recipe/a.png', 'image/png', 10, 60
+        ))
+
+    def test_presigned_post(self):
+        """Test the upload is limited to the content type and size"""
+        client = MagicMock()
+        storage = SimpleNamespace(
+            bucket_name='media',
+            connection=SimpleNamespace(meta=SimpleNamespace(client=client)),
+            _normalize_name=lambda name: f'media/{name}',
+        )
+
+        presigned_upload(storage, 'uploads/recipe/a.png', 'image/png', 10, 60)
+
+        kwargs = client.generate_presigned_post.call_args[1]
+        self.assertEqual(kwargs['Bucket'], 'media')
+        self.assertEqual(kwargs['Key'], 'media/uploads/recipe/a.png')
+        self.assertEqual(kwargs['ExpiresIn'], 60)
+        self.assertIn(['content-length-range', 1, 10], kwargs['Conditions'])
+        self.assertIn({'Content-Type': 'image/png'}, kwargs['Conditions'])
+
+
+class IterFilesTests(SimpleTestCase):
+    """Test listing stored files lazily"""
+
+    def test_filesystem(self):
+        """Test files of a directory are listed, not subdirectories"""
+        location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, location)
+        storage = FileSystemStorage(location=location)
+        storage.save('uploads/a.jpg', ContentFile(b'a'))
+        storage.save('uploads/nested/b.jpg', ContentFile(b'b'))
+
+        files = list(iter_files(storage, 'uploads'))
+
+        self.assertEqual([name for name, _ in files], ['uploads/a.jpg'])
+        self.assertEqual(
+            files[0][1], storage.get_modified_time('uploads/a.jpg')
+        )
+        self.assertEqual(list(iter_files(storage, 'missing')), [])
+
+    def test_bucket(self):
+        """Test objects are listed from the bucket under the location"""
+        modified = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        bucket = MagicMock()
+        bucket.objects.filter.return_value = iter([
+            SimpleNamespace(key='media/uploads/a.jpg', last_modified=modified),
+            SimpleNamespace(
+                key='media/uploads/x/b.jpg', last_modified=modified
+            ),
+        ])
+        storage = SimpleNamespace(
+            bucket_name='bucket',
+            bucket=bucket,
+            _normalize_name=lambda name: f'media/{name}',
+        )
+
+        files = list(iter_files(storage, 'uploads'))
+
+        self.assertEqual(files, [('uploads/a.jpg', modified)])
+        bucket.objects.filter.assert_called_once_with(Prefix='media/uploads/')
@@ -0,0 +1,147 @@
+"""
+Tests for the request throttles.
+"""
+from io import StringIO
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from django.core.cache import caches
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.throttling import (
+    AnonSlidingRateThrottle,
+    ScopedSlidingRateThrottle,
+    SlidingWindowThrottle,
+    UserSlidingRateThrottle,
+)
+
+
+RATES = {
+    'anon': '3/minute',
+    'user': '3/minute',
+    'login': '2/minute',
+    'bulk': None,
+}
+
+
+def make_request(user_pk=None, addr='192.0.2.1'):
+    """Return a request from a user, anonymous without user_pk"""
+    return SimpleNamespace(
+        user=SimpleNamespace(is_authenticated=user_pk is not None,
+                             pk=user_pk),
+        META={'REMOTE_ADDR': addr},
+    )
+
+
+@patch.object(SlidingWindowThrottle, 'THROTTLE_RATES', RATES)
+class SlidingWindowThrottleTests(SimpleTestCase):
+    """Test the sliding window throttles"""
+
+    def setUp(self):
+        caches['throttle'].clear()
+
+    def _allowed(self, throttle_class, request, now, view=None):
+        throttle = throttle_class()
+        throttle.timer = lambda: now
+        return throttle.allow_request(request, view), throttle
+
+    def test_limit_per_user(self):
+        """Test users are limited separately"""
+        request = make_request(user_pk=1)
+        for _ in range(3):
+            allowed, _ = self._allowed(UserSlidingRateThrottle, request, 0)
+            self.assertTrue(allowed)
+
+        allowed, throttle = self._allowed(UserSlidingRateThrottle, request, 1)
+        self.assertFalse(allowed)
+        self.assertEqual(throttle.wait(), 59)
+
+        allowed, _ = self._allowed(
+            UserSlidingRateThrottle, make_request(user_pk=2), 1
+        )
+        self.assertTrue(allowed)
+
+    def test_previous_window_weighted(self):
+        """Test requests of the previous window count while they overlap"""
+        request = make_request()
+        for now in (50, 50, 50, 61):
+            allowed, _ = self._allowed(AnonSlidingRateThrottle, request, now)
+            self.assertTrue(allowed)
+
+        allowed, throttle = self._allowed(AnonSlidingRateThrottle, request, 62)
+        self.assertFalse(allowed)
+        self.assertEqual(throttle.wait(), 19)
+
+        allowed, _ = self._allowed(AnonSlidingRateThrottle, request, 81)
+        self.assertTrue(allowed)
+
+    def test_anon_and_user_throttles_split(self):
+        """Test each throttle only applies to its kind of client"""
+        user, anon = make_request(user_pk=1), make_request()
+
+        self.assertIsNone(AnonSlidingRateThrottle().get_cache_key(user, None))
+        self.assertIsNone(UserSlidingRateThrottle().get_cache_key(anon, None))
+
+    def test_scopes(self):
+        """Test scopes are taken from the view or its action"""
+        request = make_request()
+        view = SimpleNamespace(
+            action='merge', throttle_scopes={'merge': 'login'}
+        )
+        for _ in range(2):
+            self._allowed(ScopedSlidingRateThrottle, request, 0, view)
+
+        allowed, throttle = self._allowed(
+            ScopedSlidingRateThrottle, request, 0, view
+        )
+        self.assertFalse(allowed)
+        self.assertEqual(throttle.scope, 'login')
+
+        for view in (
+            SimpleNamespace(action='list', throttle_scopes={}),
+            SimpleNamespace(throttle_scope='bulk'),
+        ):
+            allowed, _ = self._allowed(
+                ScopedSlidingRateThrottle, request, 0, view
+            )
+            self.assertTrue(allowed)
+
+
+@patch.object(SlidingWindowThrottle, 'THROTTLE_RATES', RATES)
+class ThrottledApiTests(TestCase):
+    """Test throttling API requests"""
+
+    def setUp(self):
+        caches['throttle'].clear()
+        self.addCleanup(caches['throttle'].clear)
+
+    def test_token_requests_throttled(self):
+        """Test logins are limited per IP address"""
+        client = APIClient()
+        payload = {'email': 'user@example.com', 'password': 'wrong'}
+        for _ in range(2):
+            res = client.post(reverse('user:token'), payload)
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+        res = client.post(reverse('user:token'), payload)
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertIn('Retry-After', res)
+
+
+class BenchmarkThrottleTests(SimpleTestCase):
+    """Test the throttle benchmark"""
+
+    def test_benchmark(self):
+        """Test each throttle is timed"""
+        out = StringIO()
+
+        call_command('benchmark_throttle', '--requests', '5', stdout=out)
+
+        for label in ('drf user', 'sliding user', 'drf anon', 'sliding anon'):
+            self.assertIn(label, out.getvalue())
@@ -0,0 +1,41 @@
+"""
+Tests for the upload handlers.
+"""
+import hashlib
+
+from django.core.files.uploadhandler import StopFutureHandlers
+from django.test import RequestFactory, SimpleTestCase
+
+from core.uploadhandlers import (
+    HashingMemoryFileUploadHandler,
+    HashingTemporaryFileUploadHandler,
+)
+
+
+class HashingUploadHandlerTests(SimpleTestCase):
+    """Test hashing uploads while they are received"""
+
+    def _upload(self, handler_class, chunks):
+        handler = handler_class(RequestFactory().post('/'))
+        handler.handle_raw_input(None, {}, 100, 'boundary')
+        try:
+            handler.new_file('image', 'image.jpg', 'image/jpeg', 100)
+        except StopFutureHandlers:
+            pass
+        for chunk in chunks:
+            handler.receive_data_chunk(chunk, 0)
+
+        return handler.file_complete(sum(len(chunk) for chunk in chunks))
+
+    def test_digest_set_on_uploaded_files(self):
+        """Test uploads carry the SHA-256 of their content"""
+        digest = hashlib.sha256(b'some image').hexdigest()
+
+        for handler_class in (
+            HashingMemoryFileUploadHandler, HashingTemporaryFileUploadHandler
+        ):
+            with self.subTest(handler_class.__name__):
+                file = self._upload(handler_class, [b'some ', b'image'])
+
+                self.assertEqual(file.sha256, digest)
+                file.close()
@@ -0,0 +1,85 @@
+"""
+Tests for the shared views.
+"""
+import asyncio
+import threading
+from unittest.mock import patch
+
+from asgiref.sync import async_to_sync
+
+from django.test import SimpleTestCase, override_settings
+
+from rest_framework.permissions import AllowAny
+from rest_framework.response import Response
+from rest_framework.test import APIRequestFactory
+from rest_framework.views import APIView
+
+from core.views import AsyncReadViewMixin, lazy_view
+
+
+class ThreadNameView(AsyncReadViewMixin, APIView):
+    """Return the name of the thread the request ran in"""
+    authentication_classes = ()
+    permission_classes = (AllowAny,)
+
+    def get(self, request):
+        return Response({'thread': threading.current_thread().name})
+
+    def post(self, request):
+        return Response({'thread': threading.current_thread().name})
+
+
+class AsyncReadViewMixinTests(SimpleTestCase):
+    """Test the async read view mixin"""
+
+    def setUp(self):
+        self.factory = APIRequestFactory()
+
+    def test_sync_view_under_wsgi(self):
+        """Test views stay sync when not served with ASGI"""
+        view = ThreadNameView.as_view()
+
+        self.assertFalse(asyncio.iscoroutinefunction(view))
+
+    @override_settings(SERVER_MODE='asgi')
+    def test_async_view_under_asgi(self):
+        """Test views are coroutines keeping the view attributes"""
+        view = ThreadNameView.as_view()
+
+        self.assertTrue(asyncio.iscoroutinefunction(view))
+        self.assertTrue(view.csrf_exempt)
+        self.assertIs(view.cls, ThreadNameView)
+
+    @override_settings(SERVER_MODE='asgi')
+    def test_reads_run_in_pool(self):
+        """Test safe requests run in the read pool, others do not"""
+        view = async_to_sync(ThreadNameView.as_view())
+
+        read = view(self.factory.get('/')).render()
+        write = view(self.factory.post('/')).render()
+
+        self.assertTrue(read.data['thread'].startswith('async-read'))
+        self.assertFalse(write.data['thread'].startswith('async-read'))
+
+
+class LazyViewTests(SimpleTestCase):
+    """Test views imported on first use"""
+
+    def test_view_imported_on_first_request(self):
+        """Test the view class is only imported once it is requested"""
+        request = APIRequestFactory().get('/')
+        with patch(
+            'core.views.import_string', return_value=ThreadNameView
+        ) as patched_import:
+            view = lazy_view('core.tests.test_views.ThreadNameView')
+            patched_import.assert_not_called()
+
+            res1 = view(request)
+            res2 = view(request)
+
+        patched_import.assert_called_once_with(
+            'core.tests.test_views.ThreadNameView'
+        )
+        self.assertEqual(res1.status_code, 200)
+        self.assertEqual(res2.status_code, 200)
+        self.assertTrue(view.csrf_exempt)
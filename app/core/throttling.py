@@ -0,0 +1,129 @@
+"""
+Request throttles
+"""
+from django.core.cache import caches
+
+from rest_framework.throttling import SimpleRateThrottle
+
+
+class SlidingWindowThrottle(SimpleRateThrottle):
+    """Throttle with a sliding window approximated by two counters.
+
+    DRF's throttles keep a list of request times per client, read and
+    rewritten on every request. This keeps a counter per window instead,
+    and weighs the previous window by how much of it still overlaps the
+    sliding window. It costs one read and one increment per request.
+    """
+    cache_alias = 'throttle'
+
+    def __init__(self):
+        super().__init__()
+        self.cache = caches[self.cache_alias]
+
+    def _window_keys(self, window):
+        return f'{self.key}:{window}', f'{self.key}:{window - 1}'
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+
+        now = self.timer()
+        window, offset = divmod(now, self.duration)
+        current_key, previous_key = self._window_keys(int(window))
+        counts = self.cache.get_many([current_key, previous_key])
+        self.current = counts.get(current_key, 0)
+        self.previous = counts.get(previous_key, 0)
+        self.remaining = self.duration - offset
+
+        overlap = self.remaining / self.duration
+        if self.previous * overlap + self.current >= self.num_requests:
+            return self.throttle_failure()
+
+        try:
+            self.cache.incr(current_key)
+        except ValueError:
+            # Kept for two windows, it is the previous window next.
+            if not self.cache.add(current_key, 1, 2 * self.duration):
+                self.cache.incr(current_key)
+
+        return self.throttle_success()
+
+    def throttle_success(self):
+        return True
+
+    def wait(self):
+        """Return the seconds until the weighted count is below the limit"""
+        if self.current >= self.num_requests or not self.previous:
+            return self.remaining
+
+        # Solve previous * (remaining - t) / duration + current < limit.
+        spare = (self.num_requests - self.current) / self.previous
+        return max(self.remaining - spare * self.duration, 0) + 1
+
+
+class AnonSlidingRateThrottle(SlidingWindowThrottle):
+    """Limit anonymous requests per IP address"""
+    scope = 'anon'
+
+    def get_cache_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            return None
+
+        return self.cache_format % {
+            'scope': self.scope,
+            'ident': self.get_ident(request),
+        }
+
+
+class UserSlidingRateThrottle(SlidingWindowThrottle):
+    """Limit authenticated requests per user"""
+    scope = 'user'
+
+    def get_cache_key(self, request, view):
+        if not (request.user and request.user.is_authenticated):
+            return None
+
+        return self.cache_format % {
+            'scope': self.scope,
+            'ident': request.user.pk,
+        }
+
+
+class ScopedSlidingRateThrottle(SlidingWindowThrottle):
+    """Separate limits for expensive views and actions.
+
+    Views set `throttle_scope`, viewsets can set `throttle_scopes` mapping
+    actions to scopes. Requests are limited per user, or per IP address
+    when anonymous.
+    """
+
+    def __init__(self):
+        # The rate depends on the view, see allow_request.
+        self.cache = caches[self.cache_alias]
+
+    def allow_request(self, request, view):
+        self.scope = (
+            getattr(view, 'throttle_scopes', {}).get(
+                getattr(view, 'action', None)
+            )
+            or getattr(view, 'throttle_scope', None)
+        )
+        if not self.scope:
+            return True
+
+        self.rate = self.get_rate()
+        self.num_requests, self.duration = self.parse_rate(self.rate)
+
+        return super().allow_request(request, view)
+
+    def get_cache_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            ident = request.user.pk
+        else:
+            ident = self.get_ident(request)
+
+        return self.cache_format % {'scope': self.scope, 'ident': ident}
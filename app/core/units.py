@@ -0,0 +1,73 @@
+"""
+Units of ingredient quantities
+"""
+from collections import defaultdict, namedtuple
+from decimal import Decimal
+
+from django.db.models import Case, CharField, DecimalField, Value, When
+from django.utils.translation import gettext_lazy as _
+
+
+Unit = namedtuple('Unit', ['label', 'dimension', 'factor'])
+
+MASS = 'mass'
+VOLUME = 'volume'
+COUNT = 'count'
+
+# Units by code, with their factor to the base unit of their dimension.
+UNITS = {
+    'g': Unit(_('grams'), MASS, 1.0),
+    'kg': Unit(_('kilograms'), MASS, 1000.0),
+    'oz': Unit(_('ounces'), MASS, 28.349523125),
+    'lb': Unit(_('pounds'), MASS, 453.59237),
+    'ml': Unit(_('millilitres'), VOLUME, 1.0),
+    'l': Unit(_('litres'), VOLUME, 1000.0),
+    'tsp': Unit(_('teaspoons'), VOLUME, 4.92892159375),
+    'tbsp': Unit(_('tablespoons'), VOLUME, 14.78676478125),
+    'cup': Unit(_('cups'), VOLUME, 236.5882365),
+    'fl_oz': Unit(_('fluid ounces'), VOLUME, 29.5735295625),
+    'pc': Unit(_('pieces'), COUNT, 1.0),
+}
+
+BASE_UNITS = {MASS: 'g', VOLUME: 'ml', COUNT: 'pc'}
+
+UNIT_CHOICES = [(code, unit.label) for code, unit in UNITS.items()]
+
+
+def convert(quantity, unit, to_unit):
+    """Convert a quantity between units of the same dimension"""
+    source, target = UNITS[unit], UNITS[to_unit]
+    if source.dimension != target.dimension:
+        raise ValueError(f'Cannot convert {unit} to {to_unit}.')
+
+    return quantity * source.factor / target.factor
+
+
+def to_base(quantity, unit):
+    """Return a quantity in the base unit of its dimension, and that unit"""
+    base = BASE_UNITS[UNITS[unit].dimension]
+
+    return convert(quantity, unit, base), base
+
+
+def base_unit_expression(field='unit'):
+    """Return an expression of the base unit of the unit in a field"""
+    dimensions = defaultdict(list)
+    for code, unit in UNITS.items():
+        dimensions[unit.dimension].append(code)
+
+    return Case(
+        *(When(**{f'{field}__in': codes}, then=Value(BASE_UNITS[dimension]))
+          for dimension, codes in dimensions.items()),
+        default=Value(''),
+        output_field=CharField(),
+    )
+
+
+def factor_expression(field='unit'):
+    """Return an expression of the factor to the base unit of a field"""
+    return Case(
+        *(When(**{field: code}, then=Value(Decimal(str(unit.factor))))
+          for code, unit in UNITS.items()),
+        output_field=DecimalField(),
+    )
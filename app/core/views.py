@@ -0,0 +1,98 @@
+"""
+Views shared across the API
+"""
+import asyncio
+import contextvars
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils.module_loading import import_string
+from django.views.decorators.csrf import csrf_exempt
+
+from rest_framework.permissions import SAFE_METHODS
+
+
+_read_pool = None
+_read_pool_lock = threading.Lock()
+
+
+def _get_read_pool():
+    """Return the thread pool async read requests run in"""
+    global _read_pool
+    with _read_pool_lock:
+        if _read_pool is None:
+            _read_pool = ThreadPoolExecutor(
+                max_workers=settings.ASYNC_READ_WORKERS,
+                thread_name_prefix='async-read',
+            )
+
+    return _read_pool
+
+
+def _call_with_connections(view, request, *args, **kwargs):
+    """Call a sync view, closing stale connections of the current thread"""
+    close_old_connections()
+    try:
+        return view(request, *args, **kwargs)
+    finally:
+        close_old_connections()
+
+
+class AsyncReadViewMixin:
+    """Serve views as coroutines when the app runs under ASGI.
+
+    Safe requests run concurrently in a bounded thread pool, which also
+    bounds the number of database connections they hold. Other requests
+    run in the thread shared by all thread sensitive code, as Django does
+    for sync views.
+    """
+
+    @classmethod
+    def as_view(cls, *args, **kwargs):
+        view = super().as_view(*args, **kwargs)
+        if settings.SERVER_MODE != 'asgi':
+            return view
+
+        write_view = sync_to_async(view, thread_sensitive=True)
+
+        async def async_view(request, *args, **kwargs):
+            if request.method not in SAFE_METHODS:
+                return await write_view(request, *args, **kwargs)
+
+            context = contextvars.copy_context()
+            call = functools.partial(
+                _call_with_connections, view, request, *args, **kwargs
+            )
+            return await asyncio.get_running_loop().run_in_executor(
+                _get_read_pool(), context.run, call
+            )
+
+        # Keeps csrf_exempt and the attributes routers and schema
+        # generators read, e.g. cls, initkwargs and actions.
+        functools.update_wrapper(async_view, view)
+
+        return async_view
+
+
+def lazy_view(view_path, **initkwargs):
+    """Return a view importing its class on the first request.
+
+    Keeps rarely used views with expensive imports, such as the schema
+    views, out of the URLconf import.
+    """
+    view = None
+
+    @csrf_exempt
+    def lazy(request, *args, **kwargs):
+        nonlocal view
+        if view is None:
+            view = import_string(view_path).as_view(**initkwargs)
+
+        return view(request, *args, **kwargs)
+
+    return lazy
@@ -1,10 +1,25 @@
 """"
 Serializers for recipe APIs
 """
+from decimal import Decimal
+
+from django.conf import settings
+from django.core import signing
 
 from rest_framework import serializers
 
-from core.models import Recipe, Tag, Ingredient
+from core.fields import content_digest
+from core.models import (
+    ImageBlob,
+    Recipe,
+    RecipeIngredient,
+    Tag,
+    Ingredient,
+)
+
+
+IMAGE_UPLOAD_SALT = 'recipe.serializers.image-upload'
+BULK_MAX_ITEMS = 1000
 
 
 class TagSerializer(serializers.ModelSerializer):
@@ -25,7 +40,106 @@ class IngredientSerializer(serializers.ModelSerializer):
         read_only_fields = ('id',)
 
 
-class RecipeSerializer(serializers.ModelSerializer):
+class RecipeIngredientSerializer(serializers.ModelSerializer):
+    """Serializer for the quantity of an ingredient in a recipe."""
+
+    class Meta:
+        model = RecipeIngredient
+        fields = ('ingredient', 'quantity', 'unit')
+
+    def validate(self, attrs):
+        """Require a unit for quantities"""
+        if (attrs.get('quantity') is None) != (not attrs.get('unit')):
+            raise serializers.ValidationError(
+                'Give both a quantity and a unit, or neither.'
+            )
+
+        return attrs
+
+
+class BulkDeleteSerializer(serializers.Serializer):
+    """Serializer for deleting tags or ingredients in bulk."""
+    ids = serializers.ListField(
+        child=serializers.IntegerField(),
+        allow_empty=False,
+        max_length=BULK_MAX_ITEMS,
+    )
+
+
+class RenameSerializer(serializers.Serializer):
+    """Serializer for the new name of a tag or ingredient."""
+    id = serializers.IntegerField()
+    name = serializers.CharField(max_length=255)
+
+
+class BulkRenameSerializer(serializers.Serializer):
+    """Serializer for renaming tags or ingredients in bulk."""
+    items = serializers.ListField(
+        child=RenameSerializer(),
+        allow_empty=False,
+        max_length=BULK_MAX_ITEMS,
+    )
+
+    def validate_items(self, value):
+        """Reject renaming the same object twice"""
+        ids = [item['id'] for item in value]
+        if len(set(ids)) != len(ids):
+            raise serializers.ValidationError('Duplicate ids.')
+
+        return value
+
+
+class MergeSerializer(serializers.Serializer):
+    """Serializer for merging tags or ingredients into one."""
+    target = serializers.IntegerField()
+    sources = serializers.ListField(
+        child=serializers.IntegerField(),
+        allow_empty=False,
+        max_length=BULK_MAX_ITEMS,
+    )
+
+    def validate(self, attrs):
+        """Reject merging an object into itself"""
+        if attrs['target'] in attrs['sources']:
+            raise serializers.ValidationError(
+                {'sources': ['Cannot contain the target.']}
+            )
+
+        return attrs
+
+
+class BulkResultSerializer(serializers.Serializer):
+    """Serializer for the number of objects changed in bulk."""
+    count = serializers.IntegerField()
+
+
+class DynamicFieldsMixin:
+    """Limit serializer fields and nested expansion on output.
+
+    Takes optional `fields` and `expand` keyword arguments. Fields not in
+    `fields` are dropped, and the fields in `Meta.expandable_fields` not
+    in `expand` are rendered as a list of primary keys instead of nested
+    objects.
+    """
+
+    def __init__(self, *args, **kwargs):
+        fields = kwargs.pop('fields', None)
+        expand = kwargs.pop('expand', None)
+        super().__init__(*args, **kwargs)
+
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+        if expand is not None:
+            for name in self.Meta.expandable_fields:
+                if name in self.fields and name not in expand:
+                    self.fields[name] = serializers.PrimaryKeyRelatedField(
+                        many=True, read_only=True
+                    )
+
+
+class RecipeSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """Serializer for recipes."""
     tags = TagSerializer(many=True, required=False)
     ingredients = IngredientSerializer(many=True, required=False)
@@ -42,6 +156,7 @@ class RecipeSerializer(serializers.ModelSerializer):
             'ingredients'
         )
         read_only_fields = ('id',)
+        expandable_fields = ('tags', 'ingredients')
 
     def _get_or_create_tag(self, tags, recipe):
         """Handle getting or creating tags as needed."""
@@ -53,19 +168,36 @@ class RecipeSerializer(serializers.ModelSerializer):
     def _get_or_create_ingredient(self, ingredients, recipe):
         """Handle getting or creating ingredients as needed."""
         auth_user = self.context['request'].user
+        ingredient_objs = []
         for ingredient in ingredients:
             ingredient_obj, created = (
                 Ingredient.objects.get_or_create(user=auth_user, **ingredient))
-            recipe.ingredients.add(ingredient_obj)
+            ingredient_objs.append(ingredient_obj)
+        # Ingredients the recipe already has keep their quantities.
+        recipe.ingredients.set(ingredient_objs)
+
+    def _set_quantities(self, quantities, recipe):
+        """Set ingredient quantities, adding missing ingredients."""
+        for quantity in quantities:
+            RecipeIngredient.objects.update_or_create(
+                recipe=recipe,
+                ingredient=quantity['ingredient'],
+                defaults={
+                    'quantity': quantity.get('quantity'),
+                    'unit': quantity.get('unit', ''),
+                },
+            )
 
     def create(self, validated_data):
         """Create a new recipe."""
         tags = validated_data.pop('tags', [])
         ingredients = validated_data.pop('ingredients', [])
+        quantities = validated_data.pop('quantities', [])
 
         recipe = Recipe.objects.create(**validated_data)
         self._get_or_create_tag(tags, recipe)
         self._get_or_create_ingredient(ingredients, recipe)
+        self._set_quantities(quantities, recipe)
 
         return recipe
 
@@ -80,9 +212,13 @@ class RecipeSerializer(serializers.ModelSerializer):
         ingredients = validated_data.pop('ingredients', None)
 
         if ingredients is not None:
-            instance.ingredients.clear()
             self._get_or_create_ingredient(ingredients, instance)
 
+        quantities = validated_data.pop('quantities', None)
+
+        if quantities is not None:
+            self._set_quantities(quantities, instance)
+
         for attr, value in validated_data.items():
             setattr(instance, attr, value)
 
@@ -93,16 +229,150 @@ class RecipeSerializer(serializers.ModelSerializer):
 
 class RecipeDetailSerializer(RecipeSerializer):
     """Serializer for recipe details."""
+    quantities = RecipeIngredientSerializer(many=True, required=False)
 
     class Meta(RecipeSerializer.Meta):
-        fields = RecipeSerializer.Meta.fields + ('description', 'image',)
+        fields = RecipeSerializer.Meta.fields + (
+            'description', 'image', 'quantities',
+        )
+
+    def validate_quantities(self, value):
+        """Only allow each of the user's ingredients once."""
+        ingredients = [quantity['ingredient'] for quantity in value]
+        if len(set(ingredients)) != len(ingredients):
+            raise serializers.ValidationError('Duplicate ingredients.')
+
+        auth_user = self.context['request'].user
+        if any(ingredient.user_id != auth_user.pk
+               for ingredient in ingredients):
+            raise serializers.ValidationError('Unknown ingredient.')
+
+        return value
+
+
+class ContentAddressedImageField(serializers.ImageField):
+    """Image field not decoding images already stored."""
+
+    def to_internal_value(self, data):
+        if (hasattr(data, 'chunks') and ImageBlob.objects.filter(
+                digest=content_digest(data)).exists()):
+            return serializers.FileField.to_internal_value(self, data)
+
+        return super().to_internal_value(data)
+
+
+class SyncDeletedSerializer(serializers.Serializer):
+    """Serializer for the ids of objects deleted since a sync."""
+    recipes = serializers.ListField(child=serializers.IntegerField())
+    tags = serializers.ListField(child=serializers.IntegerField())
+    ingredients = serializers.ListField(child=serializers.IntegerField())
+
+
+class SyncSerializer(serializers.Serializer):
+    """Serializer for the changes since a sync."""
+    cursor = serializers.CharField()
+    has_more = serializers.BooleanField()
+    recipes = RecipeDetailSerializer(many=True, expand=[])
+    tags = TagSerializer(many=True)
+    ingredients = IngredientSerializer(many=True)
+    deleted = SyncDeletedSerializer()
+
+
+class ComputeItemSerializer(serializers.Serializer):
+    """Serializer for a recipe and the factor to scale it by."""
+    recipe = serializers.IntegerField()
+    scale = serializers.DecimalField(
+        max_digits=8, decimal_places=3, min_value=Decimal('0.001'),
+        default=Decimal(1),
+    )
+
+
+class ComputeSerializer(serializers.Serializer):
+    """Serializer for scaling and totalling recipes."""
+    items = serializers.ListField(
+        child=ComputeItemSerializer(),
+        allow_empty=False,
+        max_length=BULK_MAX_ITEMS,
+    )
+
+    def validate_items(self, value):
+        """Reject giving the same recipe twice"""
+        ids = [item['recipe'] for item in value]
+        if len(set(ids)) != len(ids):
+            raise serializers.ValidationError('Duplicate recipes.')
+
+        return value
+
+
+class ComputedRecipeSerializer(serializers.Serializer):
+    """Serializer for the price of a scaled recipe."""
+    id = serializers.IntegerField()
+    scale = serializers.DecimalField(max_digits=8, decimal_places=3)
+    price = serializers.DecimalField(max_digits=12, decimal_places=2)
+
+
+class ComputedIngredientSerializer(serializers.Serializer):
+    """Serializer for the total quantity of an ingredient."""
+    id = serializers.IntegerField()
+    name = serializers.CharField()
+    quantity = serializers.DecimalField(max_digits=15, decimal_places=3)
+    unit = serializers.CharField()
+
+
+class ComputeResultSerializer(serializers.Serializer):
+    """Serializer for the totals of scaled recipes."""
+    price = serializers.DecimalField(max_digits=15, decimal_places=2)
+    time_minutes = serializers.IntegerField()
+    recipes = ComputedRecipeSerializer(many=True)
+    ingredients = ComputedIngredientSerializer(many=True)
+
+
+class ShoppingListItemSerializer(serializers.Serializer):
+    """Serializer for an ingredient needed for several recipes."""
+    id = serializers.IntegerField()
+    name = serializers.CharField()
+    quantity = serializers.DecimalField(
+        max_digits=15, decimal_places=3, allow_null=True
+    )
+    unit = serializers.CharField(allow_blank=True)
+    recipes = serializers.IntegerField()
 
 
 class RecipeImageSerializer(serializers.ModelSerializer):
     """Serializer for uploading recipe images."""
+    image = ContentAddressedImageField()
 
     class Meta:
         model = Recipe
         fields = ('id', 'image')
         read_only_fields = ('id',)
-        extra_kwargs = {'image': {'required': True}}
+
+
+class RecipeImageUploadRequestSerializer(serializers.Serializer):
+    """Serializer for requesting a direct image upload."""
+    content_type = serializers.ChoiceField(
+        choices=list(settings.IMAGE_UPLOAD_CONTENT_TYPES)
+    )
+
+
+class RecipeImageUploadSerializer(serializers.Serializer):
+    """Serializer for a presigned direct image upload."""
+    url = serializers.URLField()
+    fields = serializers.DictField(child=serializers.CharField())
+    upload_token = serializers.CharField()
+
+
+class RecipeImageUploadCompleteSerializer(serializers.Serializer):
+    """Serializer for attaching a directly uploaded image."""
+    upload_token = serializers.CharField()
+
+    def validate_upload_token(self, value):
+        """Return the recipe and file name the upload was issued for"""
+        try:
+            return signing.loads(
+                value,
+                salt=IMAGE_UPLOAD_SALT,
+                max_age=settings.IMAGE_UPLOAD_EXPIRES * 2,
+            )
+        except signing.BadSignature:
+            raise serializers.ValidationError('Invalid or expired token.')
@@ -10,11 +10,12 @@ from django.test import TestCase
 from rest_framework import status
 from rest_framework.test import APIClient
 
-from core.models import Ingredient, Recipe
+from core.models import Ingredient, Recipe, RecipeIngredient
 
 from recipe.serializers import IngredientSerializer
 
 INGREDIENT_URL = reverse('recipe:ingredient-list')
+MERGE_URL = reverse('recipe:ingredient-merge')
 
 
 def detail_url(ingredient_id):
@@ -139,3 +140,120 @@ class PrivateIngredientApiTests(TestCase):
         res = self.client.get(INGREDIENT_URL, {'assigned_only': 1})
 
         self.assertEqual(len(res.data), 1)
+
+    def test_merge_ingredients(self):
+        """Test merging duplicate ingredients into one"""
+        target = Ingredient.objects.create(user=self.user, name='Salt')
+        source = Ingredient.objects.create(user=self.user, name='salt')
+        recipe1 = Recipe.objects.create(
+            user=self.user, title='Soup', time_minutes=5,
+            price=Decimal('5.00'),
+        )
+        recipe1.ingredients.add(target, source)
+        recipe2 = Recipe.objects.create(
+            user=self.user, title='Bread', time_minutes=5,
+            price=Decimal('5.00'),
+        )
+        recipe2.ingredients.add(source)
+
+        res = self.client.post(
+            MERGE_URL,
+            {'target': target.id, 'sources': [source.id]},
+            format='json',
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertFalse(Ingredient.objects.filter(id=source.id).exists())
+        self.assertEqual(list(recipe1.ingredients.all()), [target])
+        self.assertEqual(list(recipe2.ingredients.all()), [target])
+
+    def _merge_quantities(self, quantities):
+        """Merge quantified ingredients of a recipe into the first one"""
+        recipe = Recipe.objects.create(
+            user=self.user, title='Soup', time_minutes=5,
+            price=Decimal('5.00'),
+        )
+        ingredients = []
+        for index, (quantity, unit) in enumerate(quantities):
+            ingredient = Ingredient.objects.create(
+                user=self.user, name=f'Flour {index}'
+            )
+            RecipeIngredient.objects.create(
+                recipe=recipe, ingredient=ingredient,
+                quantity=quantity, unit=unit,
+            )
+            ingredients.append(ingredient)
+
+        res = self.client.post(
+            MERGE_URL,
+            {
+                'target': ingredients[0].id,
+                'sources': [ingredient.id for ingredient in ingredients[1:]],
+            },
+            format='json',
+        )
+
+        return res, recipe, ingredients
+
+    def test_merge_sums_source_quantities(self):
+        """Test quantities of two sources in a recipe are added"""
+        recipe = Recipe.objects.create(
+            user=self.user, title='Bread', time_minutes=5,
+            price=Decimal('5.00'),
+        )
+        target = Ingredient.objects.create(user=self.user, name='Flour')
+        for name, quantity in [('flour', '100'), ('FLOUR', '250')]:
+            RecipeIngredient.objects.create(
+                recipe=recipe,
+                ingredient=Ingredient.objects.create(
+                    user=self.user, name=name
+                ),
+                quantity=Decimal(quantity), unit='g',
+            )
+
+        res = self.client.post(
+            MERGE_URL,
+            {
+                'target': target.id,
+                'sources': list(Ingredient.objects.exclude(
+                    id=target.id
+                ).values_list('id', flat=True)),
+            },
+            format='json',
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        row = RecipeIngredient.objects.get(recipe=recipe)
+        self.assertEqual(row.ingredient, target)
+        self.assertEqual(row.quantity, Decimal('350'))
+        self.assertEqual(row.unit, 'g')
+
+    def test_merge_sums_into_target_quantity(self):
+        """Test quantities in units of a dimension add up in its base unit"""
+        res, recipe, ingredients = self._merge_quantities(
+            [(Decimal('100'), 'g'), (Decimal('0.5'), 'kg'), (None, '')]
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        row = RecipeIngredient.objects.get(recipe=recipe)
+        self.assertEqual(row.ingredient, ingredients[0])
+        self.assertEqual(row.quantity, Decimal('600'))
+        self.assertEqual(row.unit, 'g')
+
+    def test_merge_conflicting_quantities_rejected(self):
+        """Test quantities that cannot be added up leave everything as is"""
+        res, recipe, ingredients = self._merge_quantities(
+            [(Decimal('100'), 'g'), (Decimal('1'), 'cup')]
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(res.data['recipes'], [recipe.id])
+        self.assertEqual(
+            set(RecipeIngredient.objects.filter(
+                recipe=recipe
+            ).values_list('ingredient_id', 'quantity', 'unit')),
+            {
+                (ingredients[0].id, Decimal('100'), 'g'),
+                (ingredients[1].id, Decimal('1'), 'cup'),
+            },
+        )
@@ -2,26 +2,34 @@
 Tests for recipe APIs.
 """
 from decimal import Decimal
+from unittest.mock import patch
+import io
 import tempfile
 import os
 
 from PIL import Image
 
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.test import TestCase, override_settings
 from django.urls import reverse
 
 from rest_framework import status
 from rest_framework.test import APIClient
 
 from core.models import (
+    ImageBlob,
     Recipe,
+    RecipeIngredient,
     Tag, Ingredient
 )
 
 from recipe.serializers import RecipeSerializer, RecipeDetailSerializer
 
 RECIPES_URL = reverse('recipe:recipe-list')
+COMPUTE_URL = reverse('recipe:recipe-compute')
+SHOPPING_LIST_URL = reverse('recipe:recipe-shopping-list')
 
 
 def detail_url(recipe_id):
@@ -34,6 +42,16 @@ def image_upload_url(recipe_id):
     return reverse('recipe:recipe-upload-image', args=[recipe_id])
 
 
+def upload_url_url(recipe_id):
+    """Create and return the direct image upload URL."""
+    return reverse('recipe:recipe-image-upload-url', args=[recipe_id])
+
+
+def upload_complete_url(recipe_id):
+    """Create and return the direct image upload completion URL."""
+    return reverse('recipe:recipe-image-upload-complete', args=[recipe_id])
+
+
 def create_recipe(user, **params):
     """Create and return a new recipe."""
     defaults = {
@@ -406,6 +424,252 @@ class PrivateRecipeApiTests(TestCase):
         self.assertIn(s2.data, res.data)
         self.assertNotIn(s3.data, res.data)
 
+    def test_list_recipes_limited_fields(self):
+        """Test the fields param limits the returned recipe fields."""
+        recipe = create_recipe(user=self.user)
+        recipe.tags.add(Tag.objects.create(user=self.user, name='Vegan'))
+
+        res = self.client.get(RECIPES_URL, {'fields': 'id,title,time_minutes'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, [{
+            'id': recipe.id,
+            'title': recipe.title,
+            'time_minutes': recipe.time_minutes,
+        }])
+
+    def test_list_recipes_omit_fields(self):
+        """Test the omit param removes fields from the response."""
+        create_recipe(user=self.user)
+
+        res = self.client.get(RECIPES_URL, {'omit': 'tags,ingredients'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotIn('tags', res.data[0])
+        self.assertNotIn('ingredients', res.data[0])
+        self.assertIn('price', res.data[0])
+
+    def test_list_recipes_without_expand_returns_ids(self):
+        """Test nested fields not listed in expand are returned as ids."""
+        recipe = create_recipe(user=self.user)
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        ingredient = Ingredient.objects.create(user=self.user, name='Kale')
+        recipe.tags.add(tag)
+        recipe.ingredients.add(ingredient)
+
+        res = self.client.get(RECIPES_URL, {'expand': 'ingredients'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data[0]['tags'], [tag.id])
+        self.assertEqual(
+            res.data[0]['ingredients'],
+            [{'id': ingredient.id, 'name': ingredient.name}]
+        )
+
+    def test_list_recipes_limited_fields_skips_relations(self):
+        """Test relations are not queried when they are not requested."""
+        for i in range(3):
+            recipe = create_recipe(user=self.user, title=f'Recipe {i}')
+            recipe.tags.add(Tag.objects.create(user=self.user, name=f'{i}'))
+
+        with self.assertNumQueries(1):
+            res = self.client.get(RECIPES_URL, {'fields': 'id,title'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data), 3)
+
+    def test_get_recipe_detail_limited_fields(self):
+        """Test the fields param limits the recipe detail fields."""
+        recipe = create_recipe(user=self.user)
+
+        res = self.client.get(detail_url(recipe.id), {'omit': 'description'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotIn('description', res.data)
+        self.assertEqual(res.data['title'], recipe.title)
+
+    def test_create_recipe_with_quantities(self):
+        """Test creating a recipe with ingredient quantities."""
+        salt = Ingredient.objects.create(user=self.user, name='Salt')
+        payload = {
+            'title': 'Bread',
+            'time_minutes': 60,
+            'price': Decimal('2.00'),
+            'ingredients': [{'name': 'Flour'}],
+            'quantities': [{'ingredient': salt.id, 'quantity': '5',
+                            'unit': 'g'}],
+        }
+
+        res = self.client.post(RECIPES_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        recipe = Recipe.objects.get(id=res.data['id'])
+        self.assertEqual(
+            sorted(recipe.ingredients.values_list('name', flat=True)),
+            ['Flour', 'Salt'],
+        )
+        flour = Ingredient.objects.get(user=self.user, name='Flour')
+        self.assertCountEqual(res.data['quantities'], [
+            {'ingredient': flour.id, 'quantity': None, 'unit': ''},
+            {'ingredient': salt.id, 'quantity': '5.000', 'unit': 'g'},
+        ])
+
+    def test_update_ingredients_keeps_quantities(self):
+        """Test ingredients the recipe keeps keep their quantities."""
+        recipe = create_recipe(user=self.user)
+        salt = Ingredient.objects.create(user=self.user, name='Salt')
+        RecipeIngredient.objects.create(
+            recipe=recipe, ingredient=salt, quantity=Decimal(5), unit='g'
+        )
+
+        payload = {'ingredients': [{'name': 'Salt'}, {'name': 'Kale'}]}
+        res = self.client.patch(detail_url(recipe.id), payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(recipe.ingredients.count(), 2)
+        self.assertEqual(
+            RecipeIngredient.objects.get(recipe=recipe, ingredient=salt)
+            .quantity,
+            Decimal(5),
+        )
+
+    def test_quantities_validated(self):
+        """Test invalid quantities are rejected."""
+        recipe = create_recipe(user=self.user)
+        salt = Ingredient.objects.create(user=self.user, name='Salt')
+        other = Ingredient.objects.create(
+            user=create_user(email='other@example.com', password='test123'),
+            name='Pepper',
+        )
+
+        for quantities in (
+            [{'ingredient': salt.id, 'quantity': '5'}],
+            [{'ingredient': salt.id, 'quantity': '5', 'unit': 'bushel'}],
+            [{'ingredient': salt.id}, {'ingredient': salt.id}],
+            [{'ingredient': other.id, 'quantity': '5', 'unit': 'g'}],
+        ):
+            res = self.client.patch(
+                detail_url(recipe.id), {'quantities': quantities},
+                format='json',
+            )
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(RecipeIngredient.objects.exists())
+
+    def test_compute_recipes(self):
+        """Test scaling and totalling recipes in one request."""
+        bread = create_recipe(user=self.user, price=Decimal('2.00'),
+                              time_minutes=60)
+        soup = create_recipe(user=self.user, price=Decimal('3.50'),
+                             time_minutes=30)
+        flour = Ingredient.objects.create(user=self.user, name='Flour')
+        water = Ingredient.objects.create(user=self.user, name='Water')
+        for recipe, ingredient, quantity, unit in (
+                (bread, flour, '0.5', 'kg'),
+                (bread, water, '300', 'ml'),
+                (soup, flour, '20', 'g'),
+                (soup, water, '1', 'l')):
+            RecipeIngredient.objects.create(
+                recipe=recipe, ingredient=ingredient,
+                quantity=Decimal(quantity), unit=unit,
+            )
+
+        res = self.client.post(COMPUTE_URL, {'items': [
+            {'recipe': bread.id, 'scale': '2'},
+            {'recipe': soup.id},
+        ]}, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['price'], '7.50')
+        self.assertEqual(res.data['time_minutes'], 90)
+        self.assertEqual(res.data['recipes'], [
+            {'id': bread.id, 'scale': '2.000', 'price': '4.00'},
+            {'id': soup.id, 'scale': '1.000', 'price': '3.50'},
+        ])
+        self.assertEqual(res.data['ingredients'], [
+            {'id': flour.id, 'name': 'Flour', 'quantity': '1020.000',
+             'unit': 'g'},
+            {'id': water.id, 'name': 'Water', 'quantity': '1600.000',
+             'unit': 'ml'},
+        ])
+
+    def test_compute_other_users_recipe(self):
+        """Test computing with another user's recipe is rejected."""
+        other = create_user(email='other@example.com', password='test123')
+        recipe = create_recipe(user=other)
+
+        res = self.client.post(
+            COMPUTE_URL, {'items': [{'recipe': recipe.id}]}, format='json'
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_shopping_list(self):
+        """Test listing the total ingredients of several recipes."""
+        bread = create_recipe(user=self.user)
+        cake = create_recipe(user=self.user)
+        other = create_recipe(user=create_user(
+            email='other@example.com', password='test123'
+        ))
+        flour = Ingredient.objects.create(user=self.user, name='Flour')
+        milk = Ingredient.objects.create(user=self.user, name='Milk')
+        salt = Ingredient.objects.create(user=self.user, name='Salt')
+        for recipe, ingredient, quantity, unit in (
+                (bread, flour, '0.5', 'kg'),
+                (cake, flour, '250', 'g'),
+                (cake, milk, '1', 'cup'),
+                (cake, milk, None, ''),
+                (bread, salt, None, ''),
+                (other, flour, '1', 'kg')):
+            if quantity is None:
+                # A second row for the same ingredient needs a new one.
+                ingredient = Ingredient.objects.create(
+                    user=self.user, name=ingredient.name
+                )
+            RecipeIngredient.objects.create(
+                recipe=recipe, ingredient=ingredient, unit=unit,
+                quantity=quantity and Decimal(quantity),
+            )
+
+        with self.assertNumQueries(1):
+            res = self.client.get(SHOPPING_LIST_URL, {
+                'recipes': f'{bread.id},{cake.id},{other.id}'
+            })
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        items = [
+            (item['name'], item['quantity'], item['unit'], item['recipes'])
+            for item in res.data
+        ]
+        self.assertEqual(items, [
+            ('Flour', '750.000', 'g', 2),
+            ('Milk', '236.588', 'ml', 1),
+            ('Milk', None, '', 1),
+            ('Salt', None, '', 1),
+        ])
+
+    def test_shopping_list_invalid_ids(self):
+        """Test invalid recipe ids are rejected."""
+        for params in ({}, {'recipes': 'a,b'}):
+            res = self.client.get(SHOPPING_LIST_URL, params)
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+def image_content(format='PNG'):
+    """Return the content of a small image file."""
+    content = io.BytesIO()
+    Image.new('RGB', (10, 10)).save(content, format=format)
+
+    return ContentFile(content.getvalue())
+
+
+def delete_image(test, recipe):
+    """Delete the image of a recipe, including its file."""
+    recipe.refresh_from_db()
+    with test.captureOnCommitCallbacks(execute=True):
+        recipe.image.delete()
+
 
 class ImageUploadTests(TestCase):
     """Test for the image upload API."""
@@ -419,7 +683,7 @@ class ImageUploadTests(TestCase):
         self.recipe = create_recipe(user=self.user)
 
     def tearDown(self):
-        self.recipe.image.delete()
+        delete_image(self, self.recipe)
 
     def test_upload_image(self):
         """Test uploading an image to a recipe."""
@@ -436,6 +700,45 @@ class ImageUploadTests(TestCase):
         self.assertIn('image', res.data)
         self.assertTrue(os.path.exists(self.recipe.image.path))
 
+    def test_upload_same_image_not_decoded_again(self):
+        """Test uploading a stored image reuses it without decoding it."""
+        other = create_recipe(user=self.user)
+        self.addCleanup(delete_image, self, other)
+        with tempfile.NamedTemporaryFile(suffix='.jpg') as image_file:
+            Image.new('RGB', (10, 10)).save(image_file.name, format='JPEG')
+            with patch(
+                'PIL.Image.open', wraps=Image.open
+            ) as patched_open:
+                for recipe in (self.recipe, other):
+                    image_file.seek(0)
+                    res = self.client.post(
+                        image_upload_url(recipe.id),
+                        {'image': image_file},
+                        format='multipart',
+                    )
+                    self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        self.assertEqual(patched_open.call_count, 1)
+        self.recipe.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual(other.image.name, self.recipe.image.name)
+
+    def test_upload_same_image_again(self):
+        """Test uploading a recipe's own image again keeps one reference."""
+        content = image_content('JPEG').read()
+        for _ in range(2):
+            res = self.client.post(
+                image_upload_url(self.recipe.id),
+                {'image': ContentFile(content, name='image.jpg')},
+                format='multipart',
+            )
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        self.recipe.refresh_from_db()
+        self.assertEqual(
+            ImageBlob.objects.get(name=self.recipe.image.name).ref_count, 1
+        )
+
     def test_upload_image_bad_request(self):
         """Test uploading an invalid image."""
         url = image_upload_url(self.recipe.id)
@@ -443,3 +746,188 @@ class ImageUploadTests(TestCase):
 
         res = self.client.post(url, payload, format='multipart')
         self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class DirectImageUploadTests(TestCase):
+    """Test uploading images directly to the media storage."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com',
+            password='testpass123',
+        )
+        self.client.force_authenticate(user=self.user)
+        self.recipe = create_recipe(user=self.user)
+
+    def tearDown(self):
+        delete_image(self, self.recipe)
+
+    def _request_upload(self, recipe):
+        """Request a direct upload and return the response"""
+        with patch('recipe.views.presigned_upload') as patched_presign:
+            patched_presign.return_value = {
+                'url': 'http://minio:9000/media',
+                'fields': {'key': 'uploads/recipe/image.png'},
+            }
+            res = self.client.post(
+                upload_url_url(recipe.id), {'content_type': 'image/png'}
+            )
+
+        return res, patched_presign
+
+    def test_upload_not_supported(self):
+        """Test direct uploads are refused by the filesystem storage"""
+        res = self.client.post(
+            upload_url_url(self.recipe.id), {'content_type': 'image/png'}
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_upload_url(self):
+        """Test requesting a presigned upload"""
+        res, patched_presign = self._request_upload(self.recipe)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['url'], 'http://minio:9000/media')
+        self.assertIn('upload_token', res.data)
+        _, name, content_type, _, _ = patched_presign.call_args[0]
+        self.assertTrue(name.startswith('uploads/recipe/'))
+        self.assertTrue(name.endswith('.png'))
+        self.assertEqual(content_type, 'image/png')
+
+    def test_upload_url_invalid_content_type(self):
+        """Test only image content types can be uploaded"""
+        res = self.client.post(
+            upload_url_url(self.recipe.id), {'content_type': 'text/html'}
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_upload_complete(self):
+        """Test attaching an uploaded image and redirecting to it"""
+        res, patched_presign = self._request_upload(self.recipe)
+        name = patched_presign.call_args[0][1]
+        default_storage.save(name, image_content())
+
+        res = self.client.post(
+            upload_complete_url(self.recipe.id),
+            {'upload_token': res.data['upload_token']},
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image.name, name)
+        self.assertEqual(ImageBlob.objects.get(name=name).ref_count, 1)
+
+        res = self.client.get(
+            reverse('recipe:recipe-image-redirect', args=[self.recipe.id])
+        )
+        self.assertEqual(res.status_code, status.HTTP_302_FOUND)
+        self.assertEqual(res['Location'], self.recipe.image.url)
+
+    def _complete_upload(self, content):
+        """Upload content directly and complete the upload"""
+        res, patched_presign = self._request_upload(self.recipe)
+        name = patched_presign.call_args[0][1]
+        default_storage.save(name, content)
+
+        res = self.client.post(
+            upload_complete_url(self.recipe.id),
+            {'upload_token': res.data['upload_token']},
+        )
+
+        return res, name
+
+    def test_upload_complete_invalid_image(self):
+        """Test uploads which are not images are rejected and deleted"""
+        res, name = self._complete_upload(ContentFile(b'<html></html>'))
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(default_storage.exists(name))
+        self.recipe.refresh_from_db()
+        self.assertFalse(self.recipe.image)
+
+    def test_upload_complete_wrong_content_type(self):
+        """Test uploads not matching the requested type are rejected"""
+        res, name = self._complete_upload(image_content('JPEG'))
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(default_storage.exists(name))
+
+    @override_settings(IMAGE_UPLOAD_MAX_SIZE=10)
+    def test_upload_complete_too_large(self):
+        """Test uploads over the maximum size are rejected"""
+        res, name = self._complete_upload(image_content())
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(default_storage.exists(name))
+
+    def test_upload_complete_same_image(self):
+        """Test uploading a stored image reuses its file"""
+        other = create_recipe(user=self.user)
+        self.addCleanup(delete_image, self, other)
+        other.image.save('image.png', image_content())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            res, name = self._complete_upload(image_content())
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image.name, other.image.name)
+        self.assertEqual(
+            ImageBlob.objects.get(name=other.image.name).ref_count, 2
+        )
+        self.assertFalse(default_storage.exists(name))
+
+    def test_upload_complete_replayed(self):
+        """Test completing an upload again takes no further reference"""
+        res, patched_presign = self._request_upload(self.recipe)
+        name = patched_presign.call_args[0][1]
+        default_storage.save(name, image_content())
+
+        for _ in range(3):
+            with self.captureOnCommitCallbacks(execute=True):
+                complete = self.client.post(
+                    upload_complete_url(self.recipe.id),
+                    {'upload_token': res.data['upload_token']},
+                )
+            self.assertEqual(complete.status_code, status.HTTP_200_OK)
+
+        self.assertEqual(ImageBlob.objects.get(name=name).ref_count, 1)
+        self.assertTrue(default_storage.exists(name))
+
+    def test_upload_complete_missing_file(self):
+        """Test completing an upload which never happened fails"""
+        res, _ = self._request_upload(self.recipe)
+
+        res = self.client.post(
+            upload_complete_url(self.recipe.id),
+            {'upload_token': res.data['upload_token']},
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_upload_complete_other_recipe(self):
+        """Test upload tokens only apply to their own recipe"""
+        other = create_recipe(user=self.user)
+        res, patched_presign = self._request_upload(other)
+        default_storage.save(
+            patched_presign.call_args[0][1], image_content()
+        )
+
+        res = self.client.post(
+            upload_complete_url(self.recipe.id),
+            {'upload_token': res.data['upload_token']},
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        default_storage.delete(patched_presign.call_args[0][1])
+
+    def test_image_redirect_without_image(self):
+        """Test redirecting to a missing image returns 404"""
+        res = self.client.get(
+            reverse('recipe:recipe-image-redirect', args=[self.recipe.id])
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
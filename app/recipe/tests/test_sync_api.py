@@ -0,0 +1,138 @@
+"""
+Tests for the sync API.
+"""
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Ingredient, Recipe, Tag
+
+SYNC_URL = reverse('recipe:sync')
+
+
+def create_recipe(user, **params):
+    """Create and return a sample recipe"""
+    defaults = {
+        'title': 'Sample recipe',
+        'time_minutes': 22,
+        'price': Decimal('5.25'),
+    }
+    defaults.update(params)
+
+    return Recipe.objects.create(user=user, **defaults)
+
+
+class PublicSyncApiTests(TestCase):
+    """Test unauthenticated sync requests"""
+
+    def test_auth_required(self):
+        """Test auth is required to sync"""
+        res = APIClient().get(SYNC_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+@override_settings(SYNC_SETTLE_SECONDS=0)
+class PrivateSyncApiTests(TestCase):
+    """Test syncing changes"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'user@example.com', 'testpass123'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _sync(self, since=None):
+        params = {} if since is None else {'since': since}
+        res = self.client.get(SYNC_URL, params)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        return res.data
+
+    def test_full_sync(self):
+        """Test syncing without a cursor returns everything of the user"""
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        recipe = create_recipe(self.user)
+        recipe.tags.add(tag)
+        other = get_user_model().objects.create_user('other@example.com')
+        create_recipe(other)
+
+        data = self._sync()
+
+        self.assertEqual([r['id'] for r in data['recipes']], [recipe.pk])
+        self.assertEqual(data['recipes'][0]['tags'], [tag.pk])
+        self.assertEqual([t['id'] for t in data['tags']], [tag.pk])
+        self.assertEqual(data['ingredients'], [])
+        self.assertFalse(data['has_more'])
+
+    def test_sync_since_cursor(self):
+        """Test syncing returns only changes after the cursor"""
+        recipe = create_recipe(self.user)
+        unchanged = create_recipe(self.user)
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        ingredient = Ingredient.objects.create(user=self.user, name='Salt')
+        cursor = self._sync()['cursor']
+
+        recipe.title = 'Changed'
+        recipe.save()
+        tag_id = tag.pk
+        tag.delete()
+        data = self._sync(cursor)
+
+        self.assertEqual([r['id'] for r in data['recipes']], [recipe.pk])
+        self.assertEqual(data['tags'], [])
+        self.assertEqual(data['deleted']['tags'], [tag_id])
+        self.assertEqual(data['deleted']['recipes'], [])
+        self.assertNotIn(unchanged.pk, data['deleted']['recipes'])
+        self.assertNotIn(ingredient.pk, data['deleted']['ingredients'])
+
+        self.assertEqual(self._sync(data['cursor'])['recipes'], [])
+
+    def test_sync_deleted_recipe(self):
+        """Test deleted recipes are returned as tombstones"""
+        recipe = create_recipe(self.user)
+        recipe_id = recipe.pk
+        cursor = self._sync()['cursor']
+        recipe.delete()
+
+        data = self._sync(cursor)
+
+        self.assertEqual(data['recipes'], [])
+        self.assertEqual(data['deleted']['recipes'], [recipe_id])
+
+    @override_settings(SYNC_PAGE_SIZE=2)
+    def test_sync_pages(self):
+        """Test changes are returned in pages"""
+        recipes = [create_recipe(self.user) for _ in range(3)]
+
+        first = self._sync()
+        second = self._sync(first['cursor'])
+
+        self.assertTrue(first['has_more'])
+        self.assertFalse(second['has_more'])
+        self.assertEqual(
+            [r['id'] for r in first['recipes'] + second['recipes']],
+            [recipe.pk for recipe in recipes],
+        )
+
+    @override_settings(SYNC_SETTLE_SECONDS=60)
+    def test_recent_changes_left_for_next_sync(self):
+        """Test changes younger than the settle time are not returned"""
+        create_recipe(self.user)
+
+        data = self._sync()
+
+        self.assertEqual(data['recipes'], [])
+        self.assertEqual(data['cursor'], '0')
+
+    def test_invalid_cursor(self):
+        """Test an invalid cursor is rejected"""
+        res = self.client.get(SYNC_URL, {'since': 'abc'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
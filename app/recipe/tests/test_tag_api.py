@@ -15,6 +15,9 @@ from core.models import Tag, Recipe
 from recipe.serializers import TagSerializer
 
 TAGS_URL = reverse('recipe:tag-list')
+BULK_DELETE_URL = reverse('recipe:tag-bulk-delete')
+BULK_RENAME_URL = reverse('recipe:tag-bulk-rename')
+MERGE_URL = reverse('recipe:tag-merge')
 
 
 def create_user(email='user@example.com', password='testpass123'):
@@ -141,3 +144,114 @@ class PrivateTagsApiTests(TestCase):
         res = self.client.get(TAGS_URL, {'assigned_only': 1})
 
         self.assertEqual(len(res.data), 1)
+
+    def test_bulk_delete_tags(self):
+        """Test deleting several tags in one request"""
+        tags = [Tag.objects.create(user=self.user, name=f'Tag {i}')
+                for i in range(3)]
+        other = Tag.objects.create(user=create_user('other@example.com'),
+                                   name='Other')
+        recipe = Recipe.objects.create(
+            user=self.user, title='Soup', time_minutes=5,
+            price=Decimal('5.00'),
+        )
+        recipe.tags.add(tags[0], tags[2])
+
+        res = self.client.post(
+            BULK_DELETE_URL,
+            {'ids': [tags[0].id, tags[1].id, other.id]},
+            format='json',
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, {'count': 2})
+        self.assertEqual(
+            set(Tag.objects.values_list('id', flat=True)),
+            {tags[2].id, other.id},
+        )
+        self.assertEqual(list(recipe.tags.all()), [tags[2]])
+
+    def test_bulk_rename_tags(self):
+        """Test renaming several tags in one request"""
+        tag1 = Tag.objects.create(user=self.user, name='Vegan')
+        tag2 = Tag.objects.create(user=self.user, name='Desert')
+        other = Tag.objects.create(user=create_user('other@example.com'),
+                                   name='Other')
+        payload = {'items': [
+            {'id': tag1.id, 'name': 'Plant based'},
+            {'id': tag2.id, 'name': 'Dessert'},
+            {'id': other.id, 'name': 'Mine'},
+        ]}
+
+        res = self.client.post(BULK_RENAME_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, {'count': 2})
+        for tag, name in ((tag1, 'Plant based'), (tag2, 'Dessert'),
+                          (other, 'Other')):
+            tag.refresh_from_db()
+            self.assertEqual(tag.name, name)
+
+    def test_bulk_rename_duplicate_ids(self):
+        """Test renaming a tag twice in one request is rejected"""
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        payload = {'items': [
+            {'id': tag.id, 'name': 'One'}, {'id': tag.id, 'name': 'Two'},
+        ]}
+
+        res = self.client.post(BULK_RENAME_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_merge_tags(self):
+        """Test merging tags moves their recipes to the target"""
+        target = Tag.objects.create(user=self.user, name='Vegan')
+        source1 = Tag.objects.create(user=self.user, name='vegan')
+        source2 = Tag.objects.create(user=self.user, name='VEGAN')
+        recipes = [
+            Recipe.objects.create(
+                user=self.user, title=f'Recipe {i}', time_minutes=5,
+                price=Decimal('5.00'),
+            )
+            for i in range(3)
+        ]
+        recipes[0].tags.add(target, source1)
+        recipes[1].tags.add(source1, source2)
+        recipes[2].tags.add(source2)
+
+        res = self.client.post(
+            MERGE_URL,
+            {'target': target.id, 'sources': [source1.id, source2.id]},
+            format='json',
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, {'count': 2})
+        self.assertEqual(list(Tag.objects.all()), [target])
+        for recipe in recipes:
+            self.assertEqual(list(recipe.tags.all()), [target])
+
+    def test_merge_into_itself(self):
+        """Test a tag cannot be merged into itself"""
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+
+        res = self.client.post(
+            MERGE_URL, {'target': tag.id, 'sources': [tag.id]},
+            format='json',
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_merge_into_other_users_tag(self):
+        """Test tags cannot be merged into another user's tag"""
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        other = Tag.objects.create(user=create_user('other@example.com'),
+                                   name='Other')
+
+        res = self.client.post(
+            MERGE_URL, {'target': other.id, 'sources': [tag.id]},
+            format='json',
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertTrue(Tag.objects.filter(id=tag.id).exists())
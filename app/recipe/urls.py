@@ -14,5 +14,6 @@ router.register('tags', views.TagViewSet)
 router.register('ingredients', views.IngredientViewSet)
 
 urlpatterns = [
+    path('sync/', views.SyncView.as_view(), name='sync'),
     path('', include(router.urls)),
 ]
@@ -8,22 +8,108 @@ from drf_spectacular.utils import (
     OpenApiTypes
 )
 
+import os
+from datetime import timedelta
+
+from django.conf import settings
+from django.core import signing
+from django.db import connections, router, transaction
+from django.db.models import Case, CharField, F, Prefetch, Value, When
+from django.http import Http404, HttpResponseRedirect
+from django.utils import timezone
+
 from rest_framework import viewsets, mixins, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from rest_framework.authentication import TokenAuthentication
+from rest_framework.views import APIView
 
-from core.models import Recipe, Tag, Ingredient
+from core.authentication import SignedTokenAuthentication
+from core.changelog import log_changes
+from core.compute import compute_batch, shopping_list
+from core.deletion import delete_in_chunks
+from core.idempotency import IDEMPOTENCY_KEY_PARAMETER, idempotent
+from core.models import (
+    ChangeLogEntry,
+    QuantityConflict,
+    Recipe,
+    RecipeIngredient,
+    Tag,
+    Ingredient,
+)
+from core.routers import ReplicaReadMixin
+from core.storage import presigned_upload
+from core.views import AsyncReadViewMixin
 from recipe.serializers import (
+    BulkDeleteSerializer,
+    BulkRenameSerializer,
+    BulkResultSerializer,
+    BULK_MAX_ITEMS,
+    ComputeResultSerializer,
+    ComputeSerializer,
+    MergeSerializer,
     RecipeSerializer,
     RecipeDetailSerializer,
     TagSerializer,
     IngredientSerializer,
-    RecipeImageSerializer
+    RecipeImageSerializer,
+    RecipeImageUploadRequestSerializer,
+    RecipeImageUploadSerializer,
+    RecipeImageUploadCompleteSerializer,
+    ShoppingListItemSerializer,
+    SyncSerializer,
+    IMAGE_UPLOAD_SALT,
 )
 
 
+FIELD_SELECTION_PARAMETERS = [
+    OpenApiParameter(
+        'fields',
+        OpenApiTypes.STR,
+        description='Comma separated list of fields to return',
+    ),
+    OpenApiParameter(
+        'omit',
+        OpenApiTypes.STR,
+        description='Comma separated list of fields to leave out',
+    ),
+    OpenApiParameter(
+        'expand',
+        OpenApiTypes.STR,
+        description=(
+            'Comma separated list of nested fields to return as objects, '
+            'other nested fields are returned as lists of ids'
+        ),
+    ),
+]
+
+
+def _verify_upload(storage, name):
+    """Return why a file uploaded directly to storage is not a valid image"""
+    from PIL import Image
+
+    if storage.size(name) > settings.IMAGE_UPLOAD_MAX_SIZE:
+        return 'Image is too large.'
+
+    content_types = {
+        ext: content_type
+        for content_type, ext in settings.IMAGE_UPLOAD_CONTENT_TYPES.items()
+    }
+    try:
+        with storage.open(name) as content:
+            image = Image.open(content)
+            image.verify()
+    except Exception:
+        return 'Upload is not a valid image.'
+
+    if Image.MIME.get(image.format) != content_types.get(
+            os.path.splitext(name)[1]):
+        return 'Image does not match its content type.'
+
+    return None
+
+
 @extend_schema_view(
     list=extend_schema(
         parameters=[
@@ -36,21 +122,82 @@ from recipe.serializers import (
                 'ingredients',
                 OpenApiTypes.STR,
                 description='Comma separated list of ingredient ids to filter',
-            )
+            ),
+            *FIELD_SELECTION_PARAMETERS,
         ]
-    )
+    ),
+    retrieve=extend_schema(parameters=FIELD_SELECTION_PARAMETERS),
+    create=extend_schema(parameters=[IDEMPOTENCY_KEY_PARAMETER]),
 )
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(
+    AsyncReadViewMixin,
+    ReplicaReadMixin,
+    viewsets.ModelViewSet
+):
     """View for manage recipe APIs"""
     serializer_class = RecipeDetailSerializer
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (SignedTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
     queryset = Recipe.objects.all()
+    field_selection_actions = ('list', 'retrieve')
+    throttle_scopes = {
+        'upload_image': 'uploads',
+        'image_upload_url': 'uploads',
+        'compute': 'bulk',
+        'shopping_list': 'bulk',
+    }
 
     def _params_to_ints(self, qs):
         """Convert a list of string IDs to a list of integers"""
         return [int(str_id) for str_id in qs.split(',')]
 
+    def _params_to_names(self, qs):
+        """Convert a list of comma separated names to a list of strings"""
+        return [name.strip() for name in qs.split(',') if name.strip()]
+
+    def _get_field_selection(self):
+        """Return the fields and nested expansions requested by the client"""
+        params = self.request.query_params
+        fields = self.get_serializer_class().Meta.fields
+
+        requested = self._params_to_names(params.get('fields', ''))
+        if requested:
+            fields = [name for name in fields if name in requested]
+
+        omit = self._params_to_names(params.get('omit', ''))
+        fields = [name for name in fields if name not in omit]
+
+        expand = None
+        if 'expand' in params:
+            expand = self._params_to_names(params['expand'])
+
+        return {'fields': fields, 'expand': expand}
+
+    def _apply_field_selection(self, queryset):
+        """Limit selected columns and prefetches to the requested fields"""
+        selection = self._get_field_selection()
+        fields, expand = selection['fields'], selection['expand']
+
+        columns = {field.name for field in Recipe._meta.concrete_fields}
+        queryset = queryset.only('id', *(f for f in fields if f in columns))
+
+        for field in Recipe._meta.many_to_many:
+            if field.name not in fields:
+                continue
+
+            if expand is None or field.name in expand:
+                queryset = queryset.prefetch_related(field.name)
+            else:
+                related = field.related_model.objects.only('id')
+                queryset = queryset.prefetch_related(
+                    Prefetch(field.name, queryset=related)
+                )
+
+        if 'quantities' in fields:
+            queryset = queryset.prefetch_related('quantities')
+
+        return queryset
+
     def get_queryset(self):
         """Retrieve the recipes for authenticated user"""
         tags = self.request.query_params.get('tags', None)
@@ -65,10 +212,22 @@ class RecipeViewSet(viewsets.ModelViewSet):
             ingredient_ids = self._params_to_ints(ingredients)
             queryset = queryset.filter(ingredients__id__in=ingredient_ids)
 
-        return (queryset
-                .filter(user=self.request.user)
-                .order_by('-id')
-                .distinct())
+        queryset = (queryset
+                    .filter(user=self.request.user)
+                    .order_by('-id')
+                    .distinct())
+
+        if self.action in self.field_selection_actions:
+            queryset = self._apply_field_selection(queryset)
+
+        return queryset
+
+    def get_serializer(self, *args, **kwargs):
+        """Return serializer limited to the fields requested by the client"""
+        if self.action in self.field_selection_actions:
+            kwargs.update(self._get_field_selection())
+
+        return super().get_serializer(*args, **kwargs)
 
     def get_serializer_class(self):
         """Return serializer class based on action"""
@@ -78,13 +237,28 @@ class RecipeViewSet(viewsets.ModelViewSet):
         if self.action == 'upload_image':
             return RecipeImageSerializer
 
+        if self.action == 'image_upload_url':
+            return RecipeImageUploadRequestSerializer
+
+        if self.action == 'image_upload_complete':
+            return RecipeImageUploadCompleteSerializer
+
+        if self.action == 'compute':
+            return ComputeSerializer
+
         return RecipeDetailSerializer
 
+    @idempotent
+    def create(self, request, *args, **kwargs):
+        return super().create(request, *args, **kwargs)
+
     def perform_create(self, serializer):
         """Create a new recipe"""
         serializer.save(user=self.request.user)
 
+    @extend_schema(parameters=[IDEMPOTENCY_KEY_PARAMETER])
     @action(methods=['POST'], detail=True, url_path='upload-image')
+    @idempotent
     def upload_image(self, request, pk=None):
         """Upload an image to recipe"""
         recipe = self.get_object()
@@ -95,6 +269,134 @@ class RecipeViewSet(viewsets.ModelViewSet):
 
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+    @extend_schema(responses=RecipeImageUploadSerializer)
+    @action(methods=['POST'], detail=True, url_path='image-upload-url')
+    def image_upload_url(self, request, pk=None):
+        """Return a presigned URL to upload an image directly to storage"""
+        recipe = self.get_object()
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        content_type = serializer.validated_data['content_type']
+        field = Recipe._meta.get_field('image')
+        name = field.generate_filename(
+            recipe, 'image' + settings.IMAGE_UPLOAD_CONTENT_TYPES[content_type]
+        )
+        upload = presigned_upload(
+            field.storage,
+            name,
+            content_type,
+            settings.IMAGE_UPLOAD_MAX_SIZE,
+            settings.IMAGE_UPLOAD_EXPIRES,
+        )
+        if upload is None:
+            return Response(
+                {'detail': 'Direct uploads are not supported by the storage.'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        upload['upload_token'] = signing.dumps(
+            {'recipe': recipe.pk, 'name': name}, salt=IMAGE_UPLOAD_SALT
+        )
+        return Response(RecipeImageUploadSerializer(upload).data)
+
+    @extend_schema(responses=RecipeImageSerializer)
+    @action(methods=['POST'], detail=True, url_path='image-upload-complete')
+    def image_upload_complete(self, request, pk=None):
+        """Attach an image uploaded directly to storage to the recipe"""
+        recipe = self.get_object()
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        upload = serializer.validated_data['upload_token']
+        storage = Recipe._meta.get_field('image').storage
+        if upload['recipe'] != recipe.pk:
+            error = 'Upload token was issued for another recipe.'
+        elif not storage.exists(upload['name']):
+            error = 'Image has not been uploaded.'
+        else:
+            error = _verify_upload(storage, upload['name'])
+            if error:
+                storage.delete(upload['name'])
+        if error:
+            return Response(
+                {'upload_token': [error]}, status=status.HTTP_400_BAD_REQUEST
+            )
+
+        recipe.image.adopt(upload['name'], save=False)
+        recipe.save(update_fields=['image'])
+        serializer = RecipeImageSerializer(
+            recipe, context=self.get_serializer_context()
+        )
+
+        return Response(serializer.data)
+
+    @extend_schema(responses={302: None})
+    @action(methods=['GET'], detail=True, url_path='image')
+    def image_redirect(self, request, pk=None):
+        """Redirect to the recipe image in the media storage"""
+        recipe = self.get_object()
+        if not recipe.image:
+            raise Http404
+
+        return HttpResponseRedirect(recipe.image.url)
+
+    @extend_schema(responses=ComputeResultSerializer)
+    @action(methods=['POST'], detail=False, url_path='compute')
+    def compute(self, request):
+        """Scale recipes and total their prices and ingredients"""
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        scales = {
+            item['recipe']: item['scale']
+            for item in serializer.validated_data['items']
+        }
+        totals = compute_batch(
+            Recipe.objects.filter(user=request.user), scales
+        )
+        missing = set(scales) - {recipe.id for recipe in totals.recipes}
+        if missing:
+            raise ValidationError({'items': [
+                f'Unknown recipes: {", ".join(map(str, sorted(missing)))}.'
+            ]})
+
+        return Response(ComputeResultSerializer(totals).data)
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                'recipes',
+                OpenApiTypes.STR,
+                required=True,
+                description=(
+                    'Comma separated list of recipe ids to list the '
+                    'ingredients of'
+                ),
+            ),
+        ],
+        responses=ShoppingListItemSerializer(many=True),
+    )
+    @action(methods=['GET'], detail=False, url_path='shopping-list')
+    def shopping_list(self, request):
+        """List the total ingredients of several recipes"""
+        try:
+            recipe_ids = set(self._params_to_ints(
+                request.query_params.get('recipes', '')
+            ))
+        except ValueError:
+            raise ValidationError({'recipes': ['Invalid recipe ids.']})
+        if len(recipe_ids) > BULK_MAX_ITEMS:
+            raise ValidationError({'recipes': [
+                f'Ensure there are no more than {BULK_MAX_ITEMS} recipes.'
+            ]})
+
+        items = shopping_list(
+            Recipe.objects.filter(user=request.user), recipe_ids
+        )
+
+        return Response(ShoppingListItemSerializer(items, many=True).data)
+
 
 @extend_schema_view(
     list=extend_schema(
@@ -108,14 +410,21 @@ class RecipeViewSet(viewsets.ModelViewSet):
     )
 )
 class BaseRecipeViewSet(
+    AsyncReadViewMixin,
+    ReplicaReadMixin,
     mixins.ListModelMixin,
     mixins.UpdateModelMixin,
     mixins.DestroyModelMixin,
     viewsets.GenericViewSet
 ):
     """Base viewset for Recipe attributes"""
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (SignedTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
+    throttle_scopes = {
+        'bulk_delete': 'bulk',
+        'bulk_rename': 'bulk',
+        'merge': 'bulk',
+    }
 
     def get_queryset(self):
         """Retrieve the tags for authenticated user"""
@@ -131,6 +440,119 @@ class BaseRecipeViewSet(
                 .order_by('-name')
                 .distinct())
 
+    def get_serializer_class(self):
+        """Return serializer class based on action"""
+        if self.action == 'bulk_delete':
+            return BulkDeleteSerializer
+
+        if self.action == 'bulk_rename':
+            return BulkRenameSerializer
+
+        if self.action == 'merge':
+            return MergeSerializer
+
+        return self.serializer_class
+
+    def _owned(self):
+        """Return all objects of the authenticated user"""
+        return self.queryset.filter(user=self.request.user)
+
+    def _recipe_field(self):
+        """Return the recipe field relating recipes to these objects"""
+        model = self.queryset.model
+        return next(
+            field for field in Recipe._meta.many_to_many
+            if field.related_model is model
+        )
+
+    def _merge_recipes(self, target, sources):
+        """Add the target to the recipes of the sources"""
+        field = self._recipe_field()
+        through = field.remote_field.through
+        using = router.db_for_write(through)
+        qn = connections[using].ops.quote_name
+        recipe_column = qn(field.m2m_column_name())
+        column = qn(field.m2m_reverse_name())
+        placeholders = ', '.join(['%s'] * len(sources))
+
+        # Recipes already having the target keep their single row.
+        with connections[using].cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {qn(through._meta.db_table)} '
+                f'({recipe_column}, {column}) '
+                f'SELECT DISTINCT {recipe_column}, %s '
+                f'FROM {qn(through._meta.db_table)} '
+                f'WHERE {column} IN ({placeholders}) '
+                f'ON CONFLICT DO NOTHING',
+                [target, *sources],
+            )
+
+    @extend_schema(responses=BulkResultSerializer)
+    @action(methods=['POST'], detail=False, url_path='bulk-delete')
+    def bulk_delete(self, request):
+        """Delete several objects, removing them from their recipes"""
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        count = delete_in_chunks(
+            self._owned().filter(pk__in=serializer.validated_data['ids'])
+        )
+
+        return Response(BulkResultSerializer({'count': count}).data)
+
+    @extend_schema(responses=BulkResultSerializer)
+    @action(methods=['POST'], detail=False, url_path='bulk-rename')
+    def bulk_rename(self, request):
+        """Rename several objects in a single query"""
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        items = serializer.validated_data['items']
+        renamed = self._owned().filter(pk__in=[item['id'] for item in items])
+        with transaction.atomic():
+            count = renamed.update(name=Case(
+                *(When(pk=item['id'], then=Value(item['name']))
+                  for item in items),
+                default=F('name'),
+                output_field=CharField(),
+            ))
+            log_changes(
+                self.queryset.model, renamed.values_list('user_id', 'id')
+            )
+
+        return Response(BulkResultSerializer({'count': count}).data)
+
+    @extend_schema(responses=BulkResultSerializer)
+    @action(methods=['POST'], detail=False, url_path='merge')
+    def merge(self, request):
+        """Merge objects into the target, returns the number merged"""
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        owned = self._owned()
+        target = serializer.validated_data['target']
+        if not owned.filter(pk=target).exists():
+            raise Http404
+        sources = list(owned.filter(
+            pk__in=serializer.validated_data['sources']
+        ).values_list('pk', flat=True))
+        if not sources:
+            return Response(BulkResultSerializer({'count': 0}).data)
+
+        with transaction.atomic():
+            try:
+                self._merge_recipes(target, sources)
+            except QuantityConflict as exc:
+                return Response(
+                    {'detail': 'Recipes have quantities of these objects '
+                               'that cannot be added up.',
+                     'recipes': exc.recipe_ids},
+                    status=status.HTTP_409_CONFLICT,
+                )
+            count = delete_in_chunks(owned.filter(pk__in=sources))
+
+        return Response(BulkResultSerializer({'count': count}).data)
+
 
 class TagViewSet(BaseRecipeViewSet):
     """View for managing tags in the database"""
@@ -142,3 +564,88 @@ class IngredientViewSet(BaseRecipeViewSet):
     """View for managing ingredients in the database"""
     serializer_class = IngredientSerializer
     queryset = Ingredient.objects.all()
+
+    def _merge_recipes(self, target, sources):
+        """Add the target to the recipes of the sources, with quantities"""
+        RecipeIngredient.objects.merge(target, sources)
+
+
+@extend_schema(
+    parameters=[
+        OpenApiParameter(
+            'since',
+            OpenApiTypes.STR,
+            description=(
+                'Cursor returned by the previous sync, leave out for a '
+                'full sync'
+            ),
+        ),
+    ],
+    responses=SyncSerializer,
+)
+class SyncView(AsyncReadViewMixin, ReplicaReadMixin, APIView):
+    """Return recipes, tags and ingredients changed since a cursor.
+
+    Clients pass the returned cursor to the next sync, and sync again
+    straight away while has_more is true.
+    """
+    authentication_classes = (SignedTokenAuthentication,)
+    permission_classes = (IsAuthenticated,)
+
+    def _since(self):
+        """Return the cursor the client synced up to"""
+        since = self.request.query_params.get('since') or '0'
+        if not since.isdigit():
+            raise ValidationError({'since': 'Invalid cursor.'})
+
+        return int(since)
+
+    def get(self, request):
+        since = self._since()
+        entries = ChangeLogEntry.objects.filter(
+            user=request.user, id__gt=since
+        )
+        if settings.SYNC_SETTLE_SECONDS:
+            # Leaves time for transactions with smaller ids to commit.
+            entries = entries.filter(created_at__lte=timezone.now() - (
+                timedelta(seconds=settings.SYNC_SETTLE_SECONDS)
+            ))
+        entries = list(entries.order_by('id').values_list(
+            'id', 'model', 'object_id', 'deleted'
+        )[:settings.SYNC_PAGE_SIZE + 1])
+
+        has_more = len(entries) > settings.SYNC_PAGE_SIZE
+        entries = entries[:settings.SYNC_PAGE_SIZE]
+
+        changed = {'recipe': [], 'tag': [], 'ingredient': []}
+        deleted = {'recipe': [], 'tag': [], 'ingredient': []}
+        for _, model, object_id, is_deleted in entries:
+            (deleted if is_deleted else changed)[model].append(object_id)
+
+        recipes = Recipe.objects.filter(
+            user=request.user, pk__in=changed['recipe']
+        ).prefetch_related(
+            Prefetch('tags', queryset=Tag.objects.only('id')),
+            Prefetch('ingredients', queryset=Ingredient.objects.only('id')),
+            'quantities',
+        ).order_by('id')
+        data = {
+            'cursor': str(entries[-1][0] if entries else since),
+            'has_more': has_more,
+            'recipes': recipes,
+            'tags': Tag.objects.filter(
+                user=request.user, pk__in=changed['tag']
+            ).order_by('id'),
+            'ingredients': Ingredient.objects.filter(
+                user=request.user, pk__in=changed['ingredient']
+            ).order_by('id'),
+            'deleted': {
+                'recipes': deleted['recipe'],
+                'tags': deleted['tag'],
+                'ingredients': deleted['ingredient'],
+            },
+        }
+
+        return Response(
+            SyncSerializer(data, context={'request': request}).data
+        )
@@ -2,6 +2,9 @@
 Test for user api
 """
 
+from decimal import Decimal
+from unittest.mock import patch
+
 from django.test import TestCase
 from django.contrib.auth import get_user_model
 from django.urls import reverse
@@ -9,9 +12,14 @@ from django.urls import reverse
 from rest_framework.test import APIClient
 from rest_framework import status
 
+from core.hashers import PasswordHashingBusy
+from core.models import Recipe
+
 CREATE_USER_URL = reverse('user:create')
 TOKEN_URL = reverse('user:token')
 ME_URL = reverse('user:me')
+REVOKE_URL = reverse('user:token-revoke')
+RECIPES_URL = reverse('recipe:recipe-list')
 
 
 def create_user(**params):
@@ -90,6 +98,7 @@ class PublicUserApiTests(TestCase):
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
         self.assertIn('token', res.data)
+        self.assertIn('expires', res.data)
 
     def test_create_token_with_bad_credentials(self):
         """Test returns error when credentials are invalid"""
@@ -131,6 +140,52 @@ class PublicUserApiTests(TestCase):
         self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
         self.assertNotIn('token', res.data)
 
+    @patch('core.backends.run_in_hashing_pool')
+    def test_create_token_hashing_busy(self, patched_run):
+        """Test returns 503 when password hashing is saturated"""
+        patched_run.side_effect = PasswordHashingBusy()
+        create_user(email='test@example.com', password='pass-123-word')
+
+        payload = {'email': 'test@example.com', 'password': 'pass-123-word'}
+        res = self.client.post(TOKEN_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertNotIn('token', res.data)
+
+    def test_revoke_token(self):
+        """Test a revoked token can no longer be used"""
+        create_user(email='test@example.com', password='pass-123-word')
+        payload = {'email': 'test@example.com', 'password': 'pass-123-word'}
+        token = self.client.post(TOKEN_URL, payload).data['token']
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token}')
+
+        self.assertEqual(
+            self.client.get(ME_URL).status_code, status.HTTP_200_OK
+        )
+        res = self.client.post(REVOKE_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(
+            self.client.get(ME_URL).status_code,
+            status.HTTP_401_UNAUTHORIZED
+        )
+
+    def test_deleted_user_token_rejected(self):
+        """Test the token of a user who deleted themselves stops working"""
+        create_user(email='test@example.com', password='pass-123-word')
+        payload = {'email': 'test@example.com', 'password': 'pass-123-word'}
+        token = self.client.post(TOKEN_URL, payload).data['token']
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token}')
+
+        res = self.client.delete(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+        res = self.client.post(RECIPES_URL, {
+            'title': 'Sample', 'time_minutes': 5, 'price': '5.00',
+        })
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertFalse(Recipe.objects.exists())
+
     def test_retrieve_user_unauthorized(self):
         """Test that authentication is required for users"""
         res = self.client.get(ME_URL)
@@ -176,3 +231,18 @@ class PrivateUserApiTests(TestCase):
         self.assertEqual(self.user.name, payload['name'])
         self.assertTrue(self.user.check_password(payload['password']))
         self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_delete_user(self):
+        """Test deleting the authenticated user and their data"""
+        Recipe.objects.create(
+            user=self.user, title='Sample', time_minutes=5,
+            price=Decimal('5.00'),
+        )
+
+        res = self.client.delete(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(
+            get_user_model().objects.filter(pk=self.user.pk).exists()
+        )
+        self.assertFalse(Recipe.objects.exists())
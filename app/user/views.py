@@ -1,10 +1,22 @@
 """
 Views for the users API
 """
-from rest_framework import generics, authentication, permissions
+from django.contrib.auth import get_user_model
+
+from drf_spectacular.utils import extend_schema, inline_serializer
+from rest_framework import generics, permissions, serializers, status, views
 from rest_framework.authtoken.views import ObtainAuthToken
+from rest_framework.response import Response
 from rest_framework.settings import api_settings
 
+from core.authentication import (
+    SignedToken,
+    SignedTokenAuthentication,
+    issue_token,
+    revoked_tokens,
+)
+from core.deletion import delete_user
+from core.routers import ReplicaReadMixin
 from user.serializers import UserSerializer, AuthTokenSerializer
 
 
@@ -18,14 +30,50 @@ class CreateTokenView(ObtainAuthToken):
     serializer_class = AuthTokenSerializer
     renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES
     authentication_classes = api_settings.DEFAULT_AUTHENTICATION_CLASSES
+    throttle_classes = api_settings.DEFAULT_THROTTLE_CLASSES
+    throttle_scope = 'login'
+
+    @extend_schema(responses=inline_serializer('Token', {
+        'token': serializers.CharField(),
+        'expires': serializers.DateTimeField(),
+    }))
+    def post(self, request, *args, **kwargs):
+        """Create a signed token without writing to the database"""
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        token = issue_token(serializer.validated_data['user'])
+
+        return Response({'token': token.key, 'expires': token.expires})
 
 
-class ManageUserView(generics.RetrieveUpdateAPIView):
+class RevokeTokenView(views.APIView):
+    """Revoke the token used to authenticate the request"""
+    authentication_classes = [SignedTokenAuthentication]
+    permission_classes = [permissions.IsAuthenticated]
+
+    @extend_schema(request=None, responses={204: None})
+    def post(self, request, *args, **kwargs):
+        if isinstance(request.auth, SignedToken):
+            revoked_tokens.revoke(request.auth)
+        else:
+            request.auth.delete()
+
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class ManageUserView(ReplicaReadMixin,
+                     generics.RetrieveUpdateDestroyAPIView):
     """Manage the authenticated user"""
     serializer_class = UserSerializer
-    authentication_classes = [authentication.TokenAuthentication]
+    authentication_classes = [SignedTokenAuthentication]
     permission_classes = [permissions.IsAuthenticated]
 
     def get_object(self):
         """Retrieve and return authenticated user"""
-        return self.request.user
+        return get_user_model().objects.get(pk=self.request.user.pk)
+
+    def perform_destroy(self, instance):
+        """Delete the user and their data in chunks"""
+        if isinstance(self.request.auth, SignedToken):
+            revoked_tokens.revoke(self.request.auth)
+        delete_user(instance)
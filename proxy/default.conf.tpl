@@ -1,13 +1,44 @@
+uwsgi_cache_path /var/cache/nginx/microcache_wsgi levels=1:2 keys_zone=microcache_wsgi:10m max_size=${MICROCACHE_MAX_SIZE} inactive=10m use_temp_path=off;
+proxy_cache_path /var/cache/nginx/microcache_asgi levels=1:2 keys_zone=microcache_asgi:10m max_size=${MICROCACHE_MAX_SIZE} inactive=10m use_temp_path=off;
+
+map $http_authorization$http_cookie $skip_microcache {
+    default 1;
+    ""      0;
+}
+
 server {
     listen ${LISTEN_PORT};
 
+    gzip_vary on;
+    gzip_min_length ${GZIP_MIN_LENGTH};
+    gzip_types text/css text/javascript application/javascript application/json image/svg+xml text/plain;
+
+    # Static files with a content hash in their name never change.
+    location ~ "^/static/static/.+\.[0-9a-f]{12}\.\w+$" {
+        root /vol;
+        gzip on;
+        gzip_static on;
+        add_header Cache-Control "public, max-age=31536000, immutable";
+    }
+
+    # Uploaded media are stored under new UUID names or the SHA-256 of
+    # their content, never overwritten.
+    location ~ "^/static/media/uploads/recipe/([0-9a-f-]{36}|[0-9a-f]{64})\.\w+$" {
+        root /vol;
+        add_header Cache-Control "public, max-age=31536000, immutable";
+    }
+
     location /static {
         alias /vol/static;
+        gzip on;
+        gzip_static on;
+        expires ${STATIC_EXPIRES};
     }
 
     location / {
-        uwsgi_pass              ${APP_HOST}:${APP_PORT};
-        include                 /etc/nginx/uwsgi_params;
+        # uWSGI or HTTP upstream, depending on SERVER_MODE.
+        include                 /etc/nginx/conf.d/upstream.inc;
         client_max_body_size    10M;
+        add_header              X-Cache-Status $upstream_cache_status;
     }
 }
\ No newline at end of file
@@ -2,5 +2,18 @@
 
 set -e
 
-envsubst < /etc/nginx/default.conf.tpl > /etc/nginx/conf.d/default.conf
+if [ "${SERVER_MODE}" != "asgi" ]; then
+    export SERVER_MODE=wsgi
+fi
+
+if [ "${MICROCACHE_ENABLED}" = "1" ]; then
+    export MICROCACHE_ZONE=microcache_${SERVER_MODE}
+else
+    export MICROCACHE_ZONE=off
+fi
+
+envsubst '${LISTEN_PORT} ${GZIP_MIN_LENGTH} ${STATIC_EXPIRES} ${MICROCACHE_MAX_SIZE}' \
+    < /etc/nginx/default.conf.tpl > /etc/nginx/conf.d/default.conf
+envsubst '${APP_HOST} ${APP_PORT} ${MICROCACHE_ZONE} ${MICROCACHE_TTL}' \
+    < /etc/nginx/upstream/${SERVER_MODE}.conf.tpl > /etc/nginx/conf.d/upstream.inc
 nginx -g 'daemon off;'
@@ -0,0 +1,15 @@
+proxy_pass              http://${APP_HOST}:${APP_PORT};
+proxy_http_version      1.1;
+proxy_set_header        Connection "";
+proxy_set_header        Host $http_host;
+proxy_set_header        X-Forwarded-For $proxy_add_x_forwarded_for;
+proxy_set_header        X-Forwarded-Proto $scheme;
+
+# Short lived cache for anonymous requests, e.g. the API schema.
+proxy_cache             ${MICROCACHE_ZONE};
+proxy_cache_key         $scheme$request_method$host$request_uri;
+proxy_cache_valid       200 ${MICROCACHE_TTL};
+proxy_cache_lock        on;
+proxy_cache_use_stale   updating error timeout;
+proxy_cache_bypass      $skip_microcache;
+proxy_no_cache          $skip_microcache;
@@ -0,0 +1,11 @@
+uwsgi_pass              ${APP_HOST}:${APP_PORT};
+include                 /etc/nginx/uwsgi_params;
+
+# Short lived cache for anonymous requests, e.g. the API schema.
+uwsgi_cache             ${MICROCACHE_ZONE};
+uwsgi_cache_key         $scheme$request_method$host$request_uri;
+uwsgi_cache_valid       200 ${MICROCACHE_TTL};
+uwsgi_cache_lock        on;
+uwsgi_cache_use_stale   updating error timeout;
+uwsgi_cache_bypass      $skip_microcache;
+uwsgi_no_cache          $skip_microcache;
@@ -2,8 +2,46 @@
 
 set -e
 
-python manage.py wait_for_db
-python manage.py collectstatic --noinput
-python manage.py migrate
+python manage.py startup
 
-uwsgi --socket :9000 --workers 4 --master --enable-threads --module app.wsgi
+CPUS=$(nproc)
+
+if [ "${SERVER_MODE}" = "asgi" ]; then
+    # Processes sharing the CPUs, see PASSWORD_HASHING_WORKERS.
+    export WEB_PROCESSES="${WEB_PROCESSES:-${ASGI_WORKERS:-$CPUS}}"
+    exec uvicorn app.asgi:application \
+        --host 0.0.0.0 --port 9000 \
+        --workers "${ASGI_WORKERS:-$CPUS}" \
+        --limit-concurrency "${ASGI_LIMIT_CONCURRENCY:-1000}" \
+        --proxy-headers --forwarded-allow-ips '*'
+fi
+
+# Upper bound of worker processes, cheaper mode keeps between
+# WSGI_CHEAPER and WSGI_PROCESSES of them running depending on load.
+WSGI_PROCESSES=${WSGI_PROCESSES:-$((CPUS * 2))}
+WSGI_THREADS=${WSGI_THREADS:-2}
+WSGI_CHEAPER=${WSGI_CHEAPER:-$CPUS}
+if [ "${WSGI_CHEAPER}" -ge "${WSGI_PROCESSES}" ]; then
+    WSGI_CHEAPER=0
+fi
+export WEB_PROCESSES="${WEB_PROCESSES:-$WSGI_PROCESSES}"
+
+# Load the app in each worker instead of once in the master before forking.
+# Uses more memory, but workers can be reloaded independently.
+LAZY_APPS=""
+if [ "${WSGI_LAZY_APPS:-0}" = "1" ]; then
+    LAZY_APPS="--lazy-apps"
+fi
+
+exec uwsgi --socket :9000 --master --enable-threads --module app.wsgi \
+    --die-on-term \
+    --processes "${WSGI_PROCESSES}" \
+    --threads "${WSGI_THREADS}" \
+    --cheaper "${WSGI_CHEAPER}" \
+    --cheaper-initial "${WSGI_CHEAPER_INITIAL:-$WSGI_CHEAPER}" \
+    --cheaper-step "${WSGI_CHEAPER_STEP:-1}" \
+    --max-requests "${WSGI_MAX_REQUESTS:-5000}" \
+    --reload-on-rss "${WSGI_RELOAD_ON_RSS:-512}" \
+    --harakiri "${WSGI_HARAKIRI:-60}" \
+    --stats ":${WSGI_STATS_PORT:-9191}" --stats-http --memory-report \
+    ${LAZY_APPS}